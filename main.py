@@ -1,35 +1,59 @@
-from playwright.sync_api import sync_playwright
+from sbl_browser import add_browser_args, profile_from_args
+from sbl_competitions import add_competition_args, competitions_from_args
+from sbl_diagnostics import add_diagnostics_args, diagnostics_from_args
+from sbl_har import add_archive_args, archive, archive_from_args
 from scraper import SBLScraper
+import argparse
+import asyncio
 import json
 import os
 
-def main():
-    with sync_playwright() as playwright:
-        # Launch the browser
-        browser = playwright.chromium.launch(headless=False)
-        page = browser.new_page()
-        
-        # Initialize scraper
-        scraper = SBLScraper(page)
-        
-        # Navigate to homepage
-        title = scraper.navigate_to_homepage()
-        print(f"Page title: {title}")
-        
-        # Extract data
-        data = scraper.extract_data()
-        
-        # Save data
-        os.makedirs("data", exist_ok=True)
-        with open("data/output.json", "w") as f:
-            json.dump(data, f, indent=2)
-            
-        # Take screenshot
-        os.makedirs("screenshots", exist_ok=True)
-        page.screenshot(path="screenshots/homepage.png")
-        
-        # Close browser
-        browser.close()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the SBL scraper")
+    add_competition_args(parser)
+    parser.add_argument("--backend", choices=["browser", "http"], default="http",
+                        help="Fetch pages over plain HTTP with a per-page browser fallback, "
+                             "or always with Chromium (default: http)")
+    add_browser_args(parser)
+    add_diagnostics_args(parser)
+    add_archive_args(parser)
+    return parser.parse_args()
+
+def describe(tables):
+    """Shape and column types of each table, for the output summary"""
+    return {name: {"rows": len(table), "bytes": table.nbytes, "columns": table.dtypes}
+            for name, table in tables.items()}
+
+async def main():
+    args = parse_args()
+    profile = profile_from_args(args)
+    diagnostics_from_args(args)
+    archive_from_args(args)
+
+    data = {}
+    for competition_id in competitions_from_args(args):
+        async with SBLScraper(competition_id, backend=args.backend, profile=profile) as scraper:
+            teams = await scraper.get_teams()
+            print(f"Competition {competition_id}: {len(teams)} teams")
+            team_stats = await scraper.get_team_stats(teams[0].id) if teams else {}
+            player_stats = await scraper.get_player_stats()
+            for name, table in player_stats.items():
+                print(f"  {table!r}, {table.nbytes / 1024:.1f} KiB")
+            print(scraper.summary())
+        data[competition_id] = {
+            "teams": [{"id": team.id, "name": team.name, "url": team.url} for team in teams],
+            "team_stats": {teams[0].id: describe(team_stats)} if teams else {},
+            "player_stats": describe(player_stats),
+        }
+
+    # Save data
+    os.makedirs("data", exist_ok=True)
+    with open("data/output.json", "w") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    if archive.mode:
+        print(archive.summary())
+    archive.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
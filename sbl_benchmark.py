@@ -0,0 +1,416 @@
+import argparse
+import asyncio
+import contextlib
+import html
+import io
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from sbl_browser import browser_rss_bytes
+
+BENCHMARK_COMPETITION_ID = "1"
+DEFAULT_OUTPUT = "benchmark.json"
+
+TEAM_TABLES = {
+    "totals": ["EFF", "G", "GS", "Min", "PTS", "OFF", "DEF", "REB", "AST", "STL", "BLK",
+               "2PM", "2PA", "3PM", "3PA", "FTM", "FTA", "Tot Fouls", "Fls On", "TO"],
+    "per_game": ["MPG", "PPG", "ORPG", "DRPG", "RPG", "APG", "STPG", "BLKPG", "Tot Fouls PG", "FOPG", "TOPG"],
+    "shooting": ["2PMPG", "2PAPG", "2P%", "3PAPG", "3PMPG", "3P%", "FTMPG", "FTAPG", "FT%", "2CPPG"],
+}
+
+# (heading, columns); the site only has headings for the first two tables
+PLAYER_TABLES = [
+    ("Averages", ["EFF", "PPG", "APG", "RPG", "ORPG", "DRPG", "BLKPG", "STPG", "TOPG", "FOPG"]),
+    ("Shooting Statistics", ["G", "FG%", "2PM", "2PA", "2P%", "3PM", "3PA", "3P%", "FT%", "FTAPG"]),
+    (None, ["G", "GS", "MPG", "A/TO", "EFF", "+/-", "+/- PG", "Tot Fouls PG"]),
+]
+
+class FixtureSite:
+    """
+    Synthetic copy of the stats site's teams, team statistics and player
+    statistics pages
+
+    Pages are generated on request from a seed, so thousands of teams cost
+    no memory up front and every run serves identical HTML.
+    """
+
+    def __init__(self, teams=10, players_per_team=12, seed=0):
+        self.teams = teams
+        self.players_per_team = players_per_team
+        self.seed = seed
+
+    def team_id(self, index):
+        return str(100000 + index)
+
+    def team_name(self, index):
+        return f"Fixture Team {index + 1}"
+
+    def player(self, team_index, slot):
+        person_id = 1000000 + team_index * self.players_per_team + slot
+        return person_id, f"Player {team_index + 1}-{slot + 1}"
+
+    def cell(self, rng, column):
+        if column == "Min":
+            return f"{rng.randint(0, 1200)}:{rng.randint(0, 59):02d}"
+        if column.endswith("%") or column.endswith("PG") or column in ("MPG", "A/TO", "+/- PG"):
+            return f"{rng.uniform(0, 60):.1f}"
+        return str(rng.randint(-20 if column == "+/-" else 0, 400))
+
+    def table(self, rng, columns, rows, css_class=None, links=None):
+        class_attr = f' class="{css_class}"' if css_class else ""
+        head = "".join(f"<th>{html.escape(column)}</th>" for column in ["Player"] + columns)
+        body = []
+        for row_index, name in enumerate(rows):
+            first = html.escape(name)
+            if links:
+                first = f'<a href="{links[row_index]}">{first}</a>'
+            cells = "".join(f"<td>{self.cell(rng, column)}</td>" for column in columns)
+            body.append(f"<tr><td>{first}</td>{cells}</tr>")
+        return f"<table{class_attr}><thead><tr>{head}</tr></thead><tbody>{''.join(body)}</tbody></table>"
+
+    def page(self, title, body):
+        return f"<!DOCTYPE html><html><head><title>{html.escape(title)}</title></head><body>{body}</body></html>"
+
+    def teams_page(self, competition_id):
+        links = "".join(
+            f'<a href="/SBF/en/competition/{competition_id}/team/{self.team_id(index)}/statistics">'
+            f'{html.escape(self.team_name(index))}</a>'
+            for index in range(self.teams))
+        return self.page("Teams", f'<div class="teams">{links}</div>')
+
+    def team_page(self, team_id):
+        index = int(team_id) - 100000
+        if not 0 <= index < self.teams:
+            return None
+        rng = random.Random(f"{self.seed}:team:{team_id}")
+        names = [self.player(index, slot)[1] for slot in range(self.players_per_team)]
+        tables = "".join(self.table(rng, columns, names, "team-stats") for columns in TEAM_TABLES.values())
+        return self.page(self.team_name(index), f"<h1>{html.escape(self.team_name(index))}</h1>{tables}")
+
+    def player_page(self, competition_id):
+        rng = random.Random(f"{self.seed}:players")
+        players = [self.player(team_index, slot)
+                   for team_index in range(self.teams) for slot in range(self.players_per_team)]
+        names = [name for _, name in players]
+        links = [f"/SBF/en/competition/{competition_id}/person/{person_id}?" for person_id, _ in players]
+        body = []
+        for heading, columns in PLAYER_TABLES:
+            if heading:
+                body.append(f"<h4>{heading}</h4>")
+            body.append(self.table(rng, columns, names, links=links))
+        return self.page("Player statistics", "".join(body))
+
+    def render(self, path):
+        """HTML for a request path, or None for a 404"""
+        match = re.fullmatch(r"/SBF/en/competition/(\d+)/teams", path)
+        if match:
+            return self.teams_page(match.group(1))
+        match = re.fullmatch(r"/SBF/en/competition/(\d+)/team/(\d+)/statistics", path)
+        if match:
+            return self.team_page(match.group(2))
+        match = re.fullmatch(r"/SBF/en/competition/(\d+)/statistics/player", path)
+        if match:
+            return self.player_page(match.group(1))
+        return None
+
+class FixtureServer:
+    """Serves a FixtureSite on a local port from a background thread"""
+
+    def __init__(self, site, delay=0.0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if delay:
+                    time.sleep(delay)
+                page = site.render(self.path.split("?")[0])
+                body = (page or "Not found").encode("utf-8")
+                self.send_response(200 if page is not None else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.requests += 1
+                server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.requests = 0
+        self.bytes_sent = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def latency_summary(latencies):
+    """Per-page latency percentiles in milliseconds"""
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p90": round(float(np.percentile(values, 90)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+class MemorySampler:
+    """Tracks the peak browser memory while a benchmark runs"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak = None
+        self.task = None
+
+    async def run(self):
+        while True:
+            rss = await asyncio.to_thread(browser_rss_bytes)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.task
+        return round(self.peak / (1024 * 1024), 1) if self.peak else None
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """Silence the scrapers' progress output while timing"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+async def bench_scrape(args):
+    """Time team discovery, team pages and the player page with one backend"""
+    # Imported here so SBL_SITE_URL is set before the URL templates are built
+    from playwright.async_api import async_playwright
+    from sbl_browser import LazyBrowser, LoadStats, PageLoadProfile, new_context
+    from sbl_http import HttpFetcher
+    from sbl_player_scraper import scrape_player_stats, scrape_player_stats_http
+    from sbl_team_scraper import (extract_team_links, extract_team_links_http, scrape_team_stats,
+                                  scrape_team_stats_http)
+
+    profile = PageLoadProfile()
+    stats = LoadStats()
+    sampler = MemorySampler()
+    latencies = []
+    competition_id = BENCHMARK_COMPETITION_ID
+
+    async with async_playwright() as p, HttpFetcher(max_connections=args.workers) as fetcher:
+        browser = LazyBrowser(p, profile)
+        sampler.start()
+
+        async def open_page():
+            context = await new_context(await browser.get(), profile, stats)
+            return context, await context.new_page()
+
+        # Team discovery
+        with quiet(not args.verbose):
+            if args.backend == "http":
+                teams = await extract_team_links_http(fetcher, competition_id)
+            else:
+                context, page = await open_page()
+                try:
+                    teams = await extract_team_links(page, competition_id)
+                finally:
+                    await context.close()
+
+        # Team statistics pages, one worker per context as in the scraper
+        queue = asyncio.Queue()
+        for team in teams:
+            queue.put_nowait(team)
+        failures = 0
+
+        async def worker():
+            nonlocal failures
+            context = page = None
+            if args.backend == "browser":
+                context, page = await open_page()
+            try:
+                while not queue.empty():
+                    team = queue.get_nowait()
+                    started = time.perf_counter()
+                    try:
+                        if args.backend == "http":
+                            success = await scrape_team_stats_http(fetcher, team)
+                        else:
+                            success = await scrape_team_stats(page, team)
+                    except Exception:
+                        success = False
+                    latencies.append(time.perf_counter() - started)
+                    if not success:
+                        failures += 1
+            finally:
+                if context is not None:
+                    await context.close()
+
+        started = time.perf_counter()
+        with quiet(not args.verbose):
+            await asyncio.gather(*(worker() for _ in range(max(1, min(args.workers, len(teams))))))
+        team_seconds = time.perf_counter() - started
+
+        # Player statistics page
+        started = time.perf_counter()
+        with quiet(not args.verbose):
+            if args.backend == "http":
+                player_success = await scrape_player_stats_http(fetcher, competition_id)
+            else:
+                context, page = await open_page()
+                player_success = await scrape_player_stats(page, competition_id)
+                await context.close()
+        player_seconds = time.perf_counter() - started
+
+        memory_mb = await sampler.stop()
+        await browser.close()
+
+    return {
+        "backend": args.backend,
+        "teams_found": len(teams),
+        "team_pages": {
+            "pages": len(latencies),
+            "failures": failures,
+            "seconds": round(team_seconds, 3),
+            "pages_per_sec": round(len(latencies) / team_seconds, 2) if team_seconds else None,
+            "latency_ms": latency_summary(latencies),
+        },
+        "player_page": {
+            "success": bool(player_success),
+            "seconds": round(player_seconds, 3),
+        },
+        "browser_memory_mb": memory_mb,
+        "bytes_downloaded": fetcher.downloaded_bytes if args.backend == "http" else stats.downloaded_bytes,
+    }
+
+def count_rows(directory):
+    """Data rows in every CSV under a directory"""
+    rows = 0
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".csv"):
+                with open(os.path.join(root, file), "rb") as f:
+                    rows += max(0, sum(1 for _ in f) - 1)
+    return rows
+
+def bench_processor(args):
+    """Time a full processing pass over the scraped fixture data"""
+    from sbl_data_processor import process_all
+
+    rows = count_rows("data")
+    started = time.perf_counter()
+    with quiet(not args.verbose):
+        process_all(force=True)
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers and processor against a local "
+                                                 "copy of the stats site")
+    parser.add_argument("--teams", type=int, default=10, help="Teams on the fixture site (default: 10)")
+    parser.add_argument("--players-per-team", type=int, default=12,
+                        help="Players on each team, and so rows per table (default: 12)")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser",
+                        help="Scraper backend to benchmark (default: browser)")
+    parser.add_argument("--workers", type=int, default=4, help="Pages to load concurrently (default: 4)")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="Seconds the fixture server waits before each response (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic tables")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help=f"JSON results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the working directory with the scraped and processed data")
+    parser.add_argument("--verbose", action="store_true", help="Show the scrapers' progress output")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    site = FixtureSite(args.teams, args.players_per_team, args.seed)
+    server = FixtureServer(site, args.delay)
+    os.environ["SBL_SITE_URL"] = server.url
+
+    # The scrapers write relative to the working directory, so run them in
+    # a scratch directory instead of next to the real data
+    output = os.path.abspath(args.output)
+    workdir = tempfile.mkdtemp(prefix="sbl-bench-")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print(f"Fixture site at {server.url}: {args.teams} teams, "
+              f"{args.teams * args.players_per_team} players")
+        scrape = asyncio.run(bench_scrape(args))
+        processor = bench_processor(args)
+    finally:
+        os.chdir(cwd)
+        server.close()
+        if args.keep:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "teams": args.teams,
+            "players_per_team": args.players_per_team,
+            "backend": args.backend,
+            "workers": args.workers,
+            "delay": args.delay,
+            "seed": args.seed,
+        },
+        "scrape": scrape,
+        "processor": processor,
+        "server": {"requests": server.requests, "bytes_sent": server.bytes_sent},
+    }
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    team_pages = scrape["team_pages"]
+    print("\n=== Benchmark ===")
+    print(f"Team pages: {team_pages['pages']} in {team_pages['seconds']}s "
+          f"({team_pages['pages_per_sec']} pages/sec, {team_pages['failures']} failed)")
+    print(f"Latency (ms): {team_pages['latency_ms']}")
+    print(f"Player page: {scrape['player_page']['seconds']}s")
+    if scrape["browser_memory_mb"] is not None:
+        print(f"Peak browser memory: {scrape['browser_memory_mb']} MB")
+    print(f"Processor: {processor['rows']} rows in {processor['seconds']}s "
+          f"({processor['rows_per_sec']} rows/sec)")
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
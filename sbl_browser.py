@@ -0,0 +1,283 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlparse
+from sbl_har import archive
+from sbl_metrics import metrics
+
+# Resource types we never read from the stats pages. Stylesheets are kept
+# because innerText depends on computed styles (hidden cells, text-transform).
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+# Analytics, ads and social widgets loaded by the hosted stats site
+DEFAULT_BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "twitter.com",
+    "hotjar.com",
+    "scorecardresearch.com",
+]
+
+# How long to wait for the target tables to appear
+READY_TIMEOUT = 30000
+
+# Browser service (see sbl_browser_service.py) the scrapers connect to if set
+BROWSER_ENDPOINT_ENV = "SBL_BROWSER_ENDPOINT"
+CONNECT_TIMEOUT = 5000
+DEFAULT_MAX_CONTEXTS = 16
+CONTEXT_POLL_INTERVAL = 0.5
+
+class PageLoadProfile:
+    """
+    Settings for how scrapers launch the browser and load pages
+    """
+
+    def __init__(self, headless=True, block=True,
+                 blocked_resource_types=None, blocked_domains=None,
+                 browser_endpoint=None, max_contexts=DEFAULT_MAX_CONTEXTS):
+        self.headless = headless
+        self.block = block
+        self.browser_endpoint = browser_endpoint
+        self.max_contexts = max_contexts
+        self.blocked_resource_types = set(
+            DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else blocked_resource_types)
+        self.blocked_domains = list(
+            DEFAULT_BLOCKED_DOMAINS if blocked_domains is None else blocked_domains)
+
+    def launch_options(self):
+        """Keyword arguments for chromium.launch()"""
+        return {"headless": self.headless}
+
+    def should_block(self, request):
+        """Check whether a request should be aborted"""
+        if not self.block:
+            return False
+        if request.resource_type in self.blocked_resource_types:
+            return True
+        host = urlparse(request.url).hostname or ""
+        return any(host == domain or host.endswith("." + domain) for domain in self.blocked_domains)
+
+class LoadStats:
+    """
+    Counts requests blocked and bytes downloaded while loading pages
+    """
+
+    def __init__(self):
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.allowed_requests = 0
+        self.downloaded_bytes = 0
+
+    def record_blocked(self, request):
+        self.blocked_requests += 1
+        resource_type = request.resource_type
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+
+    def record_finished(self, sizes):
+        size = sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        self.allowed_requests += 1
+        self.downloaded_bytes += size
+        metrics.count("bytes", size, backend="browser")
+
+    def summary(self):
+        by_type = ", ".join(f"{name}: {count}" for name, count in sorted(self.blocked_by_type.items()))
+        lines = [
+            f"Requests loaded: {self.allowed_requests} ({self.downloaded_bytes / 1024:.1f} KiB)",
+            f"Requests blocked: {self.blocked_requests}" + (f" ({by_type})" if by_type else ""),
+        ]
+        return "\n".join(lines)
+
+async def connect_or_launch(playwright, profile):
+    """Connect to the browser service if one is configured, else launch Chromium
+
+    A service that can't be reached is not an error: the run carries on
+    with its own browser, as it would without a service.
+    """
+    if profile.browser_endpoint:
+        try:
+            with metrics.span("browser_connect", endpoint=profile.browser_endpoint):
+                browser = await playwright.chromium.connect_over_cdp(
+                    profile.browser_endpoint, timeout=CONNECT_TIMEOUT)
+            print(f"Using browser service at {profile.browser_endpoint}")
+            return browser
+        except Exception as e:
+            reason = (str(e).splitlines() or [""])[0]
+            print(f"Browser service at {profile.browser_endpoint} unavailable ({reason}), launching Chromium")
+    with metrics.span("browser_launch"):
+        return await playwright.chromium.launch(**profile.launch_options())
+
+async def count_contexts(browser):
+    """Contexts open in the browser, including those of other connected scrapers"""
+    session = await browser.new_browser_cdp_session()
+    try:
+        result = await session.send("Target.getBrowserContexts")
+    finally:
+        await session.detach()
+    return len(result["browserContextIds"])
+
+async def wait_for_context_slot(browser, profile):
+    """Wait while a shared browser service already has max_contexts open"""
+    started = time.monotonic()
+    while await count_contexts(browser) >= profile.max_contexts:
+        await asyncio.sleep(CONTEXT_POLL_INTERVAL)
+    waited = time.monotonic() - started
+    if waited >= CONTEXT_POLL_INTERVAL:
+        metrics.count("context_wait_seconds", round(waited, 3))
+
+def browser_rss_bytes():
+    """Resident memory of the Chromium processes started by this process
+
+    Read from /proc, so it is None on platforms without it.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    parents = {}
+    names = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may itself contain spaces
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        parents[int(entry)] = int(fields[1])
+        names[int(entry)] = name
+
+    descendants = set()
+    frontier = {os.getpid()}
+    while frontier:
+        frontier = {pid for pid, parent in parents.items() if parent in frontier} - descendants
+        descendants |= frontier
+
+    total = 0
+    for pid in descendants:
+        if "chrom" not in names[pid] and "headless" not in names[pid]:
+            continue
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class LazyBrowser:
+    """
+    Launches Chromium on first use, for runs that may not need it at all
+
+    With a browser endpoint in the profile, it connects to the browser
+    service instead and only launches Chromium if that is unreachable.
+    """
+
+    def __init__(self, playwright, profile):
+        self.playwright = playwright
+        self.profile = profile
+        self.browser = None
+        self.lock = asyncio.Lock()
+
+    async def get(self):
+        # Concurrent callers share a single launch
+        async with self.lock:
+            if self.browser is None:
+                self.browser = await connect_or_launch(self.playwright, self.profile)
+        return self.browser
+
+    async def close(self):
+        # For a browser service this only closes our contexts and disconnects
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+
+async def new_context(browser, profile, stats, limiter=None):
+    """Create a browser context with request blocking and byte accounting
+
+    With a limiter, every page navigation waits for its turn, so a shared
+    RateLimiter caps the request rate across all contexts. With a browser
+    service, it first waits until the service has fewer than max_contexts
+    open across all the scrapers using it. When recording or replaying a
+    HAR archive, requests that aren't blocked go through the archive.
+    """
+    if profile.browser_endpoint:
+        await wait_for_context_slot(browser, profile)
+    context = await browser.new_context()
+
+    async def handle_route(route):
+        if profile.should_block(route.request):
+            stats.record_blocked(route.request)
+            await route.abort()
+            return
+        if archive.replaying:
+            await archive.fulfill(route)
+            return
+        if limiter and route.request.is_navigation_request():
+            await limiter.wait()
+        if archive.recording:
+            await archive.fetch(route)
+        else:
+            await route.continue_()
+
+    async def handle_finished(request):
+        try:
+            stats.record_finished(await request.sizes())
+        except Exception:
+            # Sizes are unavailable once the page has navigated away
+            pass
+
+    if profile.block or limiter or archive.mode:
+        await context.route("**/*", handle_route)
+    context.on("requestfinished", handle_finished)
+    return context
+
+async def goto_ready(page, url, selector, timeout=READY_TIMEOUT):
+    """Navigate to url and return once selector is present
+
+    Waits for the DOM rather than network idle, since the stats tables are
+    usable long before trackers and ads have settled.
+    """
+    with metrics.span("navigation", url=url):
+        await page.goto(url, wait_until="domcontentloaded")
+    with metrics.span("readiness", url=url, selector=selector):
+        await page.wait_for_selector(selector, timeout=timeout)
+
+def add_browser_args(parser):
+    """Add page-load profile options to an argument parser"""
+    parser.add_argument("--headed", action="store_true",
+                        help="Show the browser window instead of running headless")
+    parser.add_argument("--no-block", action="store_true",
+                        help="Load every resource instead of blocking images, fonts and trackers")
+    parser.add_argument("--block-type", action="append", default=None, metavar="TYPE",
+                        help="Resource type to block (repeatable, replaces the defaults)")
+    parser.add_argument("--block-domain", action="append", default=None, metavar="DOMAIN",
+                        help="Domain to block (repeatable, replaces the defaults)")
+    add_browser_service_args(parser)
+
+def add_browser_service_args(parser):
+    """Add options for connecting to a running browser service"""
+    parser.add_argument("--browser-endpoint", default=os.environ.get(BROWSER_ENDPOINT_ENV), metavar="URL",
+                        help=f"Connect to the browser service at this CDP endpoint, e.g. "
+                             f"http://127.0.0.1:9222, launching Chromium only if it is unreachable "
+                             f"(default: ${BROWSER_ENDPOINT_ENV})")
+    parser.add_argument("--max-contexts", type=int, default=DEFAULT_MAX_CONTEXTS, metavar="N",
+                        help=f"Wait while the browser service has N contexts open across all scrapers "
+                             f"(default: {DEFAULT_MAX_CONTEXTS})")
+
+def profile_from_args(args):
+    """Build a PageLoadProfile from parsed command line arguments"""
+    return PageLoadProfile(
+        headless=not args.headed,
+        block=not args.no_block,
+        blocked_resource_types=args.block_type,
+        blocked_domains=args.block_domain,
+        browser_endpoint=args.browser_endpoint,
+        max_contexts=args.max_contexts,
+    )
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import time
+import urllib.request
+from playwright.async_api import async_playwright
+from sbl_browser import BROWSER_ENDPOINT_ENV, browser_rss_bytes, count_contexts
+
+DEFAULT_PORT = 9222
+DEFAULT_CHECK_INTERVAL = 15.0
+DEFAULT_RECYCLE_AFTER = 3600.0
+DEFAULT_MAX_MEMORY_MB = 1024
+
+class BrowserService:
+    """
+    A long-lived Chromium that scrapers connect to over CDP
+
+    Scrapers open a fresh context per job and close it when done, so they
+    skip the launch and teardown but share no cookies or cache. Every
+    check_interval seconds the service makes sure the browser still
+    answers, relaunching it if not. Once it has been up for recycle_after
+    seconds or grown past max_memory_bytes, it is relaunched the next time
+    no contexts are open, so memory the renderers leak doesn't build up.
+    """
+
+    def __init__(self, playwright, port=DEFAULT_PORT, headless=True, check_interval=DEFAULT_CHECK_INTERVAL,
+                 recycle_after=DEFAULT_RECYCLE_AFTER, max_memory_bytes=DEFAULT_MAX_MEMORY_MB * 1024 * 1024):
+        self.playwright = playwright
+        self.port = port
+        self.headless = headless
+        self.check_interval = check_interval
+        self.recycle_after = recycle_after
+        self.max_memory_bytes = max_memory_bytes
+        self.browser = None
+        self.started = None
+        self.launches = 0
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def launch(self):
+        self.browser = await self.playwright.chromium.launch(
+            headless=self.headless, args=[f"--remote-debugging-port={self.port}"])
+        self.started = time.monotonic()
+        self.launches += 1
+        print(f"Browser {self.browser.version} listening at {self.endpoint}")
+
+    async def relaunch(self, reason):
+        print(f"Relaunching browser: {reason}")
+        try:
+            await self.browser.close()
+        except Exception:
+            # Already gone if it crashed
+            pass
+        await self.launch()
+
+    def responding(self):
+        """Whether the CDP endpoint answers, as a connecting scraper would see it"""
+        try:
+            with urllib.request.urlopen(f"{self.endpoint}/json/version", timeout=5) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    async def check(self):
+        """Relaunch the browser if it stopped answering or is due for recycling"""
+        if not self.browser.is_connected() or not await asyncio.to_thread(self.responding):
+            await self.relaunch("not responding")
+            return
+
+        contexts = await count_contexts(self.browser)
+        rss = await asyncio.to_thread(browser_rss_bytes)
+        uptime = time.monotonic() - self.started
+        reasons = []
+        if self.recycle_after and uptime >= self.recycle_after:
+            reasons.append(f"up for {uptime / 60:.0f} min")
+        if self.max_memory_bytes and rss and rss >= self.max_memory_bytes:
+            reasons.append(f"using {rss / (1024 * 1024):.0f} MiB")
+        if not reasons:
+            return
+        # Never pull the browser out from under a running job
+        if contexts:
+            print(f"Recycle due ({', '.join(reasons)}), waiting for {contexts} context(s) to close")
+            return
+        await self.relaunch(", ".join(reasons))
+
+    async def run(self):
+        await self.launch()
+        try:
+            while True:
+                await asyncio.sleep(self.check_interval)
+                try:
+                    await self.check()
+                except Exception as e:
+                    await self.relaunch(f"health check failed: {e}")
+        finally:
+            await self.browser.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Keep a Chromium running for the scrapers to connect to, "
+                    f"e.g. with {BROWSER_ENDPOINT_ENV}=http://127.0.0.1:{DEFAULT_PORT}")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Remote debugging port, only reachable from this machine (default: {DEFAULT_PORT})")
+    parser.add_argument("--headed", action="store_true",
+                        help="Show the browser window instead of running headless")
+    parser.add_argument("--check-interval", type=float, default=DEFAULT_CHECK_INTERVAL, metavar="SECONDS",
+                        help=f"Seconds between health checks (default: {DEFAULT_CHECK_INTERVAL:g})")
+    parser.add_argument("--recycle-after", type=float, default=DEFAULT_RECYCLE_AFTER, metavar="SECONDS",
+                        help=f"Relaunch the browser once idle after this long, 0 to never "
+                             f"(default: {DEFAULT_RECYCLE_AFTER:g})")
+    parser.add_argument("--max-memory", type=int, default=DEFAULT_MAX_MEMORY_MB, metavar="MB",
+                        help=f"Relaunch the browser once idle if it uses more memory than this, 0 for no limit "
+                             f"(default: {DEFAULT_MAX_MEMORY_MB})")
+    return parser.parse_args()
+
+async def run(args):
+    async with async_playwright() as p:
+        service = BrowserService(p, port=args.port, headless=not args.headed,
+                                 check_interval=args.check_interval, recycle_after=args.recycle_after,
+                                 max_memory_bytes=args.max_memory * 1024 * 1024)
+        await service.run()
+
+def main():
+    args = parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Browser service stopped")
+
+if __name__ == "__main__":
+    main()
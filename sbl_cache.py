@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: processes sharing a cache directory aren't serialized
+    fcntl = None
+
+DEFAULT_CACHE_DIR = ".cache/sbl"
+DEFAULT_MAX_MB = 200
+
+# Files younger than this are left alone by eviction even when no index
+# lists them yet; another process may be about to add them
+ORPHAN_GRACE_SECONDS = 600
+
+def parse_duration(value):
+    """Parse a duration like "90", "30m", "6h" or "2d" into seconds"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', value)
+    if not match:
+        raise ValueError(f"Invalid duration: {value}")
+    amount, unit = match.groups()
+    return float(amount) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}[unit]
+
+class ResponseCache:
+    """
+    On-disk cache of fetched pages and extracted tables, keyed by URL
+
+    Entries keep the ETag, Last-Modified and a content hash so pages can be
+    revalidated conditionally. Entries younger than max_age are served
+    without any request, and the least recently used entries are evicted
+    once the cache grows past max_bytes.
+
+    The index is saved after every store, so a run that dies keeps what it
+    fetched. Several processes can share a directory: each save merges
+    into index.json under a file lock, and files that no index lists, left
+    by a crashed run, are deleted by eviction.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_age=None, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock_path = os.path.join(directory, "index.lock")
+        os.makedirs(directory, exist_ok=True)
+        self.entries = self._load_index()
+        # Keys this process changed or dropped since the index was last saved
+        self.changed = set()
+        self.removed = set()
+        self.hits = 0
+        self.revalidated = 0
+        self.stored = 0
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A corrupt index only costs us a cold cache
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """Hold the index lock shared by every process using this directory"""
+        with open(self.lock_path, "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _key(self, url, kind):
+        return hashlib.sha256(f"{kind}:{url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def lookup(self, url, kind="html"):
+        """Return the cache entry for url, or None"""
+        key = self._key(url, kind)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if not os.path.exists(self._path(key)):
+            del self.entries[key]
+            self.removed.add(key)
+            return None
+        entry["last_access"] = time.time()
+        self.changed.add(key)
+        return entry
+
+    def is_fresh(self, entry):
+        """Check whether an entry is young enough to skip the request"""
+        return self.max_age is not None and time.time() - entry["fetched_at"] <= self.max_age
+
+    def read(self, entry):
+        with open(self._path(entry["key"]), encoding="utf-8") as f:
+            return f.read()
+
+    def get_fresh(self, url, kind="html"):
+        """Return cached content for url if it is still fresh, else None"""
+        entry = self.lookup(url, kind)
+        if entry is None or not self.is_fresh(entry):
+            return None
+        self.hits += 1
+        return self.read(entry)
+
+    def conditional_headers(self, entry):
+        """Request headers for revalidating an entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def mark_revalidated(self, entry):
+        """Record that the server confirmed an entry is unchanged"""
+        entry["fetched_at"] = time.time()
+        self.changed.add(entry["key"])
+        self.revalidated += 1
+
+    def store(self, url, content, kind="html", etag=None, last_modified=None):
+        """Store content for url and return its hash"""
+        key = self._key(url, kind)
+        data = content.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        existing = self.entries.get(key)
+        if not existing or existing["content_hash"] != content_hash or not os.path.exists(self._path(key)):
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        now = time.time()
+        self.entries[key] = {
+            "key": key,
+            "url": url,
+            "kind": kind,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "size": len(data),
+            "fetched_at": now,
+            "last_access": now,
+        }
+        self.changed.add(key)
+        self.removed.discard(key)
+        self.stored += 1
+        self.save_index()
+        return content_hash
+
+    def get_json(self, url):
+        """Return a fresh extracted payload for url, or None"""
+        content = self.get_fresh(url, kind="json")
+        return json.loads(content) if content is not None else None
+
+    def store_json(self, url, payload):
+        """Store an extracted payload (e.g. tables) for url"""
+        return self.store(url, json.dumps(payload, ensure_ascii=False), kind="json")
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes
+
+        Also deletes files no index lists, such as pages stored by a run that
+        died before saving its index, once they are old enough not to belong
+        to a store still in progress.
+        """
+        total = sum(entry["size"] for entry in self.entries.values())
+        evicted = 0
+        for entry in sorted(self.entries.values(), key=lambda entry: entry["last_access"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(entry["key"]))
+            except FileNotFoundError:
+                pass
+            del self.entries[entry["key"]]
+            self.changed.discard(entry["key"])
+            self.removed.add(entry["key"])
+            total -= entry["size"]
+            evicted += 1
+
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name.split(".")[0] in self.entries or name in ("index.json", "index.lock"):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    evicted += 1
+            except FileNotFoundError:
+                pass
+        return evicted
+
+    def save_index(self):
+        """Merge this process's changes into index.json, evict, and write it back
+
+        Other processes' entries are kept; where both stored a page, the
+        later fetch wins.
+        """
+        with self._locked():
+            entries = self._load_index()
+            for key in self.removed:
+                entries.pop(key, None)
+            for key in self.changed:
+                entry = self.entries.get(key)
+                theirs = entries.get(key)
+                if entry is None:
+                    continue
+                if theirs is None or theirs["fetched_at"] <= entry["fetched_at"]:
+                    entries[key] = entry
+                else:
+                    theirs["last_access"] = max(theirs["last_access"], entry["last_access"])
+            self.entries = entries
+            self.changed.clear()
+            self.removed.clear()
+            self.evict()
+            self.removed.clear()
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.index_path)
+
+    def close(self):
+        """Save the index, evicting as needed"""
+        self.save_index()
+
+    def summary(self):
+        return (f"Cache: {self.hits} fresh, {self.revalidated} revalidated, "
+                f"{self.stored} stored ({len(self.entries)} entries)")
+
+def add_cache_args(parser):
+    """Add response cache options to an argument parser"""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for cached pages (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--max-age", type=parse_duration, default=None,
+                        help="Skip pages cached more recently than this, e.g. 30m, 6h, 1d")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                        help=f"Evict least recently used pages beyond this size (default: {DEFAULT_MAX_MB})")
+
+def cache_from_args(args):
+    """Build a ResponseCache from parsed command line arguments"""
+    return ResponseCache(args.cache_dir, max_age=args.max_age,
+                         max_bytes=int(args.cache_max_mb * 1024 * 1024))
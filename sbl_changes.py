@@ -0,0 +1,173 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from sbl_metrics import metrics
+
+PROCESSED_DIR = "data_processed"
+DEFAULT_CHANGES_DIR = f"{PROCESSED_DIR}/changes"
+
+def row_hash(row):
+    """Fixed-size digest of a row's cells, compared instead of the cells themselves"""
+    return hashlib.blake2b("\x1f".join(row).encode("utf-8"), digest_size=16).digest()
+
+def read_table(path):
+    """(header, rows) of a CSV as strings, or ([], []) if it doesn't exist"""
+    if not os.path.exists(path):
+        return [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return header, list(reader)
+
+def table_info(path, processed_dir=PROCESSED_DIR):
+    """Competition, source, team and kind of a processed table from its path
+
+    data_processed/competitions/1/teams/<Team>/totals.csv is a team table,
+    .../players/averages.csv a player table; the flat layout has no
+    competition. Returns None for anything else, such as teams.csv.
+    """
+    relative = os.path.relpath(path, processed_dir).replace(os.sep, "/")
+    parts = relative.split("/")
+    info = {"table": relative[:-len(".csv")]}
+    if parts[0] == "competitions" and len(parts) > 2:
+        info["competition"] = parts[1]
+        parts = parts[2:]
+    if parts[0] == "teams" and len(parts) == 3:
+        info["source"] = "team"
+        info["team"] = parts[1]
+    elif parts[0] == "players" and len(parts) == 2:
+        info["source"] = "player"
+    else:
+        return None
+    info["kind"] = os.path.splitext(parts[-1])[0]
+    return info
+
+def index_rows(header, rows, team=None):
+    """Map each row's key to (hash, row, person_id, name)
+
+    Rows are keyed on Person_ID where the table has one, else on the player
+    name plus team. A name repeated within one table is told apart by the
+    order it appears in.
+    """
+    id_column = header.index("Person_ID") if "Person_ID" in header else None
+    name_column = header.index("Player") if "Player" in header else None
+    index = {}
+    for row in rows:
+        person_id = row[id_column] if id_column is not None and id_column < len(row) else ""
+        name = row[name_column] if name_column is not None and name_column < len(row) else ""
+        base_key = person_id or f"{name}|{team or ''}"
+        key = base_key
+        occurrence = 2
+        while key in index:
+            key = f"{base_key}#{occurrence}"
+            occurrence += 1
+        index[key] = (row_hash(row), row, person_id or None, name)
+    return index
+
+def diff_tables(previous, current, team=None):
+    """Inserted, updated and removed rows between two (header, rows) tables
+
+    One pass over each table: rows are matched by key and only those whose
+    hashes differ are compared cell by cell. Returns a list of
+    (op, key, person_id, name, changed_columns).
+    """
+    old_header, old_rows = previous
+    new_header, new_rows = current
+    old_index = index_rows(old_header, old_rows, team)
+    new_index = index_rows(new_header, new_rows, team)
+
+    changes = []
+    for key, (digest, row, person_id, name) in new_index.items():
+        old = old_index.get(key)
+        if old is None:
+            changes.append(("insert", key, person_id, name, None))
+        elif old[0] != digest or old_header != new_header:
+            old_values = dict(zip(old_header, old[1]))
+            new_values = dict(zip(new_header, row))
+            columns = [column for column in new_header + [c for c in old_header if c not in new_values]
+                       if old_values.get(column) != new_values.get(column)]
+            if columns:
+                changes.append(("update", key, person_id, name, columns))
+    for key, (_, _, person_id, name) in old_index.items():
+        if key not in new_index:
+            changes.append(("remove", key, person_id, name, None))
+    return changes
+
+class ChangeFeed:
+    """
+    Row-level changes to the processed tables, one JSON-lines file per run
+
+    The processed CSVs from the previous run are the snapshot: each table is
+    read just before it is rewritten and compared with what replaced it.
+    Every inserted, updated or removed row becomes one line naming the
+    table, the row's person ID or name and team, and for updates the
+    columns that changed, so consumers can refresh only those players.
+    """
+
+    def __init__(self, directory=DEFAULT_CHANGES_DIR, processed_dir=PROCESSED_DIR):
+        self.directory = directory
+        self.processed_dir = processed_dir
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def record(self, path, previous, current):
+        """Record the changes to the table at path between two (header, rows) versions"""
+        info = table_info(path, self.processed_dir)
+        if info is None:
+            return 0
+        entries = []
+        for op, key, person_id, name, columns in diff_tables(previous, current, info.get("team")):
+            entry = {"op": op, **info, "key": key, "person_id": person_id, "player": name, "columns": columns}
+            # Compact lines: leave out what doesn't apply
+            entries.append({field: value for field, value in entry.items() if value is not None})
+            metrics.count("changes", op=op, table=info["table"])
+        with self.lock:
+            self.pending.extend(entries)
+        return len(entries)
+
+    def compare(self, path, previous):
+        """Record the changes between previous and the table now at path"""
+        return self.record(path, previous, read_table(path))
+
+    def removed(self, path):
+        """Record every row of a table that is about to be deleted as removed"""
+        return self.record(path, read_table(path), ([], []))
+
+    def take(self):
+        """Remove and return the entries recorded so far, e.g. to hand back from a worker process"""
+        with self.lock:
+            entries, self.pending = self.pending, []
+        return entries
+
+    def add(self, entries):
+        """Add entries recorded elsewhere, such as in a worker process"""
+        with self.lock:
+            self.pending.extend(entries)
+
+    def counts(self):
+        counts = {"insert": 0, "update": 0, "remove": 0}
+        for entry in self.pending:
+            counts[entry["op"]] += 1
+        return counts
+
+    def flush(self):
+        """Write this run's changes, if any, and return the file's path"""
+        entries = self.take()
+        if not entries:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        path = os.path.join(self.directory, f"{stamp}.jsonl")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        # Consumers polling the directory never see a partial file
+        os.replace(tmp_path, path)
+        return path
+
+# Shared by the streaming and final processing passes of a run
+changes = ChangeFeed()
@@ -0,0 +1,170 @@
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sbl_competitions import season_for
+from sbl_normalize import PERSON_ID_COLUMN, categorize, normalize_frame
+
+COLUMNAR_DIRNAME = "columnar"
+PARTITIONING = ds.partitioning(
+    pa.schema([("competition", pa.string()), ("season", pa.string())]), flavor="hive")
+
+def sanitize_name(name):
+    """Directory name the team scraper uses for a team"""
+    return re.sub(r'[^\w\s-]', '', name).strip().replace(' ', '_')
+
+def load_team_index(teams_csv):
+    """Map team directory names to team ID, name and competition from teams.csv"""
+    if not os.path.exists(teams_csv):
+        return {}
+    teams = pd.read_csv(teams_csv, dtype=str)
+    index = {}
+    for team_id, name, url in zip(teams["ID"], teams["Name"], teams["URL"]):
+        competition_match = re.search(r'/competition/(\d+)', url or "")
+        index[sanitize_name(name)] = {
+            "team_id": team_id,
+            "team_name": name,
+            "competition": competition_match.group(1) if competition_match else "unknown",
+        }
+    return index
+
+def scraped_at(path):
+    """Time a file was scraped, taken from its modification time"""
+    return datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+
+def source_path(input_dir, relative, processed_path):
+    """The scraped CSV a processed one came from, whose mtime is the scrape time
+
+    Falls back to the processed CSV when the scraped one is gone.
+    """
+    path = f"{input_dir}/{relative}" if input_dir else None
+    return path if path and os.path.exists(path) else processed_path
+
+def with_metadata(df, path, competition, season=None, **columns):
+    """Add competition/season/scraped_at and any extra constant columns
+
+    path is the scraped CSV, so reprocessing keeps scraped_at. Without a
+    season, the one the scrape date falls in is used.
+    """
+    timestamp = scraped_at(path)
+    df = df.copy()
+    for name, value in columns.items():
+        df[name] = value
+    df["competition"] = competition
+    df["season"] = season or season_for(timestamp)
+    df["scraped_at"] = pd.Timestamp(timestamp)
+    return df
+
+def fixed_types(df):
+    """Give every numeric column the same Parquet type in every partition
+
+    The normalized frames are downcast per table, so the same column can
+    be int8 for one competition and int32 for another. Stored as int32
+    (Int64 for Person_ID) and float32, the partitions share one schema.
+    """
+    for name in df.columns:
+        if name == PERSON_ID_COLUMN:
+            df[name] = df[name].astype("Int64")
+        elif pd.api.types.is_integer_dtype(df[name]):
+            df[name] = df[name].astype("Int32")
+        elif pd.api.types.is_float_dtype(df[name]):
+            df[name] = df[name].astype("float32")
+    return df
+
+def drop_other_seasons(path, df):
+    """Delete the partitions of df's competitions for seasons df doesn't have
+
+    delete_matching only replaces the partitions being written, so a
+    competition whose season label changed would keep its old rows too.
+    """
+    for competition, seasons in df.groupby("competition", observed=True)["season"].unique().items():
+        competition_dir = f"{path}/competition={competition}"
+        for name in os.listdir(competition_dir) if os.path.isdir(competition_dir) else []:
+            if name.startswith("season=") and name[len("season="):] not in set(seasons):
+                shutil.rmtree(f"{competition_dir}/{name}")
+
+def write_dataset(frames, path):
+    """Write frames as one Parquet dataset partitioned by competition and season
+
+    Replaces every partition of the competitions in frames.
+    """
+    if not frames:
+        return 0
+    # Team names repeat on every row, so they are stored as categoricals
+    df = fixed_types(categorize(pd.concat(frames, ignore_index=True), ["team_name"]))
+    drop_other_seasons(path, df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=PARTITIONING,
+        existing_data_behavior="delete_matching",
+    )
+    return len(df)
+
+def build_team_datasets(processed_dir, columnar_dir, kinds=None, season=None, competition=None, input_dir=None):
+    """Build one dataset per team table kind from the processed team CSVs
+
+    Only kinds in `kinds` are rebuilt; None rebuilds every kind found.
+    competition overrides the one found in teams.csv. input_dir holds the
+    scraped CSVs, which give scraped_at.
+    Returns a dict of kind -> rows written.
+    """
+    team_index = load_team_index(f"{processed_dir}/teams.csv")
+    teams_dir = f"{processed_dir}/teams"
+    frames = {}
+    for team_dir in sorted(os.listdir(teams_dir)) if os.path.isdir(teams_dir) else []:
+        team = team_index.get(team_dir, {"team_id": None, "team_name": team_dir.replace('_', ' '),
+                                         "competition": "unknown"})
+        for file in sorted(os.listdir(f"{teams_dir}/{team_dir}")):
+            kind = file[:-len(".csv")] if file.endswith(".csv") else None
+            if kind is None or (kinds is not None and kind not in kinds):
+                continue
+            path = f"{teams_dir}/{team_dir}/{file}"
+            df = with_metadata(normalize_frame(pd.read_csv(path), "team", kind),
+                               source_path(input_dir, f"{team_dir}/{file}", path),
+                               competition or team["competition"], season,
+                               team_id=team["team_id"], team_name=team["team_name"])
+            frames.setdefault(kind, []).append(df)
+
+    return {kind: write_dataset(kind_frames, f"{columnar_dir}/teams_{kind}")
+            for kind, kind_frames in frames.items()}
+
+def build_player_datasets(processed_dir, columnar_dir, kinds=None, season=None, competition=None, input_dir=None):
+    """Build one dataset per player table kind from the processed player CSVs"""
+    if competition is None:
+        competitions = {team["competition"] for team in load_team_index(f"{processed_dir}/teams.csv").values()}
+        competition = competitions.pop() if len(competitions) == 1 else "unknown"
+
+    players_dir = f"{processed_dir}/players"
+    rows = {}
+    for file in sorted(os.listdir(players_dir)) if os.path.isdir(players_dir) else []:
+        kind = file[:-len(".csv")] if file.endswith(".csv") else None
+        if kind is None or (kinds is not None and kind not in kinds):
+            continue
+        path = f"{players_dir}/{file}"
+        df = with_metadata(normalize_frame(pd.read_csv(path), "player", kind),
+                           source_path(input_dir, f"players/{file}", path), competition, season)
+        rows[kind] = write_dataset([df], f"{columnar_dir}/players_{kind}")
+    return rows
+
+def read_dataset(processed_dir, name, columns=None, filter=None):
+    """Read a columnar dataset such as "teams_totals" or "players_averages"
+
+    columns selects a subset of columns and filter is a pyarrow expression,
+    e.g. ds.field("season") == "2024-25". Both are pushed down so only the
+    matching partitions, row groups and columns are read.
+    """
+    path = f"{processed_dir}/{COLUMNAR_DIRNAME}/{name}"
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+    # Partitions written before the fixed types, or with a stat that is
+    # whole in one competition only, are read with their widest type
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if schemas:
+        schema = pa.unify_schemas(schemas + [PARTITIONING.schema], promote_options="permissive")
+        dataset = ds.dataset(path, schema=schema, format="parquet", partitioning=PARTITIONING)
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
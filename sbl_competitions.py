@@ -0,0 +1,93 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+# SBL_SITE_URL points the scrapers at another copy of the site, such as the
+# benchmark fixture server
+SITE_URL = os.environ.get("SBL_SITE_URL", "https://hosted.dcd.shared.geniussports.com")
+
+# Page URLs for a competition (one league season on the stats site)
+COMPETITION_URL_TEMPLATE = SITE_URL + "/SBF/en/competition/{competition_id}"
+TEAMS_URL_TEMPLATE = COMPETITION_URL_TEMPLATE + "/teams"
+TEAM_STATS_URL_TEMPLATE = COMPETITION_URL_TEMPLATE + "/team/{team_id}/statistics"
+PLAYER_STATS_URL_TEMPLATE = COMPETITION_URL_TEMPLATE + "/statistics/player"
+
+DEFAULT_COMPETITION_ID = "38899"
+
+# Scraped data is namespaced per competition under this directory
+COMPETITIONS_DIR = "data/competitions"
+
+def competition_data_dir(competition_id):
+    """Directory holding the raw scraped data for a competition"""
+    return f"{COMPETITIONS_DIR}/{competition_id}"
+
+# Metadata the scrapers record next to a competition's data, e.g. its season
+COMPETITION_INFO = "competition.json"
+
+def season_for(timestamp):
+    """Season label for a date; seasons run from August to July"""
+    start_year = timestamp.year if timestamp.month >= 8 else timestamp.year - 1
+    return f"{start_year}-{str(start_year + 1)[-2:]}"
+
+def season_from_text(text):
+    """Season label for a season named in page text, such as "2024-2025" or "2024/25", or None"""
+    for match in re.finditer(r'\b(20\d\d)\s*[-/\u2013]\s*(\d{4}|\d{2})\b', text or ""):
+        start_year, end = int(match.group(1)), match.group(2)
+        if int(end) in (start_year + 1, (start_year + 1) % 100):
+            return f"{start_year}-{str(start_year + 1)[-2:]}"
+    return None
+
+def load_competition_info(data_dir):
+    """Recorded metadata for the competition scraped into data_dir, or {}"""
+    try:
+        with open(f"{data_dir}/{COMPETITION_INFO}", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_season(competition_id, season):
+    """Record a competition's season, as named on its pages
+
+    Without one, the season of the first scrape is recorded and kept, so
+    the label does not move when the data is re-scraped or copied.
+    """
+    data_dir = competition_data_dir(competition_id)
+    info = load_competition_info(data_dir)
+    if season is None:
+        if info.get("season"):
+            return info["season"]
+        season = season_for(datetime.now(timezone.utc))
+        print(f"No season found on the pages of competition {competition_id}; recording {season} from the scrape date")
+    if info.get("season") != season:
+        info["season"] = season
+        os.makedirs(data_dir, exist_ok=True)
+        with open(f"{data_dir}/{COMPETITION_INFO}.tmp", "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+        os.replace(f"{data_dir}/{COMPETITION_INFO}.tmp", f"{data_dir}/{COMPETITION_INFO}")
+    return season
+
+def teams_url(competition_id):
+    return TEAMS_URL_TEMPLATE.format(competition_id=competition_id)
+
+def team_stats_url(competition_id, team_id):
+    return TEAM_STATS_URL_TEMPLATE.format(competition_id=competition_id, team_id=team_id)
+
+def player_stats_url(competition_id):
+    return PLAYER_STATS_URL_TEMPLATE.format(competition_id=competition_id)
+
+def add_competition_args(parser):
+    """Add competition selection and crawl budget options to an argument parser"""
+    parser.add_argument("--competition", action="append", default=None, metavar="ID",
+                        help=f"Competition ID to crawl (repeatable, default: {DEFAULT_COMPETITION_ID})")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum page requests per second across all competitions")
+
+def competitions_from_args(args):
+    """Competition IDs from parsed arguments, de-duplicated in order"""
+    competitions = []
+    for competition_id in args.competition or [DEFAULT_COMPETITION_ID]:
+        for part in competition_id.split(","):
+            if part.strip() and part.strip() not in competitions:
+                competitions.append(part.strip())
+    return competitions
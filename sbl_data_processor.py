@@ -1,106 +1,418 @@
+import argparse
 import os
 import csv
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import re
+from sbl_changes import changes, read_table
+from sbl_competitions import COMPETITIONS_DIR, load_competition_info
+from sbl_columnar import COLUMNAR_DIRNAME, build_player_datasets, build_team_datasets
+from sbl_leaderboards import DEFAULT_TOP_N, LEADERBOARDS_DIRNAME, LEADERBOARDS_JSON, build_leaderboards
+from sbl_manifest import Manifest
+from sbl_metrics import add_metrics_args, metrics, metrics_from_args
+from sbl_normalize import normalize_frame
+from sbl_player_index import WIDE_INDEX, build_player_index
+from sbl_store import DEFAULT_DB_PATH, ingest
 
 # Define the paths
 TEAM_DATA_DIR = "data"
 PLAYER_DATA_DIR = "data/players"
 OUTPUT_DIR = "data_processed"
+MANIFEST_PATH = f"{OUTPUT_DIR}/.manifest.json"
 
-def process_player_data():
-    """Process player statistics data"""
-    print("Processing player statistics data...")
-    
-    # Create output directory
-    os.makedirs(f"{OUTPUT_DIR}/players", exist_ok=True)
-    
-    # List all player CSV files
-    player_files = [f for f in os.listdir(PLAYER_DATA_DIR) if f.endswith('.csv')]
-    
-    for file in player_files:
-        # Read the CSV file
-        file_path = f"{PLAYER_DATA_DIR}/{file}"
-        df = pd.read_csv(file_path)
+def process_player_file(file_path, output_path):
+    """Process a single player statistics file"""
+    with metrics.span("processing", path=file_path):
+        df = pd.read_csv(file_path, dtype=str)
         
-        # Fix player URLs (remove duplicated domain)
-        if 'Player_URL' in df.columns:
-            df['Player_URL'] = df['Player_URL'].apply(lambda url: 
-                re.sub(r'https://hosted\.dcd\.shared\.geniussports\.comhttps://hosted\.dcd\.shared\.geniussports\.com', 
-                        'https://hosted.dcd.shared.geniussports.com', 
-                        url if pd.notna(url) else ""))
+        # Typed columns, fixed player URLs and a Person_ID column
+        df = normalize_frame(df, "player", table_kind(file_path))
         
-        # Write the processed data
-        output_path = f"{OUTPUT_DIR}/players/{file}"
+        # Write the processed data, noting which rows changed since the last run
+        previous = read_table(output_path)
         df.to_csv(output_path, index=False)
-        print(f"Processed {file} - {len(df)} player records")
+        changes.compare(output_path, previous)
+    metrics.count("processed_rows", len(df), source="player")
+    return len(df)
+
+def process_team_file(file_path, output_path):
+    """Process a single team statistics file"""
+    with metrics.span("processing", path=file_path):
+        df = pd.read_csv(file_path, dtype=str)
+        
+        # Typed columns, e.g. minutes played as seconds
+        df = normalize_frame(df, "team", table_kind(file_path))
+        
+        # Write the processed data, noting which rows changed since the last run
+        previous = read_table(output_path)
+        df.to_csv(output_path, index=False)
+        changes.compare(output_path, previous)
+    metrics.count("processed_rows", len(df), source="team")
+    return len(df)
+
+def data_roots():
+    """(competition, input_dir, output_dir) for every set of scraped data
+
+    Competitions scraped into data/competitions/<id> are processed into
+    data_processed/competitions/<id>. Data in the original flat data/
+    layout is still processed into data_processed/.
+    """
+    roots = []
+    if os.path.exists(f"{TEAM_DATA_DIR}/teams.csv") or os.path.isdir(PLAYER_DATA_DIR):
+        roots.append((None, TEAM_DATA_DIR, OUTPUT_DIR))
+    if os.path.isdir(COMPETITIONS_DIR):
+        for competition_id in sorted(os.listdir(COMPETITIONS_DIR)):
+            if os.path.isdir(f"{COMPETITIONS_DIR}/{competition_id}"):
+                roots.append((competition_id, f"{COMPETITIONS_DIR}/{competition_id}",
+                              f"{OUTPUT_DIR}/competitions/{competition_id}"))
+    return roots
+
+def output_path_for(input_path):
+    """Processed output path for a scraped CSV, or None if it isn't processed
+
+    Maps data/competitions/<id>/<Team>/<table>.csv to
+    data_processed/competitions/<id>/teams/<Team>/<table>.csv, player tables
+    to .../players/<table>.csv and teams.csv alongside them, following the
+    same layout as a full processing pass.
+    """
+    relative = os.path.relpath(input_path, TEAM_DATA_DIR).replace(os.sep, "/")
+    parts = relative.split("/")
+    output_dir = OUTPUT_DIR
+    if parts[0] == "competitions" and len(parts) > 2:
+        output_dir = f"{OUTPUT_DIR}/competitions/{parts[1]}"
+        parts = parts[2:]
+    if parts == ["teams.csv"]:
+        return f"{output_dir}/teams.csv"
+    if len(parts) == 2 and parts[0] == "players":
+        return f"{output_dir}/players/{parts[1]}"
+    if len(parts) == 2 and parts[0] not in ("players", "profiles", "competitions", ".."):
+        return f"{output_dir}/teams/{parts[0]}/{parts[1]}"
+    return None
+
+def process_file(manifest, input_path):
+    """Process one scraped CSV as soon as it is written
+
+    Returns True if the file was processed, False if it was unchanged or is
+    not a table the processor handles.
+    """
+    output_path = output_path_for(input_path)
+    if output_path is None or not input_path.endswith(".csv") or manifest.check(input_path, output_path):
+        return False
     
-    return len(player_files)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if "/players/" in output_path:
+        process_player_file(input_path, output_path)
+    elif os.path.basename(output_path) == "teams.csv":
+        normalize_frame(pd.read_csv(input_path, dtype=str), "teams", "teams").to_csv(output_path, index=False)
+    else:
+        process_team_file(input_path, output_path)
+    manifest.record(input_path, output_path)
+    return True
 
-def process_team_data():
-    """Process team statistics data"""
-    print("Processing team statistics data...")
+def player_units(manifest, input_dir=TEAM_DATA_DIR, output_dir=OUTPUT_DIR):
+    """The changed player statistics files, as one unit of work for the players directory"""
+    player_dir = f"{input_dir}/players"
+    if not os.path.isdir(player_dir):
+        return []
     
-    # Create output directory
-    os.makedirs(f"{OUTPUT_DIR}/teams", exist_ok=True)
+    # List all player CSV files
+    player_files = [f for f in os.listdir(player_dir) if f.endswith('.csv')]
     
+    files = [(f"{player_dir}/{file}", f"{output_dir}/players/{file}") for file in player_files]
+    changed = [(file_path, output_path) for file_path, output_path in files
+               if not manifest.check(file_path, output_path)]
+    return [("player", "players", len(player_files), changed)] if changed else []
+
+def team_units(manifest, input_dir=TEAM_DATA_DIR, output_dir=OUTPUT_DIR):
+    """The changed statistics files of each team, one unit of work per team directory"""
     # Get all team directories
-    team_dirs = [d for d in os.listdir(TEAM_DATA_DIR) 
-                if os.path.isdir(f"{TEAM_DATA_DIR}/{d}") and d != "players"]
+    team_dirs = [d for d in os.listdir(input_dir)
+                if os.path.isdir(f"{input_dir}/{d}") and d not in ("players", "profiles", "competitions")]
     
-    teams_processed = 0
+    units = []
     for team_dir in team_dirs:
-        # Create team directory in output
-        os.makedirs(f"{OUTPUT_DIR}/teams/{team_dir}", exist_ok=True)
-        
         # List all CSV files for this team
-        team_files = [f for f in os.listdir(f"{TEAM_DATA_DIR}/{team_dir}") if f.endswith('.csv')]
-        
-        for file in team_files:
-            # Read the CSV file
-            file_path = f"{TEAM_DATA_DIR}/{team_dir}/{file}"
-            df = pd.read_csv(file_path)
-            
-            # Write the processed data
-            output_path = f"{OUTPUT_DIR}/teams/{team_dir}/{file}"
-            df.to_csv(output_path, index=False)
-        
-        teams_processed += 1
-        print(f"Processed team: {team_dir} - {len(team_files)} files")
+        team_files = [f for f in os.listdir(f"{input_dir}/{team_dir}") if f.endswith('.csv')]
+        files = [(f"{input_dir}/{team_dir}/{file}", f"{output_dir}/teams/{team_dir}/{file}") for file in team_files]
+        changed = [(file_path, output_path) for file_path, output_path in files
+                   if not manifest.check(file_path, output_path)]
+        if changed:
+            units.append(("team", team_dir, len(team_files), changed))
+    return units
+
+FILE_PROCESSORS = {"team": process_team_file, "player": process_player_file}
+
+def process_unit(unit):
+    """Process a unit's changed files and return the rows written to each"""
+    source, _, _, files = unit
+    rows = []
+    for file_path, output_path in files:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        rows.append(FILE_PROCESSORS[source](file_path, output_path))
+    return rows
+
+def start_worker():
+    """Collect metrics in memory in a pool worker, and drop any inherited changes"""
+    metrics.start_buffering()
+    changes.take()
+
+def process_unit_in_worker(unit):
+    """process_unit() in a pool worker, also handing back its changes and metrics"""
+    return process_unit(unit), changes.take(), metrics.export()
+
+def process_units(manifest, units, jobs=1):
+    """Process units of work, in a pool of jobs worker processes if jobs > 1
+
+    Workers process whole directories. Their results, change feed entries
+    and metrics are gathered back in the order the units were listed, so
+    the output is the same as processing them one after another.
+    Returns the number of team directories and player files processed.
+    """
+    if jobs > 1 and len(units) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(units)), initializer=start_worker) as pool:
+            results = []
+            for rows, entries, exported in pool.map(process_unit_in_worker, units):
+                changes.add(entries)
+                metrics.merge(exported)
+                results.append(rows)
+    else:
+        results = map(process_unit, units)
     
-    return teams_processed
+    teams_processed = 0
+    player_files = 0
+    for (source, name, total_files, files), rows in zip(units, results):
+        for file_path, output_path in files:
+            manifest.record(file_path, output_path)
+        if source == "team":
+            teams_processed += 1
+            print(f"Processed team: {name} - {len(files)} of {total_files} files")
+        else:
+            player_files += len(files)
+            for (file_path, _), records in zip(files, rows):
+                print(f"Processed {os.path.basename(file_path)} - {records} player records")
+    return teams_processed, player_files
 
-def extract_teams_list():
+def extract_teams_list(manifest, input_dir=TEAM_DATA_DIR, output_dir=OUTPUT_DIR):
     """Extract and process the teams list"""
     print("Processing teams list...")
     
     # Check if teams.csv exists
-    if os.path.exists(f"{TEAM_DATA_DIR}/teams.csv"):
+    input_path = f"{input_dir}/teams.csv"
+    if os.path.exists(input_path):
+        output_path = f"{output_dir}/teams.csv"
+        if manifest.check(input_path, output_path):
+            # Still counted, so the summary shows the teams in the data
+            with open(output_path, newline="", encoding="utf-8") as f:
+                count = max(0, sum(1 for _ in csv.reader(f)) - 1)
+            print(f"Teams list unchanged - {count} teams")
+            return count
+        
         # Read the CSV file
-        df = pd.read_csv(f"{TEAM_DATA_DIR}/teams.csv")
+        df = normalize_frame(pd.read_csv(input_path, dtype=str), "teams", "teams")
         
         # Write the processed data
-        output_path = f"{OUTPUT_DIR}/teams.csv"
+        os.makedirs(output_dir, exist_ok=True)
         df.to_csv(output_path, index=False)
+        manifest.record(input_path, output_path)
         print(f"Processed teams list - {len(df)} teams")
         return len(df)
     
     return 0
 
-def main():
+def table_kind(path):
+    """Table kind of a CSV path, e.g. "totals" for .../totals.csv"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def season_labels(values):
+    """Parse --season values: "2024-25" for every competition or "38899=2024-25" for one"""
+    seasons = {}
+    for value in values or []:
+        competition_id, _, label = value.rpartition("=")
+        seasons[competition_id or None] = label
+    return seasons
+
+def write_columnar_output(roots, changed_outputs, rebuild_all=False, seasons=None):
+    """Rebuild the columnar datasets for table kinds whose CSVs changed"""
+    print("Writing columnar datasets...")
+    
+    seasons = seasons or {}
+    columnar_dir = f"{OUTPUT_DIR}/{COLUMNAR_DIRNAME}"
+    rebuild_all = rebuild_all or not os.path.isdir(columnar_dir)
+    
+    written = {}
+    for competition_id, input_dir, output_dir in roots:
+        # --season, then the season the scrapers recorded
+        season = seasons.get(competition_id, seasons.get(None))
+        if season is None and competition_id:
+            season = load_competition_info(input_dir).get("season")
+        if rebuild_all or f"{output_dir}/teams.csv" in changed_outputs:
+            team_kinds = None
+            player_kinds = None
+        else:
+            team_kinds = {table_kind(path) for path in changed_outputs if path.startswith(f"{output_dir}/teams/")}
+            player_kinds = {table_kind(path) for path in changed_outputs if path.startswith(f"{output_dir}/players/")}
+        
+        # Datasets are partitioned by competition, so each root only
+        # replaces its own partitions
+        if team_kinds is None or team_kinds:
+            for kind, rows in build_team_datasets(output_dir, columnar_dir, team_kinds, season, competition_id,
+                                                  input_dir).items():
+                written[f"teams_{kind}"] = written.get(f"teams_{kind}", 0) + rows
+        if player_kinds is None or player_kinds:
+            for kind, rows in build_player_datasets(output_dir, columnar_dir, player_kinds, season, competition_id,
+                                                    input_dir).items():
+                written[f"players_{kind}"] = written.get(f"players_{kind}", 0) + rows
+    
+    for name, rows in written.items():
+        print(f"Wrote {columnar_dir}/{name} - {rows} rows")
+    return len(written)
+
+def write_leaderboards(roots, changed_outputs, rebuild_all=False, top_n=DEFAULT_TOP_N):
+    """Rebuild the leaderboards of competitions whose tables changed"""
+    print("Writing leaderboards...")
+    
+    built = 0
+    for competition_id, _, output_dir in roots:
+        # Only this root's own tables, not those of competitions nested below it
+        changed = any(path == f"{output_dir}/teams.csv" or path.startswith((f"{output_dir}/teams/",
+                                                                            f"{output_dir}/players/"))
+                      for path in changed_outputs)
+        if not (rebuild_all or changed or not os.path.exists(f"{output_dir}/{LEADERBOARDS_DIRNAME}/{LEADERBOARDS_JSON}")):
+            continue
+        tables = build_leaderboards(output_dir, competition_id, top_n)
+        print(f"Wrote {output_dir}/{LEADERBOARDS_DIRNAME} - {tables} tables ranked")
+        built += 1
+    return built
+
+def write_player_indexes(roots, changed_outputs, rebuild_all=False):
+    """Rebuild the joined player table and ID index of competitions whose player tables changed"""
+    print("Writing joined player tables...")
+    
+    built = 0
+    for _, _, output_dir in roots:
+        if not os.path.isdir(f"{output_dir}/players"):
+            continue
+        changed = any(path.startswith(f"{output_dir}/players/") for path in changed_outputs)
+        if not (rebuild_all or changed or not os.path.exists(f"{output_dir}/{WIDE_INDEX}")):
+            continue
+        players, conflicts = build_player_index(output_dir)
+        print(f"Wrote {output_dir}/{WIDE_INDEX} - {players} players")
+        for column, count in sorted(conflicts.items()):
+            print(f"  {column}: {count} player(s) with different values across tables, kept the first")
+        built += 1
+    return built
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Process scraped SBL data")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess every input, ignoring the manifest")
+    parser.add_argument("--season", action="append", default=None,
+                        help="Season label for the columnar datasets, either 2024-25 for every "
+                             "competition or 38899=2024-25 for one (repeatable, default: the season "
+                             "the scrapers recorded in competition.json)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, metavar="N",
+                        help=f"Players per stat in the precomputed leaderboards (default: {DEFAULT_TOP_N})")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Worker processes for team and player tables, one directory at a time "
+                             "(default: 1, no pool)")
+    add_metrics_args(parser)
+    return parser.parse_args()
+
+def process_all(force=False, seasons=None, manifest=None, top_n=DEFAULT_TOP_N, jobs=1):
+    """Process every competition, then write the columnar datasets and store
+
+    Pass a manifest that has already been used with process_file() to
+    finish a streaming run: files processed since then are skipped here but
+    still count as changed for the columnar datasets and the store.
+    Returns a dict of counts for the summary.
+    """
     # Create output directory
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Process the data
-    teams_count = extract_teams_list()
-    teams_processed = process_team_data()
-    player_files = process_player_data()
+    # Only inputs that changed since the last run are reprocessed
+    if manifest is None:
+        manifest = Manifest(MANIFEST_PATH, force=force)
+    
+    # Process the data for every competition
+    roots = data_roots()
+    teams_count = 0
+    units = []
+    for competition_id, input_dir, output_dir in roots:
+        if competition_id:
+            print(f"\n--- Competition {competition_id} ---")
+        teams_count += extract_teams_list(manifest, input_dir, output_dir)
+        units += team_units(manifest, input_dir, output_dir)
+        units += player_units(manifest, input_dir, output_dir)
+    
+    # Every competition's team and player directories, fanned out with --jobs
+    print(f"Processing {len(units)} changed director{'y' if len(units) == 1 else 'ies'}"
+          f"{f' with {jobs} jobs' if jobs > 1 else ''}...")
+    teams_processed, player_files = process_units(manifest, units, jobs)
+    
+    # Remove outputs whose inputs have disappeared; their rows count as removed
+    removed = manifest.remove_stale(on_remove=changes.removed)
+    for output_path in removed:
+        print(f"Removed {output_path} (input no longer exists)")
+    manifest.save()
+    
+    # League-wide columnar datasets, one per table kind
+    with metrics.span("columnar"):
+        datasets = write_columnar_output(roots, manifest.recorded + removed, force, seasons)
+    
+    # One wide player table per competition, with an index by person ID
+    with metrics.span("player_indexes"):
+        player_indexes = write_player_indexes(roots, manifest.recorded + removed, force)
+    
+    # Ranks, percentiles, team aggregates and top-N lists, ready to serve
+    with metrics.span("leaderboards"):
+        leaderboards = write_leaderboards(roots, manifest.recorded + removed, force, top_n)
+    
+    # Change feed for everything processed in this run, including streamed tables
+    change_counts = changes.counts()
+    changes_path = changes.flush()
+    
+    # Indexed query store, rebuilt only when something changed
+    if manifest.recorded or removed or not os.path.exists(DEFAULT_DB_PATH):
+        with metrics.span("ingest"):
+            ingest([(competition_id, output_dir) for competition_id, _, output_dir in roots], DEFAULT_DB_PATH)
+    
+    return {
+        "competitions": len(roots),
+        "teams": teams_count,
+        "teams_processed": teams_processed,
+        "player_files": player_files,
+        "skipped": manifest.skipped,
+        "removed": len(removed),
+        "datasets": datasets,
+        "player_indexes": player_indexes,
+        "leaderboards": leaderboards,
+        "changes": change_counts,
+        "changes_path": changes_path,
+    }
+
+def main():
+    args = parse_args()
+    metrics_from_args(args)
+    counts = process_all(args.force, season_labels(args.season), top_n=args.top, jobs=args.jobs)
     
     print("\n=== Summary ===")
-    print(f"Teams list: {teams_count} teams")
-    print(f"Team data: {teams_processed} teams processed")
-    print(f"Player data: {player_files} files processed")
+    print(f"Competitions: {counts['competitions']}")
+    print(f"Teams list: {counts['teams']} teams")
+    print(f"Team data: {counts['teams_processed']} teams processed")
+    print(f"Player data: {counts['player_files']} files processed")
+    print(f"Unchanged files skipped: {counts['skipped']}")
+    print(f"Stale outputs removed: {counts['removed']}")
+    print(f"Columnar datasets written: {counts['datasets']}")
+    print(f"Joined player tables rebuilt: {counts['player_indexes']}")
+    print(f"Leaderboards rebuilt: {counts['leaderboards']}")
+    if counts["changes_path"]:
+        change_counts = counts["changes"]
+        print(f"Changed rows: {change_counts['insert']} inserted, {change_counts['update']} updated, "
+              f"{change_counts['remove']} removed ({counts['changes_path']})")
+    else:
+        print("Changed rows: none")
+    print(f"Stages:\n{metrics.summary()}")
     print(f"Data saved to {OUTPUT_DIR} directory")
+    metrics.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from sbl_metrics import metrics
+
+DEFAULT_DIAGNOSTICS_DIR = "diagnostics"
+DEFAULT_MAX_CAPTURES = 200
+DEFAULT_MAX_MB = 100
+
+class Diagnostics:
+    """
+    Screenshots and DOM snapshots of pages that failed to load or extract
+
+    Nothing is captured for pages that succeed, unless always_screenshot is
+    set. Files are written from a worker thread so the event loop keeps
+    serving other pages, and the oldest captures are pruned once the
+    directory holds more than max_captures or max_bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_DIAGNOSTICS_DIR, always_screenshot=False,
+                 max_captures=DEFAULT_MAX_CAPTURES, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.always_screenshot = always_screenshot
+        self.max_captures = max_captures
+        self.max_bytes = max_bytes
+        self.captured = 0
+        self.lock = threading.Lock()
+
+    def path_for(self, name):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        safe_name = re.sub(r'[^\w-]', '_', name)
+        return os.path.join(self.directory, f"{stamp}_{safe_name}")
+
+    def write(self, base_path, files):
+        """Write a capture's files and prune old captures (runs in a thread)"""
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for suffix, data in files.items():
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                with open(base_path + suffix, "wb") as f:
+                    f.write(data)
+            self.prune()
+
+    def prune(self):
+        """Delete the oldest captures beyond the retention limits"""
+        captures = {}
+        for file in os.listdir(self.directory):
+            path = os.path.join(self.directory, file)
+            stem = file.split(".", 1)[0]
+            entry = captures.setdefault(stem, {"paths": [], "bytes": 0})
+            entry["paths"].append(path)
+            entry["bytes"] += os.path.getsize(path)
+
+        # Capture names start with a UTC timestamp, so they sort newest first
+        total = 0
+        for index, (_, entry) in enumerate(sorted(captures.items(), reverse=True)):
+            total += entry["bytes"]
+            if index >= self.max_captures or total > self.max_bytes:
+                for path in entry["paths"]:
+                    os.remove(path)
+
+    def describe(self, page, name, reason, capture_error=None):
+        details = {"name": name, "url": page.url, "reason": str(reason), "time": time.time()}
+        if capture_error is not None:
+            # A crashed or closed page still leaves the reason behind
+            details["capture_error"] = str(capture_error)
+        return json.dumps(details, indent=2)
+
+    def recorded(self, base_path, name, reason):
+        self.captured += 1
+        metrics.count("diagnostics", capture=name, reason=str(reason))
+        print(f"Saved diagnostics for {name} to {base_path}.*")
+
+    async def capture(self, page, name, reason=None):
+        """Save a screenshot, the page's HTML and why it was captured"""
+        try:
+            files = {".png": await page.screenshot(full_page=True), ".html": await page.content(),
+                     ".json": self.describe(page, name, reason)}
+        except Exception as e:
+            files = {".json": self.describe(page, name, reason, e)}
+        base_path = self.path_for(name)
+        await asyncio.to_thread(self.write, base_path, files)
+        self.recorded(base_path, name, reason)
+
+    async def success(self, page, name):
+        """Screenshot a page that loaded fine, only with always_screenshot"""
+        if self.always_screenshot:
+            png = await page.screenshot()
+            await asyncio.to_thread(self.write, self.path_for(name), {".png": png})
+
+# Shared by every scraper in a run, like the metrics
+diagnostics = Diagnostics()
+
+def add_diagnostics_args(parser):
+    """Add failure diagnostics options to an argument parser"""
+    parser.add_argument("--always-screenshot", action="store_true",
+                        help="Screenshot every page, not only pages that fail")
+    parser.add_argument("--diagnostics-dir", default=DEFAULT_DIAGNOSTICS_DIR,
+                        help=f"Directory for failure screenshots and DOM snapshots "
+                             f"(default: {DEFAULT_DIAGNOSTICS_DIR})")
+    parser.add_argument("--diagnostics-keep", type=int, default=DEFAULT_MAX_CAPTURES, metavar="N",
+                        help=f"Keep at most N captures, deleting the oldest "
+                             f"(default: {DEFAULT_MAX_CAPTURES})")
+    parser.add_argument("--diagnostics-max-mb", type=float, default=DEFAULT_MAX_MB,
+                        help=f"Delete the oldest captures beyond this size (default: {DEFAULT_MAX_MB})")
+
+def diagnostics_from_args(args):
+    """Configure the shared diagnostics from parsed arguments"""
+    diagnostics.directory = args.diagnostics_dir
+    diagnostics.always_screenshot = args.always_screenshot
+    diagnostics.max_captures = args.diagnostics_keep
+    diagnostics.max_bytes = int(args.diagnostics_max_mb * 1024 * 1024)
+    return diagnostics
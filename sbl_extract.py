@@ -0,0 +1,71 @@
+import re
+from sbl_metrics import metrics
+
+# Pulls every matching table on the page in a single evaluation. Running this
+# inside the browser means one round-trip per page instead of several per row.
+EXTRACT_TABLES_JS = """
+(selector) => {
+    const text = (el) => (el ? el.innerText : "");
+    const headings = Array.from(document.querySelectorAll("h4")).map(text);
+    return Array.from(document.querySelectorAll(selector)).map((table, index) => {
+        const caption = table.querySelector("caption");
+        const rows = Array.from(table.querySelectorAll("tbody tr"));
+        return {
+            index: index,
+            caption: caption ? text(caption).trim() : "",
+            heading: index < headings.length ? headings[index] : "",
+            headers: Array.from(table.querySelectorAll("thead th")).map(text),
+            rows: rows.map((row) => Array.from(row.querySelectorAll("td")).map(text)),
+            links: rows.map((row) => {
+                const link = row.querySelector("td a");
+                return link ? {text: text(link), href: link.getAttribute("href")} : null;
+            }),
+        };
+    });
+}
+"""
+
+# Called with the path of every table CSV a scraper writes, so a pipeline
+# can start processing tables while the scrape is still running
+table_saved_callbacks = []
+
+def notify_table_saved(path):
+    """Tell registered callbacks that a table CSV has been written"""
+    for callback in table_saved_callbacks:
+        callback(path)
+
+def clean_text(text):
+    """Cell text as both backends report it: whitespace runs, line breaks
+    included, collapsed to one space and the ends trimmed"""
+    return " ".join((text or "").split())
+
+def clean_tables(tables):
+    """Apply clean_text() to every piece of text in extracted tables"""
+    for table in tables:
+        table["caption"] = clean_text(table["caption"])
+        table["heading"] = clean_text(table["heading"])
+        table["headers"] = [clean_text(header) for header in table["headers"]]
+        table["rows"] = [[clean_text(cell) for cell in row] for row in table["rows"]]
+        for link in table["links"]:
+            if link:
+                link["text"] = clean_text(link["text"])
+    return tables
+
+async def extract_tables(page, selector="table"):
+    """Extract all tables matching selector as plain Python structures
+
+    Each table is a dict with:
+    - index: position of the table on the page
+    - caption: text of the table's <caption>, if any
+    - heading: text of the h4 at the same index as the table
+    - headers: list of header cell texts
+    - rows: list of rows, each a list of cell texts
+    - links: per row, the first cell link as {"text", "href"} or None
+    """
+    with metrics.span("extraction", backend="browser", selector=selector):
+        return clean_tables(await page.evaluate(EXTRACT_TABLES_JS, selector))
+
+def table_slug(table):
+    """Build a file-friendly table name from a table's heading"""
+    table_name = table["heading"].strip() if table["heading"] else f"table_{table['index'] + 1}"
+    return re.sub(r'[^\w\s-]', '', table_name).strip().replace(' ', '_').lower()
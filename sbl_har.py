@@ -0,0 +1,188 @@
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import httpx
+
+# Dropped when recording: bodies are stored decoded, so these would be wrong on replay
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+class NotArchivedError(Exception):
+    """Raised when a replayed run requests a URL the archive doesn't have"""
+
+class Archive:
+    """
+    Page traffic recorded to, or replayed from, a HAR file
+
+    When recording, every response the HTTP client or a browser context
+    receives is kept and written out as one HAR file at the end of the run.
+    When replaying, requests are answered from that file through httpx's
+    mock transport and Playwright route interception, and anything not in
+    it fails without touching the network. Repeated requests for a URL get
+    its responses in the order they were recorded, so retries replay too.
+    """
+
+    def __init__(self):
+        self.mode = None
+        self.path = None
+        self.entries = []
+        self.responses = {}  # (method, url) -> [entry, ...]
+        self.positions = {}
+        self.served = 0
+        self.missing = 0
+        self.lock = threading.Lock()
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def record_to(self, path):
+        self.mode = "record"
+        self.path = path
+
+    def replay_from(self, path):
+        """Load a HAR file to answer requests from"""
+        with open(path, encoding="utf-8") as f:
+            har = json.load(f)
+        self.mode = "replay"
+        self.path = path
+        self.entries = har["log"]["entries"]
+        for entry in self.entries:
+            key = (entry["request"]["method"], entry["request"]["url"])
+            self.responses.setdefault(key, []).append(entry)
+
+    def add(self, method, url, status, status_text, headers, body, started, backend):
+        """Record a response; headers is a list of (name, value) pairs"""
+        mime_type = next((value for name, value in headers if name.lower() == "content-type"), "")
+        try:
+            content = {"size": len(body), "mimeType": mime_type, "text": body.decode("utf-8")}
+        except UnicodeDecodeError:
+            content = {"size": len(body), "mimeType": mime_type,
+                       "text": base64.b64encode(body).decode("ascii"), "encoding": "base64"}
+        elapsed = round((time.time() - started) * 1000, 3)
+        entry = {
+            "startedDateTime": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+            "time": elapsed,
+            "request": {"method": method, "url": url, "httpVersion": "HTTP/1.1", "cookies": [],
+                        "headers": [], "queryString": [], "headersSize": -1, "bodySize": 0},
+            "response": {"status": status, "statusText": status_text, "httpVersion": "HTTP/1.1",
+                         "cookies": [], "redirectURL": "", "headersSize": -1, "bodySize": len(body),
+                         "headers": [{"name": name, "value": value} for name, value in headers
+                                     if name.lower() not in HOP_HEADERS],
+                         "content": content},
+            "cache": {},
+            "timings": {"send": 0, "wait": elapsed, "receive": 0},
+            "_backend": backend,
+        }
+        with self.lock:
+            self.entries.append(entry)
+
+    def next_response(self, method, url):
+        """Return (status, status text, headers, body) for a request, or None"""
+        key = (method, url)
+        with self.lock:
+            responses = self.responses.get(key)
+            if not responses:
+                self.missing += 1
+                return None
+            position = self.positions.get(key, 0)
+            # The last response answers any further requests
+            self.positions[key] = min(position + 1, len(responses) - 1)
+            self.served += 1
+        response = responses[position]["response"]
+        content = response["content"]
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(content.get("text", ""))
+        else:
+            body = content.get("text", "").encode("utf-8")
+        headers = [(header["name"], header["value"]) for header in response["headers"]]
+        return response["status"], response["statusText"], headers, body
+
+    def record_httpx(self, url, response, started):
+        """Record an httpx response under the URL requested, before any redirects"""
+        self.add(response.request.method, url, response.status_code, response.reason_phrase,
+                 list(response.headers.multi_items()), response.content, started, "http")
+
+    def transport(self):
+        """An httpx transport that answers from the archive"""
+        def handle(request):
+            recorded = self.next_response(request.method, str(request.url))
+            if recorded is None:
+                raise NotArchivedError(f"{request.method} {request.url} is not in {self.path}")
+            status, _, headers, body = recorded
+            return httpx.Response(status, headers=headers, content=body, request=request)
+        return httpx.MockTransport(handle)
+
+    async def fetch(self, route):
+        """Send a browser request to the network, recording the response"""
+        started = time.time()
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.abort()
+            return
+        headers = [(header["name"], header["value"]) for header in response.headers_array]
+        self.add(route.request.method, route.request.url, response.status, response.status_text,
+                 headers, body, started, "browser")
+        await route.fulfill(response=response, body=body)
+
+    async def fulfill(self, route):
+        """Answer a browser request from the archive, or abort it"""
+        recorded = self.next_response(route.request.method, route.request.url)
+        if recorded is None:
+            await route.abort("internetdisconnected")
+            return
+        status, _, headers, body = recorded
+        await route.fulfill(status=status, headers=dict(headers), body=body)
+
+    def save(self):
+        """Write the recorded traffic atomically, ordered by start time"""
+        har = {"log": {
+            "version": "1.2",
+            "creator": {"name": "sbl-scraper", "version": "1.0"},
+            "pages": [],
+            "entries": sorted(self.entries, key=lambda entry: entry["startedDateTime"]),
+        }}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(har, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        if self.recording:
+            return f"Recorded {len(self.entries)} responses to {self.path}"
+        line = f"Replayed {self.served} responses from {self.path}"
+        if self.missing:
+            line += f", {self.missing} requests not in the archive"
+        return line
+
+    def close(self):
+        if self.recording:
+            self.save()
+
+# Shared by the HTTP client and every browser context in a run
+archive = Archive()
+
+def add_archive_args(parser):
+    """Add HAR record and replay options to an argument parser"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="HAR",
+                       help="Save every response this run receives to a HAR file")
+    group.add_argument("--replay", metavar="HAR",
+                       help="Serve every request from a recorded HAR file, without the network")
+
+def archive_from_args(args):
+    """Configure the shared archive from parsed arguments"""
+    if args.record:
+        archive.record_to(args.record)
+    elif args.replay:
+        archive.replay_from(args.replay)
+    return archive
@@ -0,0 +1,161 @@
+import re
+import time
+import httpx
+from lxml import html as lxml_html
+from sbl_extract import clean_text
+from sbl_har import archive
+from sbl_metrics import metrics
+
+USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+class HttpFetcher:
+    """
+    Pooled keep-alive HTTP client for pages that don't need a browser
+    """
+
+    def __init__(self, max_connections=10, timeout=30.0, cache=None, limiter=None):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+            # A replayed run never touches the network
+            transport=archive.transport() if archive.replaying else None,
+        )
+        self.cache = cache
+        self.limiter = limiter
+        self.requests = 0
+        self.downloaded_bytes = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def get(self, url):
+        """Fetch url and return the decoded body
+
+        With a cache, fresh pages are served without a request and stale
+        ones are revalidated with If-None-Match/If-Modified-Since. Recorded
+        and replayed runs skip the page cache, so the archive holds full
+        responses rather than 304s.
+        """
+        entry = self.cache.lookup(url) if self.cache and not archive.mode else None
+        if entry and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return self.cache.read(entry)
+        
+        headers = self.cache.conditional_headers(entry) if entry else {}
+        
+        async def send():
+            started = time.time()
+            with metrics.span("navigation", backend="http", url=url):
+                response = await self.client.get(url, headers=headers)
+            if archive.recording:
+                archive.record_httpx(url, response, started)
+            self.requests += 1
+            self.downloaded_bytes += len(response.content)
+            metrics.count("bytes", len(response.content), backend="http")
+            if not (entry and response.status_code == 304):
+                response.raise_for_status()
+            return response
+        
+        # A Scheduler retries timeouts and 5xx responses; a RateLimiter only paces
+        response = await self.limiter.call(url, send) if self.limiter else await send()
+        if entry and response.status_code == 304:
+            self.cache.mark_revalidated(entry)
+            return self.cache.read(entry)
+        
+        if self.cache:
+            self.cache.store(url, response.text,
+                             etag=response.headers.get("ETag"),
+                             last_modified=response.headers.get("Last-Modified"))
+        return response.text
+
+    def summary(self):
+        return f"HTTP requests: {self.requests} ({self.downloaded_bytes / 1024:.1f} KiB)"
+
+def parse_page(html):
+    """Parse an HTML document"""
+    return lxml_html.fromstring(html)
+
+def _selector_xpath(selector):
+    """Translate a simple "tag" or "tag.class" selector into XPath"""
+    # Only the selectors used by the scrapers are supported; anything
+    # richer belongs in the browser backend.
+    match = re.fullmatch(r'([a-z0-9]+)(?:\.([\w-]+))?', selector)
+    if not match:
+        raise ValueError(f"Unsupported selector: {selector}")
+    tag, class_name = match.groups()
+    if class_name:
+        return f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+    return f"//{tag}"
+
+# Elements innerText puts on their own line, so their text never runs into a neighbour's
+LINE_BREAK_TAGS = {"br", "div", "p", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+# Elements innerText leaves out
+HIDDEN_TAGS = {"script", "style", "template", "noscript"}
+
+def _collect_text(element, parts):
+    if element.tag in HIDDEN_TAGS:
+        return
+    if element.tag in LINE_BREAK_TAGS:
+        parts.append("\n")
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        # Comments and processing instructions only contribute their tail
+        if isinstance(child.tag, str):
+            _collect_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+
+def _text(element):
+    """innerText of an element, cleaned the same way as the browser backend's"""
+    parts = []
+    _collect_text(element, parts)
+    return clean_text("".join(parts))
+
+def select_text(doc, selector):
+    """Return the text of every element matching selector"""
+    return [_text(element) for element in doc.xpath(_selector_xpath(selector))]
+
+def parse_tables(doc, selector="table"):
+    """Extract tables from a parsed document
+
+    Returns the same structure as sbl_extract.extract_tables() so both
+    backends feed the same CSV writers.
+    """
+    with metrics.span("extraction", backend="http", selector=selector):
+        return _parse_tables(doc, selector)
+
+def _parse_tables(doc, selector):
+    headings = select_text(doc, "h4")
+    tables = []
+    for index, table in enumerate(doc.xpath(_selector_xpath(selector))):
+        captions = table.xpath("./caption")
+        # Browsers insert <tbody> when the markup omits it; lxml doesn't
+        rows = table.xpath("./tbody/tr | ./tr")
+        links = []
+        for row in rows:
+            row_links = row.xpath("./td//a")
+            if row_links:
+                links.append({"text": _text(row_links[0]), "href": row_links[0].get("href")})
+            else:
+                links.append(None)
+        tables.append({
+            "index": index,
+            "caption": _text(captions[0]) if captions else "",
+            "heading": headings[index] if index < len(headings) else "",
+            "headers": [_text(th) for th in table.xpath("./thead//th")],
+            "rows": [[_text(td) for td in row.xpath("./td")] for row in rows],
+            "links": links,
+        })
+    return tables
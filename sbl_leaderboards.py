@@ -0,0 +1,148 @@
+import json
+import os
+from datetime import datetime, timezone
+import pandas as pd
+from sbl_columnar import load_team_index
+from sbl_normalize import COUNT, PERSON_ID_COLUMN, RATE, downcast, normalize_frame
+
+LEADERBOARDS_DIRNAME = "leaderboards"
+LEADERBOARDS_JSON = "leaderboards.json"
+DEFAULT_TOP_N = 10
+
+# Identifiers, not statistics
+ID_COLUMNS = {PERSON_ID_COLUMN, "team_id"}
+
+def read_team_tables(processed_dir):
+    """Every team's processed tables, concatenated into one league-wide frame per kind"""
+    team_index = load_team_index(f"{processed_dir}/teams.csv")
+    teams_dir = f"{processed_dir}/teams"
+    frames = {}
+    for team_dir in sorted(os.listdir(teams_dir)) if os.path.isdir(teams_dir) else []:
+        team = team_index.get(team_dir, {"team_id": None, "team_name": team_dir.replace('_', ' ')})
+        for file in sorted(os.listdir(f"{teams_dir}/{team_dir}")):
+            if not file.endswith(".csv"):
+                continue
+            kind = file[:-len(".csv")]
+            df = normalize_frame(pd.read_csv(f"{teams_dir}/{team_dir}/{file}"), "team", kind)
+            df["team_id"] = team["team_id"]
+            df["team_name"] = team["team_name"]
+            frames.setdefault(kind, []).append(df)
+    return {kind: pd.concat(kind_frames, ignore_index=True) for kind, kind_frames in frames.items()}
+
+def read_player_tables(processed_dir):
+    """The processed league-wide player tables by kind"""
+    players_dir = f"{processed_dir}/players"
+    frames = {}
+    for file in sorted(os.listdir(players_dir)) if os.path.isdir(players_dir) else []:
+        if file.endswith(".csv"):
+            kind = file[:-len(".csv")]
+            frames[kind] = normalize_frame(pd.read_csv(f"{players_dir}/{file}"), "player", kind)
+    return frames
+
+def stat_columns(df):
+    return [column for column in df.columns
+            if column not in ID_COLUMNS and pd.api.types.is_numeric_dtype(df[column])]
+
+def rank_table(df):
+    """Add a <stat>_rank and <stat>_pct column for every numeric stat
+
+    Ranks run from 1 for the highest value, with ties sharing the best
+    rank. The percentile is the share of players at or below a value.
+    Both are computed for all columns in one rank() call each.
+    """
+    stats = df[stat_columns(df)]
+    ranks = stats.rank(ascending=False, method="min")
+    percentiles = stats.rank(ascending=True, method="max", pct=True) * 100
+    ranked = {column: df[column] for column in df.columns}
+    for column in stats.columns:
+        ranked[f"{column}_rank"] = downcast(ranks[column], COUNT)
+        ranked[f"{column}_pct"] = downcast(percentiles[column].round(1), RATE)
+    return pd.DataFrame(ranked, index=df.index)
+
+def team_aggregates(df):
+    """Per-team totals of whole-number stats and means of averages and percentages"""
+    stats = stat_columns(df)
+    how = {column: "sum" if pd.api.types.is_integer_dtype(df[column]) else "mean" for column in stats}
+    aggregates = df.groupby("team_name", sort=True, observed=True).agg(how)
+    aggregates.insert(0, "players", df.groupby("team_name", sort=True, observed=True).size())
+    return aggregates
+
+def plain(value):
+    """A NumPy scalar as a JSON value, with NaN as null and float32 noise rounded off"""
+    if pd.isna(value):
+        return None
+    value = value.item() if hasattr(value, "item") else value
+    return round(value, 3) if isinstance(value, float) else value
+
+def leaders(ranked, top_n):
+    """Top rows for every stat, for a JSON leaderboard"""
+    labels = [column for column in ("Player", PERSON_ID_COLUMN, "team_name") if column in ranked.columns]
+    boards = {}
+    for column in stat_columns(ranked):
+        if column.endswith(("_rank", "_pct")):
+            continue
+        # Missing values have no rank
+        top = ranked[ranked[f"{column}_rank"].le(top_n).fillna(False).astype(bool)]
+        top = top.sort_values([f"{column}_rank", *labels[:1]])
+        boards[column] = [{"rank": plain(rank), **{label: plain(value) for label, value in zip(labels, row)},
+                           "value": plain(stat), "pct": plain(pct)}
+                          for rank, stat, pct, row in zip(top[f"{column}_rank"], top[column], top[f"{column}_pct"],
+                                                          top[labels].itertuples(index=False))]
+    return boards
+
+def write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def build_leaderboards(processed_dir, competition=None, top_n=DEFAULT_TOP_N):
+    """Write league-wide ranks, percentiles, team aggregates and leaderboards
+
+    Writes <processed_dir>/leaderboards/leaderboards.json with the top
+    top_n rows for every stat and each team's aggregates, and one Parquet
+    file per table with every row's ranks and percentiles, e.g.
+    teams_totals.parquet and players_averages.parquet, plus
+    team_aggregates_<kind>.parquet. Returns the number of tables ranked.
+    """
+    output_dir = f"{processed_dir}/{LEADERBOARDS_DIRNAME}"
+    os.makedirs(output_dir, exist_ok=True)
+    tables = {}
+    for source, frames in (("teams", read_team_tables(processed_dir)), ("players", read_player_tables(processed_dir))):
+        for kind, df in frames.items():
+            ranked = rank_table(df)
+            name = f"{source}_{kind}"
+            write_atomic(f"{output_dir}/{name}.parquet", lambda path: ranked.to_parquet(path, index=False))
+            tables[name] = {"rows": len(ranked), "leaders": leaders(ranked, top_n)}
+            if source == "teams":
+                aggregates = team_aggregates(df)
+                write_atomic(f"{output_dir}/team_aggregates_{kind}.parquet", lambda path: aggregates.to_parquet(path))
+                tables[name]["team_aggregates"] = {
+                    team: {column: plain(value) for column, value in row.items()}
+                    for team, row in aggregates.to_dict("index").items()}
+
+    artifact = {
+        "competition": competition,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "top_n": top_n,
+        "tables": tables,
+    }
+
+    def write_json(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+
+    # Servers reading the directory never see a partial artifact
+    write_atomic(f"{output_dir}/{LEADERBOARDS_JSON}", write_json)
+    
+    # Drop files for tables that no longer exist
+    written = {f"{name}.parquet" for name in tables}
+    written.update(f"team_aggregates_{name[len('teams_'):]}.parquet" for name in tables if name.startswith("teams_"))
+    for file in os.listdir(output_dir):
+        if file.endswith(".parquet") and file not in written:
+            os.remove(f"{output_dir}/{file}")
+    return len(tables)
+
+def read_leaderboards(processed_dir):
+    """The leaderboards artifact written by build_leaderboards()"""
+    with open(f"{processed_dir}/{LEADERBOARDS_DIRNAME}/{LEADERBOARDS_JSON}", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Manifest:
+    """
+    Tracks processed input files so unchanged inputs can be skipped
+
+    Each input path maps to its size, mtime, content hash and the output it
+    produced. Size and mtime are checked first; the hash is only computed
+    when they differ, so touching a file without changing it is cheap.
+    """
+
+    def __init__(self, path, force=False):
+        self.path = path
+        self.force = force
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        self.seen = set()
+        self.skipped = 0
+        self.processed = 0
+        self.recorded = []
+
+    def is_current(self, input_path, output_path):
+        """Check whether input_path is unchanged since it produced output_path"""
+        self.seen.add(input_path)
+        entry = self.entries.get(input_path)
+        if self.force or entry is None or entry["output"] != output_path or not os.path.exists(output_path):
+            return False
+
+        stat = os.stat(input_path)
+        if stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]:
+            return True
+        if stat.st_size != entry["size"]:
+            return False
+
+        # Same size, new mtime: compare contents before reprocessing
+        if file_hash(input_path) != entry["hash"]:
+            return False
+        entry["mtime"] = stat.st_mtime
+        return True
+
+    def check(self, input_path, output_path):
+        """Like is_current(), but also counts the file as skipped"""
+        if self.is_current(input_path, output_path):
+            self.skipped += 1
+            return True
+        return False
+
+    def record(self, input_path, output_path):
+        """Record that input_path has been processed into output_path"""
+        self.seen.add(input_path)
+        stat = os.stat(input_path)
+        self.entries[input_path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": file_hash(input_path),
+            "output": output_path,
+        }
+        self.processed += 1
+        self.recorded.append(output_path)
+
+    def remove_stale(self, on_remove=None):
+        """Delete outputs whose inputs no longer exist and return their paths
+
+        on_remove is called with each output path just before it is deleted.
+        """
+        removed = []
+        for input_path in list(self.entries):
+            if input_path in self.seen or os.path.exists(input_path):
+                continue
+            output_path = self.entries.pop(input_path)["output"]
+            if os.path.exists(output_path):
+                if on_remove:
+                    on_remove(output_path)
+                os.remove(output_path)
+                removed.append(output_path)
+                # Drop the output directory too once it is empty
+                output_dir = os.path.dirname(output_path)
+                if output_dir and not os.listdir(output_dir):
+                    os.rmdir(output_dir)
+        return removed
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,168 @@
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+METRIC_PREFIX = "sbl"
+
+class Metrics:
+    """
+    Timed spans and counters for scraper and processor stages
+
+    Every finished span and counter update can be streamed as a JSON line.
+    Totals per span and counter name are kept for a Prometheus textfile
+    and the end-of-run summary. Safe to use from worker threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}      # name -> [count, total seconds, max seconds]
+        self.counters = {}   # name -> total
+        self.log = None
+        self.textfile = None
+
+    def open_log(self, path):
+        """Stream events as JSON lines to path, appending across runs"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.log = open(path, "a", encoding="utf-8")
+
+    def emit(self, event):
+        if self.log is None:
+            return
+        event["ts"] = round(time.time(), 3)
+        line = json.dumps(event, default=str) + "\n"
+        with self.lock:
+            self.log.write(line)
+            self.log.flush()
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """Time a block; fields such as url or team are only written to the log"""
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                totals = self.spans.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] = max(totals[2], seconds)
+            self.emit({"type": "span", "name": name, "seconds": round(seconds, 6), "status": status, **fields})
+
+    def count(self, name, value=1, **fields):
+        """Add to a counter such as rows, bytes, retries or failures"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.emit({"type": "counter", "name": name, "value": value, **fields})
+
+    def start_buffering(self):
+        """Start from empty totals and keep log lines in memory, in a worker process
+
+        The parent process adds what the worker collected with merge().
+        """
+        self.spans = {}
+        self.counters = {}
+        self.log = io.StringIO()
+        self.textfile = None
+
+    def export(self):
+        """Hand over the totals and log lines collected since the last export"""
+        with self.lock:
+            exported = {"spans": self.spans, "counters": self.counters,
+                        "log": self.log.getvalue() if isinstance(self.log, io.StringIO) else ""}
+            self.spans = {}
+            self.counters = {}
+            if isinstance(self.log, io.StringIO):
+                self.log = io.StringIO()
+        return exported
+
+    def merge(self, exported):
+        """Add totals exported by a worker process, and write its log lines to our log"""
+        with self.lock:
+            for name, (count, total, longest) in exported["spans"].items():
+                totals = self.spans.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += count
+                totals[1] += total
+                totals[2] = max(totals[2], longest)
+            for name, total in exported["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + total
+            if self.log is not None and exported["log"]:
+                self.log.write(exported["log"])
+                self.log.flush()
+
+    def prometheus(self):
+        """Totals in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_span_seconds_total Time spent in each stage",
+            f"# TYPE {METRIC_PREFIX}_span_seconds_total counter",
+        ]
+        spans = sorted(self.spans.items())
+        lines += [f'{METRIC_PREFIX}_span_seconds_total{{span="{name}"}} {total:.6f}'
+                  for name, (_, total, _) in spans]
+        lines += [
+            f"# HELP {METRIC_PREFIX}_span_count_total Times each stage ran",
+            f"# TYPE {METRIC_PREFIX}_span_count_total counter",
+        ]
+        lines += [f'{METRIC_PREFIX}_span_count_total{{span="{name}"}} {count}' for name, (count, _, _) in spans]
+        lines += [
+            f"# HELP {METRIC_PREFIX}_span_max_seconds Slowest single run of each stage",
+            f"# TYPE {METRIC_PREFIX}_span_max_seconds gauge",
+        ]
+        lines += [f'{METRIC_PREFIX}_span_max_seconds{{span="{name}"}} {longest:.6f}'
+                  for name, (_, _, longest) in spans]
+        for name, total in sorted(self.counters.items()):
+            lines += [
+                f"# TYPE {METRIC_PREFIX}_{name}_total counter",
+                f"{METRIC_PREFIX}_{name}_total {total}",
+            ]
+        lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Write the textfile-collector file atomically, so it is never read half-written"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        lines = []
+        for name, (count, total, longest) in sorted(self.spans.items()):
+            lines.append(f"  {name}: {total:.2f}s over {count} run(s), slowest {longest:.2f}s")
+        for name, total in sorted(self.counters.items()):
+            lines.append(f"  {name}: {total}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.textfile:
+            self.write_textfile(self.textfile)
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+# Shared by every module in a run, like the table-saved callbacks
+metrics = Metrics()
+
+def add_metrics_args(parser):
+    """Add metrics export options to an argument parser"""
+    parser.add_argument("--metrics-log", default=None, metavar="PATH",
+                        help="Append every span and counter as JSON lines to this file")
+    parser.add_argument("--metrics-textfile", default=None, metavar="PATH",
+                        help="Write totals in Prometheus textfile-collector format to this file "
+                             "at the end of the run, e.g. /var/lib/node_exporter/sbl.prom")
+
+def metrics_from_args(args):
+    """Configure the shared metrics from parsed arguments"""
+    if args.metrics_log:
+        metrics.open_log(args.metrics_log)
+    metrics.textfile = args.metrics_textfile
+    return metrics
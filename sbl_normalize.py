@@ -0,0 +1,209 @@
+import re
+import pandas as pd
+from sbl_competitions import SITE_URL
+from sbl_metrics import metrics
+
+# Column types. Every conversion below works on whole columns; no column is
+# processed with a per-row Python function.
+NAME = "name"          # free text, kept as a string
+CATEGORY = "category"  # repeated labels, stored as a pandas categorical
+URL = "url"            # profile link; a Person_ID column is derived from it
+MINUTES = "minutes"    # "878:41" -> 52721 seconds
+PERCENT = "percent"    # "50.3" or "50.3%" -> 50.3, in percentage points
+COUNT = "count"        # whole numbers, downcast to the smallest integer type
+RATE = "rate"          # per-game averages and ratios, downcast to float32
+ID = "id"              # identifiers, always nullable Int64 and never downcast
+
+PERSON_ID_COLUMN = "Person_ID"
+
+def columns(column_type, *names):
+    """Schema entries that keep each column's name"""
+    return {name: (name, column_type) for name in names}
+
+COMMON_COLUMNS = {
+    "Player": ("Player", NAME),
+    "Player_URL": ("Player_URL", URL),
+    PERSON_ID_COLUMN: (PERSON_ID_COLUMN, ID),
+}
+
+# Raw column name -> (normalized name, type), one mapping per table kind.
+# Sources are "team" for the per-team tables, "player" for the league-wide
+# player tables and "teams" for the teams list.
+TABLE_SCHEMAS = {
+    ("team", "totals"): {
+        **columns(COUNT, "EFF", "G", "GS", "PTS", "OFF", "DEF", "REB", "AST", "STL", "BLK",
+                  "2PM", "2PA", "3PM", "3PA", "FTM", "FTA", "Tot Fouls", "Fls On", "TO"),
+        "Min": ("Min_sec", MINUTES),
+    },
+    ("team", "per_game"): columns(RATE, "MPG", "PPG", "ORPG", "DRPG", "RPG", "APG", "STPG", "BLKPG",
+                                  "Tot Fouls PG", "FOPG", "TOPG"),
+    ("team", "shooting"): {
+        **columns(RATE, "2PMPG", "2PAPG", "3PAPG", "3PMPG", "FTMPG", "FTAPG", "2CPPG"),
+        **columns(PERCENT, "2P%", "3P%", "FT%"),
+    },
+    ("player", "averages"): {
+        **columns(COUNT, "EFF"),
+        **columns(RATE, "PPG", "APG", "RPG", "ORPG", "DRPG", "BLKPG", "STPG", "TOPG", "FOPG"),
+    },
+    ("player", "shooting_statistics"): {
+        **columns(COUNT, "G", "2PM", "2PA", "3PM", "3PA"),
+        **columns(PERCENT, "FG%", "2P%", "3P%", "FT%"),
+        **columns(RATE, "FTAPG"),
+    },
+    ("player", "table_3"): {
+        **columns(COUNT, "G", "GS", "EFF", "+/-"),
+        **columns(RATE, "MPG", "A/TO", "+/- PG", "Tot Fouls PG"),
+    },
+    ("teams", "teams"): {
+        "ID": ("ID", COUNT),
+        "Name": ("Name", NAME),
+        "URL": ("URL", NAME),
+    },
+}
+
+MINUTES_PATTERN = r'^\s*(\d+):(\d{1,2})\s*$'
+
+def infer_type(name, values):
+    """Type for a column missing from its schema, e.g. from a new table"""
+    if name.endswith("%"):
+        return PERCENT
+    if pd.api.types.is_numeric_dtype(values):
+        return COUNT if (values.dropna() % 1 == 0).all() else RATE
+    text = values.dropna().astype("string")
+    if len(text) and text.str.match(MINUTES_PATTERN).all():
+        return MINUTES
+    numbers = pd.to_numeric(text, errors="coerce")
+    if len(text) and numbers.notna().all():
+        return COUNT if (numbers % 1 == 0).all() else RATE
+    if len(text) and text.nunique() <= len(text) // 2:
+        return CATEGORY
+    return NAME
+
+def downcast(values, column_type):
+    """Smallest numeric dtype for a column
+
+    Whole-number counts get the smallest integer type, or its nullable
+    version (e.g. Int16) when cells are missing, so they are never written
+    as "1.0". Everything else becomes float32 with missing values as NaN.
+    """
+    if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        values = values.astype("float64")
+    if column_type == COUNT and (values.dropna() % 1 == 0).all():
+        if values.notna().all():
+            return pd.to_numeric(values, downcast="integer")
+        smallest = pd.to_numeric(values.dropna(), downcast="integer").dtype
+        return values.astype(smallest.name.capitalize())
+    return pd.to_numeric(values, downcast="float")
+
+def numeric(values):
+    """Column as numbers; cells that aren't numbers become NaN"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    return pd.to_numeric(values.astype("string").str.strip(), errors="coerce")
+
+def to_seconds(values):
+    """MM:SS durations to seconds; values that are already numbers are kept"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    parts = values.astype("string").str.extract(MINUTES_PATTERN)
+    return pd.to_numeric(parts[0]) * 60 + pd.to_numeric(parts[1])
+
+def to_percent(values):
+    """Percentages to floats, with or without a trailing %"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    return pd.to_numeric(values.astype("string").str.strip().str.rstrip("%"), errors="coerce")
+
+def fix_urls(values):
+    """Profile URLs with the duplicated site prefix removed"""
+    return values.astype("string").str.replace(SITE_URL + SITE_URL, SITE_URL, regex=False)
+
+# The person ID in a profile URL such as .../competition/38899/person/1693023?
+PERSON_ID_PATTERN = r'/person/(\d+)'
+
+def person_id_from_url(url):
+    """Person ID of one profile URL as a string, or None"""
+    match = re.search(PERSON_ID_PATTERN, url or "")
+    return match.group(1) if match else None
+
+def person_ids(urls):
+    """Person ID of each profile URL as a nullable Int64 column"""
+    return urls.str.extract(PERSON_ID_PATTERN, expand=False).astype("Int64")
+
+def to_ids(values):
+    """Identifiers as nullable Int64, without passing through float"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("Int64")
+    text = values.astype("string").str.strip().str.replace(r"\.0$", "", regex=True)
+    return text.where(text.str.fullmatch(r"\d+")).astype("Int64")
+
+def report_coerced(name, raw, converted):
+    """Print and count cells that had a value but didn't parse as a number"""
+    if pd.api.types.is_numeric_dtype(raw):
+        return
+    text = raw.astype("string").str.strip()
+    lost = text.notna() & (text != "") & converted.isna()
+    count = int(lost.sum())
+    if count:
+        print(f"Column {name}: {count} cell(s) that aren't numbers set to missing, e.g. {text[lost].iloc[0]!r}")
+        metrics.count("coerced_cells", count, column=name)
+
+def frame_from_rows(headers, rows):
+    """Raw extracted cells as the frame pandas would read from their CSV
+
+    Empty cells become missing values, short rows are padded and repeated
+    header names get a ".1" suffix, so normalize_frame gives the same
+    result as it does for the scraped CSV files.
+    """
+    names = []
+    seen = {}
+    for header in headers:
+        count = seen.get(header, 0)
+        seen[header] = count + 1
+        names.append(f"{header}.{count}" if count else header)
+    width = len(names)
+    cells = [[cell if cell != "" else None for cell in (row + [None] * width)[:width]] for row in rows]
+    return pd.DataFrame(cells, columns=names, dtype="object")
+
+def normalize_frame(df, source, kind):
+    """Rename and convert a raw stat table using the schema for its kind
+
+    Columns the schema doesn't list keep their name and get an inferred
+    type. Normalizing a frame that is already normalized (e.g. one read
+    back from a processed CSV) leaves it unchanged.
+    """
+    schema = {**COMMON_COLUMNS, **TABLE_SCHEMAS.get((source, kind), {})}
+    normalized = {new_name: (new_name, column_type) for new_name, column_type in schema.values()}
+    result = {}
+    for name in df.columns:
+        values = df[name]
+        new_name, column_type = schema.get(name) or normalized.get(name) or (name, infer_type(name, values))
+
+        if column_type == URL:
+            values = fix_urls(values)
+            result[name] = values
+            result[PERSON_ID_COLUMN] = person_ids(values)
+            continue
+        if column_type == MINUTES:
+            values = downcast(to_seconds(values), COUNT)
+        elif column_type == PERCENT:
+            values = downcast(to_percent(values), RATE)
+        elif column_type in (COUNT, RATE):
+            values = downcast(numeric(values), column_type)
+        elif column_type == ID:
+            values = to_ids(values)
+        elif column_type == CATEGORY:
+            values = values.astype("category")
+        else:
+            values = values.astype("string")
+        if column_type in (MINUTES, PERCENT, COUNT, RATE, ID):
+            report_coerced(name, df[name], values)
+        result[new_name] = values
+    return pd.DataFrame(result, index=df.index)
+
+def categorize(df, names):
+    """Store repeated labels such as team names as categoricals"""
+    for name in names:
+        if name in df.columns:
+            df[name] = df[name].astype("category")
+    return df
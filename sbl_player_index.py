@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+import os
+from sbl_metrics import metrics
+from sbl_normalize import person_id_from_url
+
+WIDE_TABLE = "players_wide.csv"
+WIDE_INDEX = "players_wide.index.json"
+
+# Identify the player rather than hold a stat; written first, once
+KEY_COLUMNS = ["Person_ID", "Player", "Player_URL"]
+
+def csv_line(row):
+    """One CSV row as UTF-8 bytes"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+def join_player_tables(players_dir):
+    """Join every player table into one row per player
+
+    One pass over each table through a dict keyed by the person ID from
+    Player_URL (the name for rows without a link). Columns such as EFF
+    and G that appear in several tables become a single column, taking
+    the first table's value where it has one, in file name order. Returns
+    (columns, rows, conflicts), where conflicts counts cells whose tables
+    disagreed.
+    """
+    columns = list(KEY_COLUMNS)
+    players = {}
+    conflicts = {}
+    for file in sorted(os.listdir(players_dir)) if os.path.isdir(players_dir) else []:
+        if not file.endswith(".csv"):
+            continue
+        with open(f"{players_dir}/{file}", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            columns += [column for column in header if column not in columns]
+            for row in reader:
+                values = dict(zip(header, row))
+                person_id = person_id_from_url(values.get("Player_URL"))
+                key = person_id or f"name:{values.get('Player', '')}"
+                player = players.setdefault(key, {"Person_ID": person_id or ""})
+                for column, value in values.items():
+                    if column == "Person_ID" or value == "":
+                        continue
+                    existing = player.get(column)
+                    if existing is None or existing == "":
+                        player[column] = value
+                    elif existing != value and column not in KEY_COLUMNS:
+                        conflicts[column] = conflicts.get(column, 0) + 1
+    rows = [[player.get(column, "") for column in columns] for player in players.values()]
+    return columns, rows, conflicts
+
+def build_player_index(processed_dir):
+    """Write the wide player table and its person ID index for a processed directory
+
+    players_wide.csv has one row per player with every player table's
+    columns. players_wide.index.json maps each person ID to the byte
+    offset and length of its row, so PlayerIndex.get() reads one line
+    instead of the three player tables. Returns (players, conflicts).
+    """
+    columns, rows, conflicts = join_player_tables(f"{processed_dir}/players")
+    table_path = f"{processed_dir}/{WIDE_TABLE}"
+    index = {}
+    with open(table_path + ".tmp", "wb") as f:
+        offset = f.write(csv_line(columns))
+        for row in rows:
+            line = csv_line(row)
+            if row[0]:
+                index[row[0]] = [offset, len(line)]
+            offset += f.write(line)
+    with open(f"{processed_dir}/{WIDE_INDEX}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"table": WIDE_TABLE, "columns": columns, "rows": index}, f, separators=(",", ":"))
+    # Table first: the index never points into an older table
+    os.replace(table_path + ".tmp", table_path)
+    os.replace(f"{processed_dir}/{WIDE_INDEX}.tmp", f"{processed_dir}/{WIDE_INDEX}")
+    for column, count in conflicts.items():
+        metrics.count("player_conflicts", count, column=column)
+    return len(rows), conflicts
+
+class PlayerIndex:
+    """
+    O(1) lookups of a player's joined statistics by person ID
+
+    Loads the index once; each lookup seeks straight to the player's row.
+    """
+
+    def __init__(self, processed_dir):
+        self.processed_dir = processed_dir
+        with open(f"{processed_dir}/{WIDE_INDEX}", encoding="utf-8") as f:
+            index = json.load(f)
+        self.columns = index["columns"]
+        self.rows = index["rows"]
+        self.file = open(f"{processed_dir}/{index['table']}", "rb")
+
+    def __contains__(self, person_id):
+        return str(person_id) in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, person_id):
+        """The player's row as a dict of column to raw value, or None"""
+        position = self.rows.get(str(person_id))
+        if position is None:
+            return None
+        offset, length = position
+        self.file.seek(offset)
+        row = next(csv.reader(io.StringIO(self.file.read(length).decode("utf-8"))))
+        return dict(zip(self.columns, row))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
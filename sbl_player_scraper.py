@@ -1,122 +1,245 @@
+import argparse
 import asyncio
 import os
 import csv
-import re
 from playwright.async_api import async_playwright
+from sbl_browser import LazyBrowser, LoadStats, add_browser_args, goto_ready, new_context, profile_from_args
+from sbl_cache import add_cache_args, cache_from_args
+from sbl_diagnostics import add_diagnostics_args, diagnostics, diagnostics_from_args
+from sbl_extract import extract_tables, notify_table_saved, table_slug
+from sbl_competitions import (COMPETITIONS_DIR, SITE_URL, add_competition_args, competition_data_dir,
+                              competitions_from_args, player_stats_url)
+from sbl_har import add_archive_args, archive, archive_from_args
+from sbl_http import HttpFetcher, parse_page, parse_tables
+from sbl_metrics import add_metrics_args, metrics, metrics_from_args
+from sbl_scheduler import add_scheduler_args, scheduler_from_args
 
-# URL for player statistics
-PLAYER_STATS_URL = "https://hosted.dcd.shared.geniussports.com/SBF/en/competition/38899/statistics/player"
+def player_table_rows(table):
+    """Headers and rows of an extracted player table, with a Player_URL column
 
-async def scrape_player_stats(page):
-    """Scrape player statistics from the player statistics page"""
-    print(f"Scraping player statistics from {PLAYER_STATS_URL}")
+    The name cell's link becomes the plain name, and the link itself an
+    absolute URL in the last column.
+    """
+    headers = list(table["headers"])
+    csv_data = []
     
-    # Navigate to the player statistics page
-    await page.goto(PLAYER_STATS_URL, wait_until="networkidle")
-    
-    # Take screenshot
-    os.makedirs("screenshots", exist_ok=True)
-    await page.screenshot(path="screenshots/player_stats.png")
-    
-    # Wait for the table to load
-    await page.wait_for_selector("table", timeout=30000)
+    # Process all player rows
+    for cells, player_link in zip(table["rows"], table["links"]):
+        # Extract player name and link from the first cell (it contains a link)
+        if player_link:
+            player_name = player_link["text"]
+            player_url = player_link["href"]
+            
+            # For the player name cell, replace the name+link with just the name
+            cells[0] = player_name
+            
+            # Fix the URL
+            if player_url:
+                # Extract just the path part of the URL
+                url_path = player_url.replace(SITE_URL, "")
+                if url_path.startswith("/"):
+                    url_column = f"{SITE_URL}{url_path}"
+                else:
+                    url_column = f"{SITE_URL}/{url_path}"
+            else:
+                url_column = ""
+            
+            # Add the row data with the URL at the end
+            row_data = cells + [url_column]
+            csv_data.append(row_data)
+        else:
+            # No player link, just add the regular data
+            csv_data.append(cells + [""])  # Add empty URL column
     
-    # Find all tables (there might be multiple tables for different stat categories)
-    tables = await page.locator("table").all()
+    # Add URL as the last header
+    headers.append("Player_URL")
+    return headers, csv_data
+
+def save_player_tables(competition_id, tables):
+    """Write extracted player tables to CSV files"""
     print(f"Found {len(tables)} statistics tables")
     
     # Create data directory
-    os.makedirs("data/players", exist_ok=True)
+    players_dir = f"{competition_data_dir(competition_id)}/players"
+    os.makedirs(players_dir, exist_ok=True)
     
     # Process each table
-    for table_index, table in enumerate(tables):
-        # Try to determine what type of statistics this table contains
-        table_header_elements = await page.locator("h4").all()
-        table_header = ""
-        if table_index < len(table_header_elements):
-            table_header = await table_header_elements[table_index].inner_text()
-        
-        # Clean up the table name
-        table_name = table_header.strip() if table_header else f"table_{table_index + 1}"
-        table_name = re.sub(r'[^\w\s-]', '', table_name).strip().replace(' ', '_').lower()
+    for table in tables:
+        table_name = table_slug(table)
         
         print(f"\nProcessing {table_name} table")
         
-        # Get table headers
-        headers = await table.locator("thead th").all_inner_texts()
-        print(f"Headers: {headers}")
-        
-        # Get table rows
-        rows = await table.locator("tbody tr").all()
-        print(f"Found {len(rows)} rows (players)")
-        
-        # Prepare data for CSV
-        csv_data = []
-        
-        # Process all player rows
-        for row in rows:
-            cells = await row.locator("td").all_inner_texts()
-            
-            # Extract player name and link from the first cell (it contains a link)
-            player_links = await row.locator("td a").all()
-            
-            if len(player_links) > 0:
-                player_cell = player_links[0]
-                player_name = await player_cell.inner_text()
-                player_url = await player_cell.get_attribute("href")
-                
-                # For the player name cell, replace the name+link with just the name
-                cells[0] = player_name
-                
-                # Fix the URL
-                if player_url:
-                    # Extract just the path part of the URL
-                    url_path = player_url.replace("https://hosted.dcd.shared.geniussports.com", "")
-                    if url_path.startswith("/"):
-                        url_column = f"https://hosted.dcd.shared.geniussports.com{url_path}"
-                    else:
-                        url_column = f"https://hosted.dcd.shared.geniussports.com/{url_path}"
-                else:
-                    url_column = ""
-                
-                # Add the row data with the URL at the end
-                row_data = cells + [url_column]
-                csv_data.append(row_data)
-            else:
-                # No player link, just add the regular data
-                csv_data.append(cells + [""])  # Add empty URL column
-        
-        # Add URL as the last header
-        headers.append("Player_URL")
+        headers, csv_data = player_table_rows(table)
+        print(f"Headers: {headers[:-1]}")
+        print(f"Found {len(csv_data)} rows (players)")
         
         # Save to CSV
-        csv_filename = f"data/players/{table_name}.csv"
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        csv_filename = f"{players_dir}/{table_name}.csv"
+        with metrics.span("csv_write", path=csv_filename), \
+                open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(headers)  # Write headers
             writer.writerows(csv_data)  # Write data
+        metrics.count("rows", len(csv_data), source="player", table=table_name)
             
         print(f"Saved {len(csv_data)} player records to {csv_filename}")
+        notify_table_saved(csv_filename)
+
+async def scrape_player_stats(page, competition_id, cache=None):
+    """Scrape player statistics from a competition's player statistics page"""
+    url = player_stats_url(competition_id)
+    print(f"Scraping player statistics from {url}")
     
-    return len(tables) > 0
+    try:
+        # Navigate to the player statistics page and wait for the table to load
+        await goto_ready(page, url, "table")
+        
+        # Extract all tables (there might be multiple tables for different stat categories)
+        tables = await extract_tables(page, "table")
+    except Exception as e:
+        await diagnostics.capture(page, f"{competition_id}_player_stats", e)
+        raise
+    if not tables:
+        await diagnostics.capture(page, f"{competition_id}_player_stats", "no tables extracted")
+        return False
+    await diagnostics.success(page, f"{competition_id}_player_stats")
+    
+    save_player_tables(competition_id, tables)
+    if cache:
+        cache.store_json(url, {"tables": tables})
+    
+    return True
+
+async def scrape_player_stats_http(fetcher, competition_id):
+    """Scrape a competition's player statistics without a browser
+    
+    Returns None when the HTML has no tables, so the caller can fall back
+    to the browser backend.
+    """
+    url = player_stats_url(competition_id)
+    print(f"Fetching player statistics from {url} over HTTP")
+    
+    try:
+        doc = parse_page(await fetcher.get(url))
+    except Exception as e:
+        print(f"HTTP fetch failed for player statistics: {e}")
+        return None
+    
+    tables = parse_tables(doc, "table")
+    if not tables:
+        print("No statistics tables in HTML")
+        return None
+    
+    save_player_tables(competition_id, tables)
+    if fetcher.cache:
+        fetcher.cache.store_json(url, {"tables": tables})
+    return True
+
+def load_player_stats_from_cache(cache, competition_id):
+    """Write player CSVs from cached tables if they are still fresh"""
+    url = player_stats_url(competition_id)
+    payload = cache.get_json(url)
+    if payload is None:
+        return None
+    
+    print(f"Using cached player statistics for {url}")
+    save_player_tables(competition_id, payload["tables"])
+    return True
+
+async def scrape_competition_players(competition_id, args, browser, fetcher, cache, profile, stats, limiter):
+    """Scrape one competition's player statistics with the chosen backend"""
+    success = load_player_stats_from_cache(cache, competition_id)
+    if success is None and args.backend == "http":
+        success = await scrape_player_stats_http(fetcher, competition_id)
+        if success is None:
+            print(f"Falling back to the browser for competition {competition_id}")
+            metrics.count("retries", source="player", reason="browser_fallback")
+    if success is None:
+        context = await new_context(await browser.get(), profile, stats, limiter)
+        try:
+            page = await context.new_page()
+            success = await limiter.call(player_stats_url(competition_id),
+                                         lambda: scrape_player_stats(page, competition_id, cache), paced=False)
+        except Exception as e:
+            print(f"Error scraping players for competition {competition_id}: {e}")
+            success = False
+        finally:
+            await context.close()
+    metrics.count("pages" if success else "failures", source="player", competition=competition_id)
+    return success
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape SBL player statistics")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser",
+                        help="Fetch pages with Chromium, or over plain HTTP with a "
+                             "browser fallback (default: browser)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of competitions to scrape concurrently (default: 1)")
+    add_competition_args(parser)
+    add_browser_args(parser)
+    add_cache_args(parser)
+    add_scheduler_args(parser)
+    add_metrics_args(parser)
+    add_diagnostics_args(parser)
+    add_archive_args(parser)
+    return parser.parse_args()
+
+async def run_player_scrape(args, browser, fetcher, cache, profile, stats, limiter):
+    """Scrape every competition's player statistics concurrently
+
+    Shares the browser, HTTP client, cache and rate limiter passed in.
+    Returns a list of (competition_id, success).
+    """
+    competitions = competitions_from_args(args)
+    semaphore = asyncio.Semaphore(max(1, args.workers))
+    
+    async def scrape(competition_id):
+        async with semaphore:
+            return await scrape_competition_players(
+                competition_id, args, browser, fetcher, cache, profile, stats, limiter)
+    
+    results = await asyncio.gather(*(scrape(competition_id) for competition_id in competitions))
+    return list(zip(competitions, results))
 
 async def main():
+    args = parse_args()
+    profile = profile_from_args(args)
+    stats = LoadStats()
+    cache = cache_from_args(args)
+    metrics_from_args(args)
+    diagnostics_from_args(args)
+    archive_from_args(args)
+    
+    # One request budget, retry policy and concurrency limit shared by every competition
+    limiter = scheduler_from_args(args)
+    
     # Create directories
     os.makedirs("data", exist_ok=True)
-    os.makedirs("data/players", exist_ok=True)
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        page = await browser.new_page()
+    async with async_playwright() as p, HttpFetcher(max_connections=args.workers, cache=cache,
+                                                     limiter=limiter) as fetcher:
+        # The browser is only launched if a page actually needs it
+        browser = LazyBrowser(p, profile)
         
-        # Scrape player statistics
-        success = await scrape_player_stats(page)
+        # Scrape player statistics for every competition
+        results = await run_player_scrape(args, browser, fetcher, cache, profile, stats, limiter)
         
         await browser.close()
+        cache.close()
         
         print("\n=== Summary ===")
-        print("Player statistics scraping:", "Success" if success else "Failed")
-        print("Data saved to data/players directory")
+        for competition_id, success in results:
+            print(f"Player statistics scraping ({competition_id}):", "Success" if success else "Failed")
+        print(f"Data saved to {COMPETITIONS_DIR}/<competition>/players directories")
+        print(stats.summary())
+        print(fetcher.summary())
+        print(limiter.summary())
+        print(cache.summary())
+        if archive.mode:
+            print(archive.summary())
+        print(f"Stages:\n{metrics.summary()}")
+        archive.close()
+        metrics.close()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import os
+import re
+from playwright.async_api import async_playwright
+from sbl_browser import LazyBrowser, LoadStats, add_browser_args, goto_ready, new_context, profile_from_args
+from sbl_competitions import COMPETITIONS_DIR, DEFAULT_COMPETITION_ID
+from sbl_diagnostics import add_diagnostics_args, diagnostics, diagnostics_from_args
+from sbl_extract import extract_tables, table_slug
+from sbl_har import add_archive_args, archive, archive_from_args
+from sbl_http import HttpFetcher, parse_page, parse_tables
+from sbl_metrics import add_metrics_args, metrics, metrics_from_args
+from sbl_normalize import person_id_from_url
+from sbl_scheduler import add_scheduler_args, scheduler_from_args
+
+CHECKPOINT_PATH = "data/profiles_checkpoint.jsonl"
+
+def profile_key(url):
+    """Competition and person ID of a profile URL, e.g. ("38899", "1693023")"""
+    person_id = person_id_from_url(url)
+    if person_id is None:
+        return None
+    competition_match = re.search(r'/competition/(\d+)', url)
+    competition_id = competition_match.group(1) if competition_match else DEFAULT_COMPETITION_ID
+    return competition_id, person_id
+
+def collect_profile_urls():
+    """De-duplicated profile URLs from every scraped player table"""
+    paths = sorted(glob.glob(f"{COMPETITIONS_DIR}/*/players/*.csv") + glob.glob("data/players/*.csv"))
+    profiles = {}
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                url = row.get("Player_URL")
+                key = profile_key(url) if url else None
+                if key and key not in profiles:
+                    profiles[key] = {"competition": key[0], "person_id": key[1],
+                                     "name": row.get("Player", ""), "url": url}
+    print(f"Found {len(profiles)} unique player profiles in {len(paths)} player tables")
+    return list(profiles.values())
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """Keys of profiles already saved by an earlier run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            key = (entry["competition"], entry["person_id"])
+            if entry["status"] == "ok":
+                done.add(key)
+            else:
+                done.discard(key)
+    return done
+
+def profile_directory(profile):
+    profile_dir = f"{COMPETITIONS_DIR}/{profile['competition']}/profiles/{profile['person_id']}"
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+def save_profile_tables(profile, tables):
+    """Write a profile's game log and career tables as soon as they are extracted"""
+    profile_dir = profile_directory(profile)
+    for table in tables:
+        table_name = table_slug(table)
+        csv_filename = f"{profile_dir}/{table_name}.csv"
+        with metrics.span("csv_write", path=csv_filename), \
+                open(csv_filename, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(table["headers"])
+            writer.writerows(table["rows"])
+        metrics.count("rows", len(table["rows"]), source="profile", table=table_name)
+    print(f"Saved {len(tables)} tables for {profile['name']} ({profile['person_id']})")
+
+async def scrape_profile(page, profile):
+    """Scrape one player profile in the browser"""
+    name = f"{profile['competition']}_{profile['person_id']}_profile"
+    try:
+        await goto_ready(page, profile["url"], "table")
+        tables = await extract_tables(page, "table")
+    except Exception as e:
+        await diagnostics.capture(page, name, e)
+        raise
+    if not tables:
+        await diagnostics.capture(page, name, "no tables extracted")
+        return False
+    await diagnostics.success(page, name)
+    save_profile_tables(profile, tables)
+    return True
+
+async def scrape_profile_http(fetcher, profile):
+    """Scrape one player profile over HTTP, or return None to use the browser"""
+    try:
+        doc = parse_page(await fetcher.get(profile["url"]))
+    except Exception as e:
+        print(f"HTTP fetch failed for {profile['url']}: {e}")
+        return None
+    tables = parse_tables(doc, "table")
+    if not tables:
+        return None
+    save_profile_tables(profile, tables)
+    return True
+
+async def crawl_profiles(profiles, args, browser, fetcher, profile_settings, stats, limiter, checkpoint):
+    """Visit profiles with a bounded pool of workers, checkpointing each result"""
+    queue = asyncio.Queue()
+    for profile in profiles:
+        queue.put_nowait(profile)
+
+    counts = {"ok": 0, "failed": 0}
+
+    def record(profile, status):
+        counts[status] += 1
+        metrics.count("pages" if status == "ok" else "failures", source="profile",
+                      person_id=profile["person_id"])
+        checkpoint.write(json.dumps({"competition": profile["competition"],
+                                     "person_id": profile["person_id"], "status": status}) + "\n")
+        checkpoint.flush()
+
+    async def worker():
+        context = None
+        page = None
+        try:
+            while True:
+                try:
+                    profile = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    success = None
+                    if args.backend == "http":
+                        success = await scrape_profile_http(fetcher, profile)
+                    if success is None:
+                        if args.backend == "http":
+                            metrics.count("retries", source="profile", reason="browser_fallback")
+                        # Open a browser context only once a profile needs it
+                        if page is None:
+                            context = await new_context(await browser.get(), profile_settings, stats, limiter)
+                            page = await context.new_page()
+                        success = await limiter.call(profile["url"], lambda: scrape_profile(page, profile),
+                                                     paced=False)
+                except Exception as e:
+                    print(f"Error scraping profile {profile['url']}: {e}")
+                    success = False
+                record(profile, "ok" if success else "failed")
+        finally:
+            if context is not None:
+                await context.close()
+
+    pool_size = max(1, min(args.workers, len(profiles)))
+    print(f"Crawling {len(profiles)} profiles with {pool_size} worker(s)")
+    await asyncio.gather(*(worker() for _ in range(pool_size)))
+    return counts
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape SBL player profiles")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Number of profiles to load concurrently (default: 4)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum page requests per second")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser",
+                        help="Fetch pages with Chromium, or over plain HTTP with a "
+                             "per-page browser fallback (default: browser)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH,
+                        help=f"Progress file for resuming interrupted runs (default: {CHECKPOINT_PATH})")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint and visit every profile again")
+    add_browser_args(parser)
+    add_scheduler_args(parser)
+    add_metrics_args(parser)
+    add_diagnostics_args(parser)
+    add_archive_args(parser)
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    profile_settings = profile_from_args(args)
+    stats = LoadStats()
+    limiter = scheduler_from_args(args)
+    metrics_from_args(args)
+    diagnostics_from_args(args)
+    archive_from_args(args)
+
+    profiles = collect_profile_urls()
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+    pending = [profile for profile in profiles
+               if (profile["competition"], profile["person_id"]) not in done]
+    print(f"{len(profiles) - len(pending)} profiles already done, {len(pending)} to go")
+
+    os.makedirs(os.path.dirname(args.checkpoint) or ".", exist_ok=True)
+    async with async_playwright() as p, HttpFetcher(max_connections=args.workers, limiter=limiter) as fetcher:
+        browser = LazyBrowser(p, profile_settings)
+        with open(args.checkpoint, "a", encoding="utf-8") as checkpoint:
+            counts = await crawl_profiles(pending, args, browser, fetcher, profile_settings,
+                                          stats, limiter, checkpoint)
+        await browser.close()
+
+    print("\n=== Summary ===")
+    print(f"Total profiles: {len(profiles)}")
+    print(f"Skipped (already done): {len(profiles) - len(pending)}")
+    print(f"Successfully scraped: {counts['ok']}")
+    print(f"Failed: {counts['failed']}")
+    print(stats.summary())
+    print(fetcher.summary())
+    print(limiter.summary())
+    if archive.mode:
+        print(archive.summary())
+    print(f"Stages:\n{metrics.summary()}")
+    print(f"Data saved to {COMPETITIONS_DIR}/<competition>/profiles directories")
+    archive.close()
+    metrics.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
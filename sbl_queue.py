@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from sbl_competitions import add_competition_args, competitions_from_args
+
+DEFAULT_QUEUE_PATH = "data/queue.sqlite"
+DEFAULT_VISIBILITY_TIMEOUT = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,             -- "competition", "team", "players" or "profile"
+    key TEXT NOT NULL,              -- e.g. "38899/175103" for a team
+    payload TEXT NOT NULL,          -- JSON arguments for the job
+    state TEXT NOT NULL,            -- "pending", "leased", "done" or "failed"
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,     -- pending: not before; leased: when the lease expires
+    lease_token TEXT,
+    worker TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (state, available_at);
+"""
+
+class Job:
+    """A claimed job; lease_token proves this worker still holds it"""
+
+    def __init__(self, id, kind, key, payload, attempts, lease_token):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.lease_token = lease_token
+
+    def __repr__(self):
+        return f"{self.kind} {self.key}"
+
+def worker_name():
+    """Identifies a worker across the hosts sharing a queue"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    """
+    Durable queue of scrape jobs in a SQLite file
+
+    A claimed job is leased to one worker until its visibility timeout,
+    which the worker extends while it runs. If the worker crashes, the lease
+    runs out and the job is handed to the next worker that asks. A job is
+    only completed by the worker holding its current lease, so it completes
+    at most once even if a slow worker finishes after losing its lease.
+
+    The database uses a rollback journal rather than WAL, so workers on
+    several hosts can share it over a volume with working file locks.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit, with explicit transactions where a read decides a write;
+        # shared with worker threads behind a lock
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, kind, key, payload):
+        """Add a job, or queue a finished one again; returns True if it will run"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (kind, key, payload, state, available_at, created_at) "
+                "VALUES (?, ?, ?, 'pending', ?, ?) "
+                "ON CONFLICT (kind, key) DO UPDATE SET payload = excluded.payload, state = 'pending', "
+                "attempts = 0, available_at = excluded.available_at, lease_token = NULL, worker = NULL, "
+                "error = NULL, finished_at = NULL "
+                "WHERE state IN ('done', 'failed')",
+                (kind, key, json.dumps(payload), now, now))
+        return cursor.rowcount == 1
+
+    def claim(self, worker):
+        """Lease the oldest runnable job to worker, or return None"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self.conn.execute(
+                        "SELECT id, kind, key, payload, attempts, state FROM jobs "
+                        "WHERE state IN ('pending', 'leased') AND available_at <= ? "
+                        "ORDER BY id LIMIT 1", (now,)).fetchone()
+                    if row is None:
+                        self.conn.execute("COMMIT")
+                        return None
+                    job_id, kind, key, payload, attempts, state = row
+                    if attempts >= self.max_attempts:
+                        # Its last worker died holding it
+                        self.conn.execute(
+                            "UPDATE jobs SET state = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                            (f"lease expired after {attempts} attempt(s)", now, job_id))
+                        continue
+                    token = uuid.uuid4().hex
+                    self.conn.execute(
+                        "UPDATE jobs SET state = 'leased', attempts = attempts + 1, available_at = ?, "
+                        "lease_token = ?, worker = ? WHERE id = ?",
+                        (now + self.visibility_timeout, token, worker, job_id))
+                    self.conn.execute("COMMIT")
+                    if state == "leased":
+                        print(f"Reclaiming {kind} {key}, whose lease expired")
+                    return Job(job_id, kind, key, json.loads(payload), attempts + 1, token)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _update_leased(self, job, assignments, values):
+        """Update a job only while job still holds its lease"""
+        with self.lock:
+            cursor = self.conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND lease_token = ? AND state = 'leased'",
+                (*values, job.id, job.lease_token))
+        return cursor.rowcount == 1
+
+    def extend(self, job):
+        """Push the lease back by another visibility timeout; False if it was lost"""
+        return self._update_leased(job, "available_at = ?", (time.time() + self.visibility_timeout,))
+
+    def complete(self, job):
+        """Mark a job done, keeping its payload as the job left it
+
+        Returns False if its lease was lost and it belongs to another worker.
+        """
+        return self._update_leased(job, "state = 'done', lease_token = NULL, finished_at = ?, payload = ?",
+                                   (time.time(), json.dumps(job.payload)))
+
+    def fail(self, job, error, retry_delay=0.0):
+        """Give a job back to be retried, or fail it for good after max_attempts"""
+        now = time.time()
+        if job.attempts >= self.max_attempts:
+            return self._update_leased(job, "state = 'failed', lease_token = NULL, error = ?, finished_at = ?",
+                                       (str(error), now))
+        return self._update_leased(job, "state = 'pending', lease_token = NULL, error = ?, available_at = ?",
+                                   (str(error), now + retry_delay))
+
+    def retry_failed(self):
+        """Queue every failed job again"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0, available_at = ?, error = NULL, "
+                "finished_at = NULL WHERE state = 'failed'", (time.time(),))
+        return cursor.rowcount
+
+    def jobs(self, kind, key_prefix):
+        """(state, payload) of every job of a kind whose key starts with key_prefix, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, payload FROM jobs WHERE kind = ? AND substr(key, 1, ?) = ? ORDER BY id",
+                (kind, len(key_prefix), key_prefix)).fetchall()
+        return [(state, json.loads(payload)) for state, payload in rows]
+
+    def outstanding(self):
+        """Jobs pending or leased, which may still run or add more jobs"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'leased')").fetchone()[0]
+
+    def counts(self):
+        """{kind: {state: count}}"""
+        counts = {}
+        with self.lock:
+            rows = self.conn.execute("SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state").fetchall()
+        for kind, state, count in rows:
+            counts.setdefault(kind, {})[state] = count
+        return counts
+
+    def failures(self, limit=20):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT kind, key, attempts, error FROM jobs WHERE state = 'failed' ORDER BY id LIMIT ?",
+                (limit,)).fetchall()
+
+    def summary(self):
+        lines = []
+        for kind, states in sorted(self.counts().items()):
+            by_state = ", ".join(f"{state}: {count}" for state, count in sorted(states.items()))
+            lines.append(f"  {kind}: {by_state}")
+        return "\n".join(lines) or "  (empty)"
+
+def add_queue_args(parser):
+    """Add job queue options to an argument parser"""
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, metavar="PATH",
+                        help=f"SQLite job queue, on a volume shared by every worker (default: {DEFAULT_QUEUE_PATH})")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Manage the SBL scrape job queue")
+    add_queue_args(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue = commands.add_parser("enqueue", help="Queue competitions to scrape")
+    add_competition_args(enqueue)
+    enqueue.add_argument("--profiles", action="store_true",
+                         help="Also queue every player's profile once the player statistics are scraped")
+    commands.add_parser("status", help="Show jobs by kind and state")
+    commands.add_parser("retry", help="Queue failed jobs again")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    queue = JobQueue(args.queue)
+    if args.command == "enqueue":
+        # Workers expand each competition into team, player and profile jobs
+        for competition_id in competitions_from_args(args):
+            queued = queue.enqueue("competition", competition_id,
+                                   {"competition": competition_id, "profiles": args.profiles})
+            print(f"Competition {competition_id}: {'queued' if queued else 'already queued'}")
+    elif args.command == "retry":
+        print(f"Queued {queue.retry_failed()} failed job(s) again")
+    print(f"Jobs in {args.queue}:\n{queue.summary()}")
+    if args.command == "status":
+        for kind, key, attempts, error in queue.failures():
+            reason = (error or "").splitlines()[0] if error else ""
+            print(f"  failed {kind} {key} after {attempts} attempt(s): {reason}")
+    queue.close()
+
+if __name__ == "__main__":
+    main()
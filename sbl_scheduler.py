@@ -0,0 +1,272 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlparse
+from sbl_metrics import metrics
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+
+class RateLimiter:
+    """
+    Spaces out requests so no more than `rate` start per second
+
+    Shared by every worker in a run, so the budget holds across all
+    competitions and backends. A rate of None disables limiting.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        """Wait until the next request may start"""
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def call(self, url, request, paced=True):
+        """Run request() for url in its turn
+
+        paced=False skips the wait, for jobs whose requests are already
+        paced elsewhere (browser navigations wait in the route handler).
+        """
+        if paced:
+            await self.wait()
+        return await request()
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host that is failing"""
+
+def is_transient(error):
+    """Whether an error is worth retrying: timeouts, dropped connections, 429 and 5xx"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # Playwright and httpx timeouts and network errors, matched by name so
+    # this module doesn't import either library
+    name = type(error).__name__
+    if name in ("TimeoutError", "TimeoutException", "ConnectTimeout", "ReadTimeout", "PoolTimeout",
+                "ConnectError", "ReadError", "RemoteProtocolError"):
+        return True
+    # Playwright reports refused and reset connections as net::ERR_ errors
+    return "net::ERR_" in str(error)
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after repeated failures
+
+    After `threshold` failures in a row the circuit opens and no requests
+    are sent for `cooldown` seconds. Then a single trial request is let
+    through: success closes the circuit, failure opens it again for twice
+    as long.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, cooldown=DEFAULT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = None
+        self.current_cooldown = cooldown
+        self.trial_running = False
+
+    def allow(self):
+        if self.open_until is None:
+            return True
+        if time.monotonic() < self.open_until or self.trial_running:
+            return False
+        self.trial_running = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.open_until = None
+        self.current_cooldown = self.cooldown
+        self.trial_running = False
+
+    def record_neutral(self):
+        """An outcome that says nothing about the host, such as a 404: only frees the trial slot"""
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_running:
+            self.current_cooldown = min(self.current_cooldown * 2, 10 * self.cooldown)
+        if self.trial_running or self.failures >= self.threshold:
+            self.open_until = time.monotonic() + self.current_cooldown
+        self.trial_running = False
+
+    def remaining(self):
+        """Seconds until the circuit lets a trial request through"""
+        return max(0.0, self.open_until - time.monotonic()) if self.open_until else 0.0
+
+    @property
+    def is_open(self):
+        return self.open_until is not None
+
+class AdaptiveLimit:
+    """
+    Concurrency limit adjusted with additive increase, multiplicative decrease
+
+    Starts at `maximum`, the concurrency asked for. Each window of `limit`
+    successful requests with normal latency raises the limit by one. An
+    error, or a request much slower than the fastest recent ones, halves
+    it, at most once per window: requests that started before the last
+    decrease don't decrease it again, so a burst of timeouts halves the
+    limit once rather than once per request.
+    """
+
+    def __init__(self, maximum, minimum=1, latency_factor=3.0):
+        self.maximum = max(minimum, maximum)
+        self.minimum = minimum
+        self.limit = self.maximum
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.successes = 0
+        self.baseline = None
+        # Bumped on every decrease; requests carry the one they started in
+        self.window = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        """Take a slot; returns the window to pass back to release()"""
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            return self.window
+
+    async def release(self, window, ok, latency=None):
+        """Free a slot taken in window; ok=None leaves the limit as it is"""
+        async with self.condition:
+            self.in_flight -= 1
+            if ok is None:
+                self.condition.notify_all()
+                return
+            slow = False
+            if ok and latency is not None:
+                # Baseline drifts up slowly so it tracks the site's normal speed
+                self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.05)
+                slow = latency > self.baseline * self.latency_factor
+            if ok and not slow:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self.successes = 0
+            elif window == self.window:
+                self.limit = max(self.minimum, self.limit // 2)
+                self.successes = 0
+                self.window += 1
+            self.condition.notify_all()
+
+class Scheduler(RateLimiter):
+    """
+    Rate limit, retries, adaptive concurrency and per-host circuit breakers
+
+    A drop-in replacement for RateLimiter: wait() still paces requests,
+    and call() runs a request with the full policy. Transient failures
+    are retried with jittered exponential backoff. Errors that aren't
+    transient are raised straight away, so callers record the failure.
+    """
+
+    def __init__(self, rate=None, max_concurrency=4, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, breaker_threshold=DEFAULT_BREAKER_THRESHOLD,
+                 breaker_cooldown=DEFAULT_BREAKER_COOLDOWN):
+        super().__init__(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.concurrency = AdaptiveLimit(max_concurrency)
+        self.breakers = {}
+        self.retried = 0
+        self.rejected = 0
+
+    def breaker(self, url):
+        host = urlparse(url).netloc
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return self.breakers[host]
+
+    def backoff_delay(self, attempt):
+        """Full jitter: anywhere up to the exponential delay for this attempt"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def call(self, url, request, paced=True):
+        breaker = self.breaker(url)
+        for attempt in range(self.retries + 1):
+            if not breaker.allow():
+                self.rejected += 1
+                metrics.count("circuit_rejections", url=url)
+                if attempt == self.retries:
+                    raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}, not requesting {url}")
+                # Sit out the cooldown rather than give up on a short outage
+                await asyncio.sleep(breaker.remaining() + self.backoff_delay(attempt))
+                continue
+
+            window = await self.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                if paced:
+                    await self.wait()
+                result = await request()
+            except Exception as e:
+                transient = is_transient(e)
+                # Only overload symptoms count against the site; a missing
+                # table or a 404 says nothing about its health
+                await self.concurrency.release(window, False if transient else None)
+                if not transient:
+                    breaker.record_neutral()
+                    raise
+                breaker.record_failure()
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                self.retried += 1
+                metrics.count("retries", url=url, attempt=attempt + 1, error=type(e).__name__)
+                reason = (str(e).splitlines() or [""])[0]
+                print(f"Retrying {url} in {delay:.1f}s after {type(e).__name__}: {reason}")
+                await asyncio.sleep(delay)
+                continue
+            await self.concurrency.release(window, True, time.monotonic() - started)
+            breaker.record_success()
+            return result
+
+    def summary(self):
+        open_hosts = [host for host, breaker in self.breakers.items() if breaker.is_open]
+        line = (f"Scheduler: {self.retried} retries, concurrency limit {self.concurrency.limit}"
+                f"/{self.concurrency.maximum}")
+        if self.rejected:
+            line += f", {self.rejected} requests held back by open circuits"
+        if open_hosts:
+            line += f", circuit still open for {', '.join(open_hosts)}"
+        return line
+
+def add_scheduler_args(parser):
+    """Add retry and circuit breaker options to an argument parser"""
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries for timeouts and 5xx responses (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF,
+                        help=f"Base retry delay in seconds, doubled each attempt (default: {DEFAULT_BACKOFF})")
+    parser.add_argument("--breaker-threshold", type=int, default=DEFAULT_BREAKER_THRESHOLD,
+                        help=f"Failures in a row before a host is given a rest "
+                             f"(default: {DEFAULT_BREAKER_THRESHOLD})")
+    parser.add_argument("--breaker-cooldown", type=float, default=DEFAULT_BREAKER_COOLDOWN,
+                        help=f"Seconds before retrying a failing host (default: {DEFAULT_BREAKER_COOLDOWN:g})")
+
+def scheduler_from_args(args):
+    """Build the shared scheduler from parsed arguments"""
+    return Scheduler(rate=args.rate, max_concurrency=max(1, args.workers), retries=args.retries,
+                     backoff=args.backoff, breaker_threshold=args.breaker_threshold,
+                     breaker_cooldown=args.breaker_cooldown)
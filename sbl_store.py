@@ -0,0 +1,270 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import sqlite3
+from sbl_columnar import load_team_index
+from sbl_normalize import person_id_from_url
+
+PROCESSED_DIR = "data_processed"
+DEFAULT_DB_PATH = f"{PROCESSED_DIR}/sbl.sqlite"
+
+SCHEMA = """
+CREATE TABLE teams (
+    team_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    competition TEXT NOT NULL,
+    PRIMARY KEY (competition, team_id)
+);
+CREATE TABLE players (
+    person_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT
+);
+CREATE TABLE stats (
+    competition TEXT,
+    source TEXT NOT NULL,        -- "team" or "player" table
+    table_kind TEXT NOT NULL,    -- e.g. "totals", "averages"
+    person_id TEXT,
+    team_id TEXT,
+    player_name TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    value REAL,                  -- numeric value, MM:SS as seconds
+    raw TEXT                     -- value as scraped
+);
+CREATE INDEX idx_players_name ON players (name);
+CREATE INDEX idx_stats_person ON stats (person_id, source, table_kind);
+CREATE INDEX idx_stats_team ON stats (team_id, table_kind);
+CREATE INDEX idx_stats_leaderboard ON stats (source, table_kind, stat, value DESC);
+CREATE INDEX idx_stats_competition_leaderboard ON stats (competition, source, table_kind, stat, value DESC);
+"""
+
+def row_person_id(row):
+    """Person ID of a processed row, keyed the same way for the players and stats tables
+
+    Taken from Player_URL, or from a Person_ID cell holding a whole number.
+    """
+    person_id = person_id_from_url(row.get("Player_URL"))
+    if person_id is None:
+        match = re.fullmatch(r'(\d+)(?:\.0)?', (row.get("Person_ID") or "").strip())
+        person_id = match.group(1) if match else None
+    return person_id
+
+def parse_value(raw):
+    """Numeric value of a stat cell, with MM:SS converted to seconds"""
+    if raw is None or raw == "":
+        return None
+    if ":" in raw:
+        minutes, _, seconds = raw.partition(":")
+        try:
+            return int(minutes) * 60 + int(seconds)
+        except ValueError:
+            return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+def read_csv_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def stat_rows(rows, competition, source, table_kind, id_columns, team_id=None, person_ids=None):
+    """Turn wide CSV rows into (competition, source, kind, person, team, name, stat, value, raw) tuples"""
+    for row in rows:
+        name = row.get("Player", "")
+        person_id = row_person_id(row)
+        if person_id is None and person_ids:
+            person_id = person_ids.get(name)
+        for stat, raw in row.items():
+            if stat in id_columns:
+                continue
+            yield (competition, source, table_kind, person_id, team_id, name, stat, parse_value(raw), raw)
+
+def ingest(roots, db_path=DEFAULT_DB_PATH):
+    """Rebuild the SQLite store from processed team and player tables
+
+    roots is a list of (competition, processed_dir); competition may be None
+    for data in the flat layout, in which case it is read from teams.csv.
+    """
+    print(f"Ingesting {len(roots)} data root(s) into {db_path}")
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    # Build into a temporary file so readers never see a half-built store
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+
+    players = {}
+    team_count = 0
+    stat_count = 0
+    for competition, processed_dir in roots:
+        team_index = load_team_index(f"{processed_dir}/teams.csv")
+        if competition is None:
+            competitions = {team["competition"] for team in team_index.values()}
+            competition = competitions.pop() if len(competitions) == 1 else None
+        conn.executemany("INSERT OR REPLACE INTO teams VALUES (?, ?, ?)",
+                         [(team["team_id"], team["team_name"], competition or team["competition"])
+                          for team in team_index.values()])
+        team_count += len(team_index)
+
+        # Players first, so team rows (which have no URL) can be matched by name
+        root_players = {}
+        players_dir = f"{processed_dir}/players"
+        player_tables = {}
+        for file in sorted(os.listdir(players_dir)) if os.path.isdir(players_dir) else []:
+            if file.endswith(".csv"):
+                rows = read_csv_rows(f"{players_dir}/{file}")
+                player_tables[file[:-len(".csv")]] = rows
+                for row in rows:
+                    person_id = row_person_id(row)
+                    if person_id:
+                        root_players[person_id] = (person_id, row.get("Player", ""), row.get("Player_URL"))
+        players.update(root_players)
+
+        # Names shared by several people can't be matched reliably
+        name_counts = {}
+        for _, name, _ in root_players.values():
+            name_counts[name] = name_counts.get(name, 0) + 1
+        person_ids = {name: person_id for person_id, name, _ in root_players.values() if name_counts[name] == 1}
+
+        for table_kind, rows in player_tables.items():
+            batch = list(stat_rows(rows, competition, "player", table_kind, {"Player", "Player_URL", "Person_ID"}))
+            conn.executemany("INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            stat_count += len(batch)
+
+        teams_dir = f"{processed_dir}/teams"
+        for team_dir in sorted(os.listdir(teams_dir)) if os.path.isdir(teams_dir) else []:
+            team_id = team_index.get(team_dir, {}).get("team_id")
+            for file in sorted(os.listdir(f"{teams_dir}/{team_dir}")):
+                if not file.endswith(".csv"):
+                    continue
+                rows = read_csv_rows(f"{teams_dir}/{team_dir}/{file}")
+                batch = list(stat_rows(rows, competition, "team", file[:-len(".csv")], {"Player"},
+                                       team_id, person_ids))
+                conn.executemany("INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                stat_count += len(batch)
+
+    conn.executemany("INSERT INTO players VALUES (?, ?, ?)", players.values())
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    os.replace(tmp_path, db_path)
+    print(f"Stored {team_count} teams, {len(players)} players, {stat_count} stat values")
+    return stat_count
+
+def processed_roots(processed_dir=PROCESSED_DIR):
+    """(competition, dir) pairs for the flat layout and each competitions/<id>"""
+    roots = []
+    if os.path.exists(f"{processed_dir}/teams.csv") or os.path.isdir(f"{processed_dir}/players"):
+        roots.append((None, processed_dir))
+    competitions_dir = f"{processed_dir}/competitions"
+    for competition_id in sorted(os.listdir(competitions_dir)) if os.path.isdir(competitions_dir) else []:
+        roots.append((competition_id, f"{competitions_dir}/{competition_id}"))
+    return roots
+
+def connect(db_path=DEFAULT_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def find_person_ids(conn, player):
+    """Resolve a person ID or player name to person IDs"""
+    if player.isdigit():
+        return [player]
+    return [row["person_id"] for row in conn.execute(
+        "SELECT person_id FROM players WHERE name = ?", (player,))]
+
+def find_team_id(conn, team):
+    """Resolve a team ID or team name to a team ID"""
+    if team.isdigit():
+        return team
+    row = conn.execute("SELECT team_id FROM teams WHERE name = ?", (team,)).fetchone()
+    return row["team_id"] if row else None
+
+def player_stats(conn, person_id):
+    """All stats for one player across competitions, player and team tables"""
+    return conn.execute(
+        "SELECT competition, source, table_kind, team_id, player_name, stat, value, raw FROM stats "
+        "WHERE person_id = ? ORDER BY competition, source, table_kind", (person_id,)).fetchall()
+
+def team_stats(conn, team_id, table_kind=None):
+    """All stats for one team, optionally for a single table kind"""
+    if table_kind:
+        return conn.execute(
+            "SELECT table_kind, person_id, player_name, stat, value, raw FROM stats "
+            "WHERE team_id = ? AND table_kind = ?", (team_id, table_kind)).fetchall()
+    return conn.execute(
+        "SELECT table_kind, person_id, player_name, stat, value, raw FROM stats "
+        "WHERE team_id = ?", (team_id,)).fetchall()
+
+def leaderboard(conn, table_kind, stat, source="player", limit=10, competition=None):
+    """Top players for a stat, read in order from the leaderboard index"""
+    if competition:
+        return conn.execute(
+            "SELECT competition, person_id, team_id, player_name, value, raw FROM stats "
+            "WHERE competition = ? AND source = ? AND table_kind = ? AND stat = ? AND value IS NOT NULL "
+            "ORDER BY value DESC LIMIT ?", (competition, source, table_kind, stat, limit)).fetchall()
+    return conn.execute(
+        "SELECT competition, person_id, team_id, player_name, value, raw FROM stats "
+        "WHERE source = ? AND table_kind = ? AND stat = ? AND value IS NOT NULL "
+        "ORDER BY value DESC LIMIT ?", (source, table_kind, stat, limit)).fetchall()
+
+def print_rows(rows):
+    if not rows:
+        print("No results")
+        return
+    columns = rows[0].keys()
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the local SBL stats store")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"SQLite database (default: {DEFAULT_DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Load processed CSVs into the store")
+    ingest_parser.add_argument("--processed-dir", default=PROCESSED_DIR,
+                               help="Processed data in the flat layout; competitions/<id> "
+                                    "subdirectories are ingested too")
+
+    player_parser = commands.add_parser("player", help="All stats for a player")
+    player_parser.add_argument("player", help="Person ID or exact player name")
+
+    team_parser = commands.add_parser("team", help="All stats for a team")
+    team_parser.add_argument("team", help="Team ID or exact team name")
+    team_parser.add_argument("--table", default=None, help="Table kind, e.g. totals")
+
+    leaders_parser = commands.add_parser("leaders", help="Top players for a stat")
+    leaders_parser.add_argument("table", help="Table kind, e.g. averages or totals")
+    leaders_parser.add_argument("stat", help="Column name, e.g. PPG")
+    leaders_parser.add_argument("--source", choices=["player", "team"], default="player")
+    leaders_parser.add_argument("-n", "--limit", type=int, default=10)
+    leaders_parser.add_argument("--competition", default=None, help="Limit to one competition ID")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.command == "ingest":
+        ingest(processed_roots(args.processed_dir), args.db)
+        return
+
+    conn = connect(args.db)
+    if args.command == "player":
+        rows = []
+        for person_id in find_person_ids(conn, args.player):
+            rows.extend(player_stats(conn, person_id))
+        print_rows(rows)
+    elif args.command == "team":
+        team_id = find_team_id(conn, args.team)
+        print_rows(team_stats(conn, team_id, args.table) if team_id else [])
+    elif args.command == "leaders":
+        print_rows(leaderboard(conn, args.table, args.stat, args.source, args.limit, args.competition))
+    conn.close()
+
+if __name__ == "__main__":
+    main()
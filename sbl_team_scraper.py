@@ -1,14 +1,22 @@
+import argparse
 import asyncio
 import os
 import csv
 import re
 from playwright.async_api import async_playwright
+from sbl_browser import READY_TIMEOUT, LazyBrowser, LoadStats, add_browser_args, goto_ready, new_context, profile_from_args
+from sbl_cache import add_cache_args, cache_from_args
+from sbl_extract import clean_text, extract_tables, notify_table_saved
+from sbl_diagnostics import add_diagnostics_args, diagnostics, diagnostics_from_args
+from sbl_competitions import (COMPETITIONS_DIR, DEFAULT_COMPETITION_ID, SITE_URL, add_competition_args, competition_data_dir,
+                              competitions_from_args, record_season, season_from_text, team_stats_url, teams_url)
+from sbl_har import add_archive_args, archive, archive_from_args
+from sbl_http import HttpFetcher, parse_page, parse_tables, select_text
+from sbl_metrics import add_metrics_args, metrics, metrics_from_args
+from sbl_scheduler import add_scheduler_args, scheduler_from_args
 
-# Base URLs
-TEAMS_URL = "https://hosted.dcd.shared.geniussports.com/SBF/en/competition/38899/teams"
-TEAM_STATS_URL_TEMPLATE = "https://hosted.dcd.shared.geniussports.com/SBF/en/competition/38899/team/{team_id}/statistics"
-
-# Manual mapping of team IDs to names based on the search results
+# Manual mapping of team IDs to names for the default competition, only
+# used when the teams page can't be read
 TEAM_NAMES = {
     "175102": "BC Luleå",
     "175103": "Borås Basket",
@@ -22,27 +30,14 @@ TEAM_NAMES = {
     "175111": "Uppsala Basket"
 }
 
-async def extract_team_links(page):
-    """Extract team links from the teams page"""
-    print(f"Extracting team links from {TEAMS_URL}")
-    await page.goto(TEAMS_URL, wait_until="networkidle")
-    
-    # Take screenshot of teams page
-    await page.screenshot(path="screenshots/teams_page.png")
-    
-    # Find all team links and names
-    # The teams are listed in a section with team names followed by links
-    team_elements = await page.locator("div.teams a").all()
-    
+def build_team_list(anchors, competition_id):
+    """Build a de-duplicated team list from (href, text) pairs of team links"""
     teams = []
-    for element in team_elements:
-        href = await element.get_attribute("href")
+    for href, team_name in anchors:
         if href and "/team/" in href:
             team_id_match = re.search(r'/team/(\d+)', href)
             if team_id_match:
                 team_id = team_id_match.group(1)
-                # Get the text content which should be the team name
-                team_name = await element.inner_text()
                 
                 # Clean up the team name
                 team_name = team_name.strip()
@@ -52,7 +47,8 @@ async def extract_team_links(page):
                     teams.append({
                         "id": team_id,
                         "name": team_name,
-                        "url": f"https://hosted.dcd.shared.geniussports.com{href}"
+                        "url": f"{SITE_URL}{href}",
+                        "competition": competition_id,
                     })
     
     # Remove duplicates based on team_id
@@ -66,32 +62,126 @@ async def extract_team_links(page):
     print(f"Found {len(unique_teams)} unique teams")
     return unique_teams
 
+async def extract_team_links(page, competition_id, info=None):
+    """Extract team links from a competition's teams page
+
+    If info is a dict, the season the page names is stored in info["season"].
+    """
+    url = teams_url(competition_id)
+    print(f"Extracting team links from {url}")
+    try:
+        await goto_ready(page, url, "div.teams a")
+    except Exception as e:
+        print(f"Team links did not load: {e}")
+        await diagnostics.capture(page, f"{competition_id}_teams_page", e)
+        return []
+    
+    await diagnostics.success(page, f"{competition_id}_teams_page")
+    
+    # Find all team links and names
+    # The teams are listed in a section with team names followed by links
+    anchors = await page.eval_on_selector_all(
+        "div.teams a", "links => links.map(a => [a.getAttribute('href'), a.innerText])")
+    teams = build_team_list(anchors, competition_id)
+    if info is not None:
+        info["season"] = season_from_text(await page.evaluate(
+            "() => [document.title, ...Array.from(document.querySelectorAll('h1'), h => h.innerText)].join(' ')"))
+    if not teams:
+        await diagnostics.capture(page, f"{competition_id}_teams_page", "no team links found")
+    return teams
+
+async def extract_team_links_http(fetcher, competition_id, info=None):
+    """Extract team links from a competition's teams page without a browser
+
+    If info is a dict, the season the page names is stored in info["season"].
+    """
+    url = teams_url(competition_id)
+    print(f"Extracting team links from {url} over HTTP")
+    try:
+        doc = parse_page(await fetcher.get(url))
+    except Exception as e:
+        print(f"Team links did not load over HTTP: {e}")
+        return []
+    
+    anchors = [(a.get("href"), a.text_content())
+               for a in doc.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' teams ')]//a")]
+    if info is not None:
+        info["season"] = season_from_text(" ".join(select_text(doc, "title") + select_text(doc, "h1")))
+    return build_team_list(anchors, competition_id)
+
 async def get_team_name_from_page(page, team_id):
     """Extract team name from the statistics page or use the manual mapping"""
-    # First try to get from our manual mapping
-    if team_id in TEAM_NAMES:
-        return TEAM_NAMES[team_id]
-    
     try:
         # Look for the team name in the header
-        team_name_element = await page.locator("h1").first
-        if team_name_element:
-            team_name = await team_name_element.inner_text()
-            return team_name.strip()
+        team_name = clean_text(await page.locator("h1").first.inner_text(timeout=5000))
+        if team_name:
+            return team_name
     except:
         pass
     
-    return f"Team_{team_id}"
+    return TEAM_NAMES.get(team_id, f"Team_{team_id}")
+
+def team_key(team):
+    """Unique key for a team across competitions"""
+    return f"{team['competition']}/{team['id']}"
+
+def team_directory(team, team_name):
+    """Create the data directory for a team and return its path"""
+    sanitized_name = re.sub(r'[^\w\s-]', '', team_name).strip().replace(' ', '_')
+    team_dir = f"{competition_data_dir(team['competition'])}/{sanitized_name}"
+    os.makedirs(team_dir, exist_ok=True)
+    return team_dir
+
+# Team statistics pages list their tables in this order
+TEAM_TABLE_NAMES = ["totals", "per_game", "shooting"]
+
+def team_table_name(table_index):
+    """Name of the team table at table_index, e.g. "totals" """
+    return TEAM_TABLE_NAMES[table_index] if table_index < len(TEAM_TABLE_NAMES) else f"table_{table_index + 1}"
+
+def save_team_tables(team_dir, tables):
+    """Write extracted team tables to CSV files"""
+    print(f"Found {len(tables)} statistics tables")
+    
+    for table_index, table in enumerate(tables):
+        table_name = team_table_name(table_index)
+        print(f"Processing {table_name} table")
+        
+        headers = table["headers"]
+        csv_data = table["rows"]
+        print(f"Found {len(csv_data)} rows")
+            
+        # Save to CSV
+        csv_filename = f"{team_dir}/{table_name}.csv"
+        with metrics.span("csv_write", path=csv_filename), \
+                open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(headers)  # Write headers
+            writer.writerows(csv_data)  # Write data
+        metrics.count("rows", len(csv_data), source="team", table=table_name)
+            
+        print(f"Saved data to {csv_filename}")
+        notify_table_saved(csv_filename)
+
+async def scrape_team_stats(page, team, cache=None):
+    """Scrape statistics for a specific team
 
-async def scrape_team_stats(page, team):
-    """Scrape statistics for a specific team"""
+    Returns True once the tables are saved. Failures are raised after
+    saving diagnostics, so a scheduler can retry timeouts.
+    """
     team_id = team["id"]
-    stats_url = TEAM_STATS_URL_TEMPLATE.format(team_id=team_id)
+    stats_url = team_stats_url(team["competition"], team_id)
     
-    print(f"\nScraping statistics for team ID: {team_id}")
+    print(f"\nScraping statistics for team ID: {team_id} (competition {team['competition']})")
     print(f"URL: {stats_url}")
     
-    await page.goto(stats_url, wait_until="networkidle")
+    try:
+        with metrics.span("navigation", url=stats_url):
+            await page.goto(stats_url, wait_until="domcontentloaded")
+    except Exception as e:
+        print(f"Error loading team {team_id}: {e}")
+        await diagnostics.capture(page, f"{team['competition']}_{team_id}_stats", e)
+        raise
     
     # Get the team name from the page if not available
     team_name = team["name"]
@@ -100,51 +190,21 @@ async def scrape_team_stats(page, team):
     
     print(f"Team name: {team_name}")
     
-    # Create team directory with sanitized name
-    sanitized_name = re.sub(r'[^\w\s-]', '', team_name).strip().replace(' ', '_')
-    team_dir = f"data/{sanitized_name}"
-    os.makedirs(team_dir, exist_ok=True)
-    
-    # Take screenshot
-    await page.screenshot(path=f"screenshots/{sanitized_name}_stats.png")
+    team_dir = team_directory(team, team_name)
     
-    # Wait for tables to load
+    # Wait for tables to load; the page is ready as soon as they appear
     try:
-        await page.wait_for_selector("table.team-stats", timeout=30000)
-        
-        # Process all tables with team-stats class
-        tables = await page.locator("table.team-stats").all()
-        print(f"Found {len(tables)} statistics tables")
+        with metrics.span("readiness", url=stats_url, selector="table.team-stats"):
+            await page.wait_for_selector("table.team-stats", timeout=READY_TIMEOUT)
         
-        table_names = ["totals", "per_game", "shooting"]
-        
-        for table_index, table in enumerate(tables):
-            table_name = table_names[table_index] if table_index < len(table_names) else f"table_{table_index + 1}"
-            print(f"Processing {table_name} table")
-            
-            # Get table headers
-            headers = await table.locator("thead th").all_inner_texts()
-            
-            # Get table rows
-            rows = await table.locator("tbody tr").all()
-            print(f"Found {len(rows)} rows")
-            
-            # Prepare data for CSV
-            csv_data = []
-            
-            # Process all rows
-            for row in rows:
-                cells = await row.locator("td").all_inner_texts()
-                csv_data.append(cells)
-                
-            # Save to CSV
-            csv_filename = f"{team_dir}/{table_name}.csv"
-            with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(headers)  # Write headers
-                writer.writerows(csv_data)  # Write data
-                
-            print(f"Saved data to {csv_filename}")
+        # Extract all tables with team-stats class in one round-trip
+        tables = await extract_tables(page, "table.team-stats")
+        if not tables:
+            raise ValueError("no team-stats tables extracted")
+        await diagnostics.success(page, f"{team['competition']}_{os.path.basename(team_dir)}_stats")
+        save_team_tables(team_dir, tables)
+        if cache:
+            cache.store_json(stats_url, {"name": team_name, "tables": tables})
         
         # Update team info with the correct name
         team["name"] = team_name
@@ -152,56 +212,263 @@ async def scrape_team_stats(page, team):
         return True
     except Exception as e:
         print(f"Error scraping team {team_id}: {e}")
+        await diagnostics.capture(page, f"{team['competition']}_{os.path.basename(team_dir)}_stats", e)
+        raise
+
+async def scrape_team_stats_http(fetcher, team):
+    """Scrape statistics for a specific team without a browser
+
+    Returns None when the page has no team-stats tables in its HTML, so the
+    caller can retry the team with the browser backend.
+    """
+    team_id = team["id"]
+    stats_url = team_stats_url(team["competition"], team_id)
+    
+    print(f"\nFetching statistics for team ID: {team_id} (competition {team['competition']})")
+    print(f"URL: {stats_url}")
+    
+    try:
+        doc = parse_page(await fetcher.get(stats_url))
+    except Exception as e:
+        print(f"HTTP fetch failed for team {team_id}: {e}")
+        return None
+    
+    tables = parse_tables(doc, "table.team-stats")
+    if not tables:
+        print(f"No team-stats tables in HTML for team {team_id}")
+        return None
+    
+    team_name = team["name"]
+    if not team_name or team_name.strip() == "":
+        headings = select_text(doc, "h1")
+        team_name = headings[0] if headings and headings[0] else TEAM_NAMES.get(team_id, f"Team_{team_id}")
+    
+    print(f"Team name: {team_name}")
+    
+    save_team_tables(team_directory(team, team_name), tables)
+    if fetcher.cache:
+        fetcher.cache.store_json(stats_url, {"name": team_name, "tables": tables})
+    team["name"] = team_name
+    return True
+
+def load_team_from_cache(cache, team):
+    """Write a team's CSVs from cached tables if they are still fresh"""
+    stats_url = team_stats_url(team["competition"], team["id"])
+    payload = cache.get_json(stats_url)
+    if payload is None:
         return False
+    
+    print(f"\nUsing cached statistics for {payload['name']} (team ID: {team['id']})")
+    save_team_tables(team_directory(team, payload["name"]), payload["tables"])
+    team["name"] = payload["name"]
+    return True
+
+async def scrape_teams_http(fetcher, teams, workers):
+    """Scrape team statistics over HTTP with bounded concurrency
+
+    Returns a dict mapping team_key() to True, or None for teams that need
+    the browser backend.
+    """
+    semaphore = asyncio.Semaphore(max(1, workers))
+    
+    async def scrape(team):
+        async with semaphore:
+            return team_key(team), await scrape_team_stats_http(fetcher, team)
+    
+    return dict(await asyncio.gather(*(scrape(team) for team in teams)))
+
+async def scrape_teams_concurrently(browser, teams, workers, profile, stats, cache=None, limiter=None):
+    """Scrape team statistics over a pool of isolated browser contexts
+
+    Returns a dict mapping team_key() to True/False so callers can report
+    per-team success regardless of the order in which teams finish.
+    """
+    queue = asyncio.Queue()
+    for team in teams:
+        queue.put_nowait(team)
+    
+    results = {}
+    
+    async def worker(worker_id):
+        # Each worker gets its own context so cookies and storage are isolated
+        context = await new_context(browser, profile, stats, limiter)
+        page = await context.new_page()
+        try:
+            while True:
+                try:
+                    team = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    if limiter:
+                        # Navigations are paced by the context's route handler
+                        results[team_key(team)] = await limiter.call(
+                            team_stats_url(team["competition"], team["id"]),
+                            lambda: scrape_team_stats(page, team, cache), paced=False)
+                    else:
+                        results[team_key(team)] = await scrape_team_stats(page, team, cache)
+                except Exception as e:
+                    print(f"Worker {worker_id}: error scraping team {team['id']}: {e}")
+                    results[team_key(team)] = False
+        finally:
+            await context.close()
+    
+    pool_size = max(1, min(workers, len(teams)))
+    print(f"Scraping {len(teams)} teams with {pool_size} worker(s)")
+    await asyncio.gather(*(worker(i + 1) for i in range(pool_size)))
+    return results
+
+async def discover_teams(competition_id, args, browser, fetcher, cache, profile, stats, limiter):
+    """Find the teams in a competition, from the cache, over HTTP or in the browser
+
+    Also records the competition's season in its competition.json.
+    """
+    url = teams_url(competition_id)
+    info = {}
+    
+    # Reuse a fresh team list from the cache
+    teams = cache.get_json(url) or []
+    if not teams and args.backend == "http":
+        teams = await extract_team_links_http(fetcher, competition_id, info)
+    if not teams:
+        context = await new_context(await browser.get(), profile, stats, limiter)
+        try:
+            page = await context.new_page()
+            teams = await extract_team_links(page, competition_id, info)
+        finally:
+            await context.close()
+    if teams:
+        cache.store_json(url, teams)
+    record_season(competition_id, info.get("season"))
+    
+    # If no teams were found automatically, use manual team IDs
+    if not teams and competition_id == DEFAULT_COMPETITION_ID:
+        print("No teams found automatically. Using manual team IDs.")
+        teams = [{"id": team_id, "name": team_name,
+                  "url": team_stats_url(competition_id, team_id)}
+                 for team_id, team_name in TEAM_NAMES.items()]
+    
+    for team in teams:
+        team["competition"] = competition_id
+    return teams
+
+def save_teams_list(competition_id, teams):
+    """Save a competition's teams list with correct names, in discovery order"""
+    data_dir = competition_data_dir(competition_id)
+    os.makedirs(data_dir, exist_ok=True)
+    with open(f"{data_dir}/teams.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Name", "URL"])
+        for team in teams:
+            writer.writerow([team["id"], team["name"], team["url"]])
+    notify_table_saved(f"{data_dir}/teams.csv")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape SBL team statistics")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of pages to load concurrently across all competitions (default: 1)")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser",
+                        help="Fetch pages with Chromium, or over plain HTTP with a "
+                             "per-page browser fallback (default: browser)")
+    add_competition_args(parser)
+    add_browser_args(parser)
+    add_cache_args(parser)
+    add_scheduler_args(parser)
+    add_metrics_args(parser)
+    add_diagnostics_args(parser)
+    add_archive_args(parser)
+    return parser.parse_args()
+
+async def run_team_scrape(args, browser, fetcher, cache, profile, stats, limiter):
+    """Discover and scrape every competition's teams
+
+    Shares the browser, HTTP client, cache and rate limiter passed in, so
+    other scrapes can run alongside it. Returns (teams, failed_teams).
+    """
+    competitions = competitions_from_args(args)
+    
+    # Discover every competition's teams concurrently, within the worker budget
+    semaphore = asyncio.Semaphore(max(1, args.workers))
+    
+    async def discover(competition_id):
+        async with semaphore:
+            return await discover_teams(competition_id, args, browser, fetcher, cache, profile, stats, limiter)
+    
+    team_lists = await asyncio.gather(*(discover(competition_id) for competition_id in competitions))
+    teams = [team for team_list in team_lists for team in team_list]
+    
+    # Scrape each team's statistics
+    results = {}
+    pending = teams
+    
+    # Teams whose tables are still fresh in the cache need no page load
+    if cache.max_age is not None:
+        for team in teams:
+            if load_team_from_cache(cache, team):
+                results[team_key(team)] = True
+        pending = [team for team in teams if team_key(team) not in results]
+    
+    if pending and args.backend == "http":
+        results.update(await scrape_teams_http(fetcher, pending, args.workers))
+        pending = [team for team in pending if results.get(team_key(team)) is None]
+        if pending:
+            print(f"Falling back to the browser for {len(pending)} team(s)")
+            metrics.count("retries", len(pending), source="team", reason="browser_fallback")
+    if pending:
+        results.update(await scrape_teams_concurrently(
+            await browser.get(), pending, args.workers, profile, stats, cache, limiter))
+    
+    for competition_id, team_list in zip(competitions, team_lists):
+        save_teams_list(competition_id, team_list)
+    
+    failed_teams = [team for team in teams if not results.get(team_key(team))]
+    metrics.count("pages", len(teams) - len(failed_teams), source="team")
+    if failed_teams:
+        metrics.count("failures", len(failed_teams), source="team")
+    return teams, failed_teams
 
 async def main():
+    args = parse_args()
+    profile = profile_from_args(args)
+    stats = LoadStats()
+    cache = cache_from_args(args)
+    metrics_from_args(args)
+    diagnostics_from_args(args)
+    archive_from_args(args)
+    
+    # One request budget, retry policy and concurrency limit shared by every competition
+    limiter = scheduler_from_args(args)
+    
     # Create directories
     os.makedirs("data", exist_ok=True)
-    os.makedirs("screenshots", exist_ok=True)
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        page = await browser.new_page()
-        
-        # Extract team links
-        teams = await extract_team_links(page)
-        
-        # If no teams were found automatically, use manual team IDs
-        if not teams:
-            print("No teams found automatically. Using manual team IDs.")
-            # These are the team IDs you mentioned (from 02 to 10)
-            team_ids = ["175102", "175103", "175104", "175105", "175106", 
-                       "175107", "175108", "175109", "175110", "175111"]
-            
-            teams = [{"id": team_id, "name": TEAM_NAMES.get(team_id, ""), 
-                     "url": TEAM_STATS_URL_TEMPLATE.format(team_id=team_id)} 
-                    for team_id in team_ids]
-        
-        # Scrape each team's statistics
-        successful = 0
-        failed = 0
-        
-        for team in teams:
-            success = await scrape_team_stats(page, team)
-            if success:
-                successful += 1
-            else:
-                failed += 1
+    async with async_playwright() as p, HttpFetcher(max_connections=args.workers, cache=cache,
+                                                     limiter=limiter) as fetcher:
+        # The browser is only launched if a page actually needs it
+        browser = LazyBrowser(p, profile)
         
-        # Save updated teams list with correct names
-        with open("data/teams.csv", "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["ID", "Name", "URL"])
-            for team in teams:
-                writer.writerow([team["id"], team["name"], team["url"]])
+        teams, failed_teams = await run_team_scrape(args, browser, fetcher, cache, profile, stats, limiter)
         
         await browser.close()
+        cache.close()
         
         print("\n=== Summary ===")
+        print(f"Competitions: {', '.join(competitions_from_args(args))}")
         print(f"Total teams: {len(teams)}")
-        print(f"Successfully scraped: {successful}")
-        print(f"Failed: {failed}")
-        print(f"Data saved to data directory")
+        print(f"Successfully scraped: {len(teams) - len(failed_teams)}")
+        print(f"Failed: {len(failed_teams)}")
+        for team in failed_teams:
+            print(f"  - {team['name'] or team['id']} (competition {team['competition']})")
+        print(stats.summary())
+        print(fetcher.summary())
+        print(limiter.summary())
+        print(cache.summary())
+        if archive.mode:
+            print(archive.summary())
+        print(f"Stages:\n{metrics.summary()}")
+        print(f"Data saved to {COMPETITIONS_DIR}/<competition> directories")
+        archive.close()
+        metrics.close()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import os
+from playwright.async_api import async_playwright
+from sbl_browser import LazyBrowser, LoadStats, add_browser_args, new_context, profile_from_args
+from sbl_cache import add_cache_args, cache_from_args
+from sbl_competitions import COMPETITIONS_DIR, team_stats_url
+from sbl_diagnostics import add_diagnostics_args, diagnostics_from_args
+from sbl_har import add_archive_args, archive, archive_from_args
+from sbl_http import HttpFetcher
+from sbl_metrics import add_metrics_args, metrics, metrics_from_args
+from sbl_player_scraper import scrape_competition_players
+from sbl_profile_scraper import collect_profile_urls, scrape_profile, scrape_profile_http
+from sbl_queue import (DEFAULT_MAX_ATTEMPTS, DEFAULT_VISIBILITY_TIMEOUT, JobQueue, add_queue_args,
+                       worker_name)
+from sbl_scheduler import add_scheduler_args, scheduler_from_args
+from sbl_team_scraper import (discover_teams, load_team_from_cache, save_teams_list, scrape_team_stats,
+                              scrape_team_stats_http)
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Failed jobs wait this long before another worker tries them
+RETRY_DELAY = 30.0
+
+class Worker:
+    """
+    Claims jobs from the queue and runs them, several at a time
+
+    Every slot shares the browser, HTTP client, cache and scheduler, and
+    opens its own browser context the first time a job needs one. Start
+    as many worker processes as you like, on any host that sees the queue.
+    """
+
+    def __init__(self, args, queue, browser, fetcher, cache, profile, stats, limiter):
+        self.args = args
+        self.queue = queue
+        self.browser = browser
+        self.fetcher = fetcher
+        self.cache = cache
+        self.profile = profile
+        self.stats = stats
+        self.limiter = limiter
+        self.name = worker_name()
+        self.counts = {"done": 0, "retried": 0, "failed": 0, "lost": 0}
+
+    async def run_competition(self, payload, open_page):
+        """Find a competition's teams, then queue a job per team and one for its players"""
+        competition_id = payload["competition"]
+        teams = await discover_teams(competition_id, self.args, self.browser, self.fetcher, self.cache,
+                                     self.profile, self.stats, self.limiter)
+        # Rewritten with any names the team jobs fill in once they have all run
+        save_teams_list(competition_id, teams)
+        for team in teams:
+            await asyncio.to_thread(self.queue.enqueue, "team", f"{competition_id}/{team['id']}", team)
+        await asyncio.to_thread(self.queue.enqueue, "players", competition_id, payload)
+        print(f"Queued {len(teams)} team(s) and the player statistics for competition {competition_id}")
+        return True
+
+    def save_teams_if_finished(self, competition_id):
+        """Rewrite teams.csv with the names the team jobs found, once none are left to run
+
+        Whichever worker finishes a competition's last team job writes it;
+        if several finish at once, they write the same file.
+        """
+        jobs = self.queue.jobs("team", f"{competition_id}/")
+        if any(state in ("pending", "leased") for state, _ in jobs):
+            return
+        save_teams_list(competition_id, [team for _, team in jobs])
+        print(f"Saved the team list for competition {competition_id}")
+
+    async def run_team(self, team, open_page):
+        if self.cache.max_age is not None and load_team_from_cache(self.cache, team):
+            return True
+        success = None
+        if self.args.backend == "http":
+            success = await scrape_team_stats_http(self.fetcher, team)
+        if success is None:
+            page = await open_page()
+            # Navigations are paced by the context's route handler
+            success = await self.limiter.call(team_stats_url(team["competition"], team["id"]),
+                                              lambda: scrape_team_stats(page, team, self.cache), paced=False)
+        return success
+
+    async def run_players(self, payload, open_page):
+        competition_id = payload["competition"]
+        success = await scrape_competition_players(competition_id, self.args, self.browser, self.fetcher,
+                                                   self.cache, self.profile, self.stats, self.limiter)
+        if success and payload.get("profiles"):
+            profiles = [profile for profile in await asyncio.to_thread(collect_profile_urls)
+                        if profile["competition"] == competition_id]
+            for profile in profiles:
+                await asyncio.to_thread(self.queue.enqueue, "profile",
+                                        f"{competition_id}/{profile['person_id']}", profile)
+            print(f"Queued {len(profiles)} profile(s) for competition {competition_id}")
+        return success
+
+    async def run_profile(self, profile, open_page):
+        success = None
+        if self.args.backend == "http":
+            success = await scrape_profile_http(self.fetcher, profile)
+        if success is None:
+            page = await open_page()
+            success = await self.limiter.call(profile["url"], lambda: scrape_profile(page, profile), paced=False)
+        return success
+
+    async def heartbeat(self, job):
+        """Keep extending a job's lease while it runs"""
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not await asyncio.to_thread(self.queue.extend, job):
+                print(f"Lost the lease on {job}; another worker may run it")
+                return
+
+    async def execute(self, job, open_page):
+        handlers = {"competition": self.run_competition, "team": self.run_team,
+                    "players": self.run_players, "profile": self.run_profile}
+        print(f"\n[{self.name}] Running {job} (attempt {job.attempts})")
+        heartbeat = asyncio.create_task(self.heartbeat(job))
+        try:
+            with metrics.span("job", kind=job.kind, key=job.key):
+                success = await handlers[job.kind](job.payload, open_page)
+            error = None if success else "no tables saved"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+
+        if error is None:
+            recorded = await asyncio.to_thread(self.queue.complete, job)
+            outcome = "done" if recorded else "lost"
+        else:
+            print(f"Job {job} failed: {error}")
+            recorded = await asyncio.to_thread(self.queue.fail, job, error, RETRY_DELAY)
+            if not recorded:
+                outcome = "lost"
+            else:
+                outcome = "failed" if job.attempts >= self.queue.max_attempts else "retried"
+        self.counts[outcome] += 1
+        metrics.count("jobs", kind=job.kind, outcome=outcome)
+        if job.kind == "team" and outcome in ("done", "failed"):
+            await asyncio.to_thread(self.save_teams_if_finished, job.payload["competition"])
+
+    async def slot(self):
+        """Claim and run jobs until the queue is drained (or forever with --wait)"""
+        context = page = None
+
+        async def open_page():
+            nonlocal context, page
+            if page is None:
+                context = await new_context(await self.browser.get(), self.profile, self.stats, self.limiter)
+                page = await context.new_page()
+            return page
+
+        try:
+            while True:
+                job = await asyncio.to_thread(self.queue.claim, self.name)
+                if job is None:
+                    # Leased jobs may still fail back or queue more work
+                    if not self.args.wait and not await asyncio.to_thread(self.queue.outstanding):
+                        return
+                    await asyncio.sleep(self.args.poll_interval)
+                    continue
+                await self.execute(job, open_page)
+        finally:
+            if context is not None:
+                await context.close()
+
+    def summary(self):
+        return (f"Worker {self.name}: {self.counts['done']} done, {self.counts['retried']} to retry, "
+                f"{self.counts['failed']} failed, {self.counts['lost']} finished after losing the lease")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Claim and run scrape jobs from the shared queue")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Jobs to run concurrently in this process (default: 1)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum page requests per second for this process")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser",
+                        help="Fetch pages with Chromium, or over plain HTTP with a "
+                             "per-page browser fallback (default: browser)")
+    parser.add_argument("--wait", action="store_true",
+                        help="Keep polling for new jobs instead of exiting once the queue is drained")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, metavar="SECONDS",
+                        help=f"Seconds between polls of an empty queue (default: {DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument("--visibility-timeout", type=float, default=DEFAULT_VISIBILITY_TIMEOUT, metavar="SECONDS",
+                        help=f"Seconds before a crashed worker's job is handed to another worker "
+                             f"(default: {DEFAULT_VISIBILITY_TIMEOUT:g})")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Attempts before a job is marked failed (default: {DEFAULT_MAX_ATTEMPTS})")
+    add_queue_args(parser)
+    add_browser_args(parser)
+    add_cache_args(parser)
+    add_scheduler_args(parser)
+    add_metrics_args(parser)
+    add_diagnostics_args(parser)
+    add_archive_args(parser)
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+    profile = profile_from_args(args)
+    stats = LoadStats()
+    cache = cache_from_args(args)
+    metrics_from_args(args)
+    diagnostics_from_args(args)
+    archive_from_args(args)
+    limiter = scheduler_from_args(args)
+    queue = JobQueue(args.queue, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    
+    os.makedirs("data", exist_ok=True)
+    
+    async with async_playwright() as p, HttpFetcher(max_connections=args.workers, cache=cache,
+                                                     limiter=limiter) as fetcher:
+        # The browser is only launched if a job actually needs it
+        browser = LazyBrowser(p, profile)
+        worker = Worker(args, queue, browser, fetcher, cache, profile, stats, limiter)
+        print(f"Worker {worker.name} running {max(1, args.workers)} job(s) at a time from {args.queue}")
+        await asyncio.gather(*(worker.slot() for _ in range(max(1, args.workers))))
+        await browser.close()
+        cache.close()
+    
+    print("\n=== Summary ===")
+    print(worker.summary())
+    print(f"Jobs in {args.queue}:\n{queue.summary()}")
+    print(stats.summary())
+    print(fetcher.summary())
+    print(limiter.summary())
+    print(cache.summary())
+    if archive.mode:
+        print(archive.summary())
+    print(f"Stages:\n{metrics.summary()}")
+    print(f"Data saved to {COMPETITIONS_DIR}/<competition> directories")
+    queue.close()
+    archive.close()
+    metrics.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
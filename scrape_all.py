@@ -1,56 +1,138 @@
+import argparse
 import os
+import sys
 import asyncio
-import subprocess
-import time
-
-def run_command(command):
-    """Run a command and print its output"""
-    print(f"Running: {command}")
-    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    
-    # Print output in real-time
-    for line in iter(process.stdout.readline, b''):
-        print(line.decode().strip())
-    
-    process.wait()
-    return process.returncode
+from playwright.async_api import async_playwright
+from sbl_browser import LazyBrowser, LoadStats, add_browser_args, profile_from_args
+from sbl_cache import add_cache_args, cache_from_args
+from sbl_competitions import add_competition_args
+from sbl_diagnostics import add_diagnostics_args, diagnostics_from_args
+from sbl_data_processor import MANIFEST_PATH, OUTPUT_DIR, process_all, process_file
+from sbl_extract import table_saved_callbacks
+from sbl_har import add_archive_args, archive, archive_from_args
+from sbl_http import HttpFetcher
+from sbl_manifest import Manifest
+from sbl_metrics import add_metrics_args, metrics, metrics_from_args
+from sbl_player_scraper import run_player_scrape
+from sbl_scheduler import add_scheduler_args, scheduler_from_args
+from sbl_team_scraper import run_team_scrape
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape and process all SBL data")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Pages to load concurrently, shared by the team and player scrapes (default: 1)")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser",
+                        help="Fetch pages with Chromium, or over plain HTTP with a "
+                             "per-page browser fallback (default: browser)")
+    add_competition_args(parser)
+    add_browser_args(parser)
+    add_cache_args(parser)
+    add_scheduler_args(parser)
+    add_metrics_args(parser)
+    add_diagnostics_args(parser)
+    add_archive_args(parser)
+    return parser.parse_args()
+
+async def process_tables(queue, manifest):
+    """Process table CSVs as the scrapers write them, until a None arrives"""
+    processed = 0
+    while True:
+        path = await queue.get()
+        if path is None:
+            break
+        # pandas work runs off the event loop so page loads keep going
+        if await asyncio.to_thread(process_file, manifest, path):
+            processed += 1
+    return processed
+
+async def run_scrape(args, manifest):
+    """Scrape teams and players concurrently, processing each table as it lands"""
+    profile = profile_from_args(args)
+    stats = LoadStats()
+    cache = cache_from_args(args)
+
+    # One request budget, retry policy and concurrency limit shared by both scrapes
+    limiter = scheduler_from_args(args)
+
+    os.makedirs("data", exist_ok=True)
+
+    queue = asyncio.Queue()
+    table_saved_callbacks.append(queue.put_nowait)
+    processor = asyncio.create_task(process_tables(queue, manifest))
+
+    async def timed(name, coroutine):
+        with metrics.span(name):
+            return await coroutine
+
+    try:
+        async with async_playwright() as p, HttpFetcher(max_connections=args.workers, cache=cache,
+                                                         limiter=limiter) as fetcher:
+            # A single browser, launched only if a page needs it, serves both scrapes
+            browser = LazyBrowser(p, profile)
+            (teams, failed_teams), player_results = await asyncio.gather(
+                timed("team_scrape", run_team_scrape(args, browser, fetcher, cache, profile, stats, limiter)),
+                timed("player_scrape", run_player_scrape(args, browser, fetcher, cache, profile, stats, limiter)),
+            )
+            await browser.close()
+            cache.close()
+    finally:
+        table_saved_callbacks.remove(queue.put_nowait)
+        queue.put_nowait(None)
+        streamed = await processor
+
+    print("\n=== Scrape Summary ===")
+    print(f"Teams: {len(teams) - len(failed_teams)} of {len(teams)} scraped")
+    for team in failed_teams:
+        print(f"  - {team['name'] or team['id']} (competition {team['competition']})")
+    for competition_id, success in player_results:
+        print(f"Player statistics ({competition_id}):", "Success" if success else "Failed")
+    print(f"Tables processed while scraping: {streamed}")
+    print(stats.summary())
+    print(fetcher.summary())
+    print(limiter.summary())
+    print(cache.summary())
+    if archive.mode:
+        print(archive.summary())
+    return not failed_teams and all(success for _, success in player_results)
 
 def main():
+    args = parse_args()
+
     print("=== SBL Scraper - All Data ===")
-    
-    start_time = time.time()
-    
-    # Step 1: Scrape team statistics
-    print("\n\n=== Step 1: Scraping Team Statistics ===")
-    result = run_command("python sbl_team_scraper.py")
-    if result != 0:
-        print("ERROR: Team scraper failed!")
-        return
-    
-    # Step 2: Scrape player statistics
-    print("\n\n=== Step 2: Scraping Player Statistics ===")
-    result = run_command("python sbl_player_scraper.py")
-    if result != 0:
-        print("ERROR: Player scraper failed!")
-        return
-    
-    # Step 3: Process all data
-    print("\n\n=== Step 3: Processing All Data ===")
-    result = run_command("python sbl_data_processor.py")
-    if result != 0:
-        print("ERROR: Data processor failed!")
-        return
-    
-    # Calculate runtime
-    end_time = time.time()
-    duration = end_time - start_time
-    minutes = int(duration / 60)
-    seconds = int(duration % 60)
-    
+
+    metrics_from_args(args)
+    diagnostics_from_args(args)
+    archive_from_args(args)
+
+    # Shared by the streaming processor and the final pass, so tables
+    # processed during the scrape are not processed again
+    manifest = Manifest(MANIFEST_PATH)
+
+    with metrics.span("total"):
+        # Steps 1 and 2: scrape teams and players, processing tables as they arrive
+        print("\n\n=== Scraping Team and Player Statistics ===")
+        success = asyncio.run(run_scrape(args, manifest))
+
+        # Step 3: catch anything not streamed, then build the columnar datasets and store.
+        # Skipped after a failed scrape, whose missing tables would otherwise be
+        # recorded as removed and left out of the datasets and leaderboards.
+        if success:
+            print("\n\n=== Finishing Processing ===")
+            with metrics.span("finalize"):
+                process_all(manifest=manifest)
+
     print("\n\n=== Scraping Complete ===")
-    print(f"Runtime: {minutes} minutes and {seconds} seconds")
-    print("All data has been scraped and processed successfully!")
-    print(f"Data is available in the 'data_processed' directory")
+    print(f"Stages:\n{metrics.summary()}")
+    if success:
+        print("All data has been scraped and processed successfully!")
+        print(f"Data is available in the '{OUTPUT_DIR}' directory")
+    else:
+        print("ERROR: Some pages failed to scrape; see the summary above. "
+              "Final processing was skipped; rerun once the pages load")
+    archive.close()
+    metrics.close()
+    if not success:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
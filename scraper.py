@@ -1,25 +1,217 @@
-from playwright.sync_api import Page
+import asyncio
+import sys
+import numpy as np
+import pandas as pd
+from playwright.async_api import async_playwright
+from sbl_browser import LazyBrowser, LoadStats, PageLoadProfile, goto_ready, new_context
+from sbl_competitions import DEFAULT_COMPETITION_ID, player_stats_url, team_stats_url
+from sbl_diagnostics import diagnostics
+from sbl_extract import extract_tables, table_slug
+from sbl_http import HttpFetcher, parse_page, parse_tables
+from sbl_normalize import frame_from_rows, normalize_frame
+from sbl_player_scraper import player_table_rows
+from sbl_scheduler import Scheduler
+from sbl_team_scraper import extract_team_links, extract_team_links_http, team_table_name
+
+def column_array(values):
+    """A normalized column as a NumPy array: numbers keep their downcast dtype, text becomes str objects
+
+    Integer columns with missing cells, such as Person_ID for a player
+    without a profile link, become masked arrays rather than floats. Text
+    is an object array rather than fixed-width str, which would pad every
+    cell to the longest URL; repeated values share one str object.
+    """
+    if isinstance(values.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(values):
+        data = values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0)
+        return np.ma.masked_array(data, mask=values.isna().to_numpy()) if values.hasnans else data
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy()
+    codes, uniques = pd.factorize(values.astype("string").fillna(""))
+    return np.asarray(uniques, dtype=object)[codes]
+
+def array_bytes(values):
+    """Memory held by a column, counting each distinct str object of a text column once"""
+    if values.dtype != object:
+        return values.nbytes
+    return values.nbytes + sum(sys.getsizeof(value) for value in {id(value): value for value in values}.values())
+
+class Table:
+    """
+    A typed statistics table, stored column by column
+
+    Each column is one NumPy array: counts in the smallest integer type,
+    rates and percentages as float32, minutes as seconds and names and
+    URLs as str objects. The columns are those the data processor would
+    write for the same table.
+    """
+
+    __slots__ = ("name", "source", "columns")
+
+    def __init__(self, name, source, columns):
+        self.name = name
+        self.source = source
+        self.columns = columns
+
+    @classmethod
+    def from_rows(cls, name, source, headers, rows):
+        """Normalize extracted headers and rows with the schema for source and name"""
+        df = normalize_frame(frame_from_rows(headers, rows), source, name)
+        return cls(name, source, {column: column_array(df[column]) for column in df.columns})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    @property
+    def dtypes(self):
+        return {column: str(values.dtype) for column, values in self.columns.items()}
+
+    @property
+    def nbytes(self):
+        return sum(array_bytes(values) for values in self.columns.values())
+
+    def row(self, index):
+        """One row as a dict of plain Python values, with None for missing integers"""
+        row = {}
+        for column, values in self.columns.items():
+            value = values[index]
+            row[column] = None if value is np.ma.masked else value.item() if isinstance(value, np.generic) else value
+        return row
+
+    def to_pandas(self):
+        return pd.DataFrame({column: pd.arrays.IntegerArray(values.data, values.mask)
+                             if isinstance(values, np.ma.MaskedArray) else values
+                             for column, values in self.columns.items()}, copy=False)
+
+    def __repr__(self):
+        return f"<Table {self.source}/{self.name}: {len(self)} rows x {len(self.columns)} columns>"
+
+class Team:
+    """A team in a competition"""
+
+    __slots__ = ("id", "name", "competition", "url")
+
+    def __init__(self, id, name, competition, url):
+        self.id = id
+        self.name = name
+        self.competition = competition
+        self.url = url
+
+    def __repr__(self):
+        return f"<Team {self.id} {self.name}>"
 
 class SBLScraper:
     """
-    Scraper for SBL website
+    Async scraper API for one competition, returning typed tables in memory
+
+    Pages are fetched over HTTP where their tables are in the HTML and in
+    Chromium otherwise (or always, with backend="browser"). Nothing is
+    written to disk. Use it as an async context manager, or call close().
+
+        async with SBLScraper("38899") as scraper:
+            teams = await scraper.get_teams()
+            totals = (await scraper.get_team_stats(teams[0].id))["totals"]
     """
-    
-    def __init__(self, page: Page):
-        self.page = page
-        
-    def navigate_to_homepage(self):
-        """Navigate to the SBL homepage"""
-        # Replace with actual SBL URL
-        self.page.goto("https://example.com")
-        return self.page.title()
-        
-    def extract_data(self):
-        """Extract data from the current page"""
-        # Implement data extraction logic here
-        # Example:
-        data = {
-            "title": self.page.title(),
-            # Add more data extraction here
-        }
-        return data 
\ No newline at end of file
+
+    def __init__(self, competition_id=DEFAULT_COMPETITION_ID, backend="http", profile=None, workers=4, rate=None):
+        self.competition_id = competition_id
+        self.backend = backend
+        self.profile = profile or PageLoadProfile()
+        self.stats = LoadStats()
+        # Retries, backoff and circuit breaking for every page, as in the CLI scrapers
+        self.limiter = Scheduler(rate=rate, max_concurrency=max(1, workers))
+        self.fetcher = HttpFetcher(max_connections=max(1, workers), limiter=self.limiter)
+        self.playwright = None
+        self.browser = None
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.fetcher.close()
+        if self.browser is not None:
+            await self.browser.close()
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+
+    async def in_browser(self, load):
+        """Run load(page) in a fresh browser context, starting Playwright on first use"""
+        async with self.lock:
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+                self.browser = LazyBrowser(self.playwright, self.profile)
+        context = await new_context(await self.browser.get(), self.profile, self.stats, self.limiter)
+        try:
+            return await load(await context.new_page())
+        finally:
+            await context.close()
+
+    async def fetch_tables(self, url, selector, name):
+        """Extracted tables matching selector on the page at url"""
+        if self.backend == "http":
+            try:
+                tables = parse_tables(parse_page(await self.fetcher.get(url)), selector)
+            except Exception as e:
+                print(f"HTTP fetch failed for {url}: {e}")
+                tables = []
+            if tables:
+                return tables
+            print(f"Falling back to the browser for {url}")
+
+        async def load(page):
+            try:
+                await goto_ready(page, url, selector)
+                tables = await extract_tables(page, selector)
+                if not tables:
+                    raise ValueError(f"no tables matching {selector} extracted")
+            except Exception as e:
+                await diagnostics.capture(page, name, e)
+                raise
+            return tables
+
+        # Navigations are paced by the context's route handler
+        return await self.limiter.call(url, lambda: self.in_browser(load), paced=False)
+
+    async def get_teams(self):
+        """The competition's teams, in the order the teams page lists them"""
+        teams = []
+        if self.backend == "http":
+            teams = await extract_team_links_http(self.fetcher, self.competition_id)
+        if not teams:
+            teams = await self.in_browser(lambda page: extract_team_links(page, self.competition_id))
+        return [Team(team["id"], team["name"], self.competition_id, team["url"]) for team in teams]
+
+    async def get_team_stats(self, team_id):
+        """A team's tables by name: "totals", "per_game" and "shooting" """
+        tables = await self.fetch_tables(team_stats_url(self.competition_id, team_id), "table.team-stats",
+                                         f"{self.competition_id}_{team_id}_stats")
+        return {team_table_name(index): Table.from_rows(team_table_name(index), "team",
+                                                        table["headers"], table["rows"])
+                for index, table in enumerate(tables)}
+
+    async def get_player_stats(self):
+        """The competition's player tables by name, e.g. "averages", with a Person_ID column"""
+        tables = await self.fetch_tables(player_stats_url(self.competition_id), "table",
+                                         f"{self.competition_id}_player_stats")
+        result = {}
+        for table in tables:
+            headers, rows = player_table_rows(table)
+            result[table_slug(table)] = Table.from_rows(table_slug(table), "player", headers, rows)
+        return result
+
+    def summary(self):
+        return "\n".join([self.fetcher.summary(), self.limiter.summary(), self.stats.summary()])
@@ -1,52 +1,63 @@
+import argparse
 import asyncio
 import os
 import csv
 from playwright.async_api import async_playwright
+from sbl_browser import LazyBrowser, LoadStats, add_browser_args, goto_ready, new_context, profile_from_args
+from sbl_competitions import DEFAULT_COMPETITION_ID, team_stats_url
+from sbl_diagnostics import add_diagnostics_args, diagnostics, diagnostics_from_args
+from sbl_extract import extract_tables
 
-URL = "https://hosted.dcd.shared.geniussports.com/SBF/en/competition/38899/team/175103/statistics"
+URL = team_stats_url(DEFAULT_COMPETITION_ID, "175103")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape one team statistics page for debugging")
+    # The scrapers' page-load profile; pass --headed --no-block to watch the full page load
+    add_browser_args(parser)
+    add_diagnostics_args(parser)
+    return parser.parse_args()
 
 async def run():
+    args = parse_args()
+    diagnostics_from_args(args)
+    profile = profile_from_args(args)
+    stats = LoadStats()
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set to False to see the browser
-        page = await browser.new_page()
+        browser = LazyBrowser(p, profile)
+        # A page of its own in a fresh context
+        context = await new_context(await browser.get(), profile, stats)
+        page = await context.new_page()
         
         print(f"Navigating to {URL}")
-        await page.goto(URL, wait_until="networkidle")
-        
-        # Take screenshot to see what's loading
-        os.makedirs("screenshots", exist_ok=True)
-        await page.screenshot(path="screenshots/debug.png")
-        
-        print("Page loaded, waiting for tables...")
-        
-        # Wait for the first table with class containing "team-stats"
-        await page.wait_for_selector("table.team-stats", timeout=60000)
-        
-        # Process all tables with team-stats class
-        tables = await page.locator("table.team-stats").all()
+        try:
+            # Ready once the first team-stats table is in the DOM, as in the scrapers
+            await goto_ready(page, URL, "table.team-stats")
+            print("Page loaded")
+            
+            # Extract all tables with team-stats class in one round-trip
+            tables = await extract_tables(page, "table.team-stats")
+            await diagnostics.success(page, "debug")
+        except Exception as e:
+            # Capture what did load to see why the tables didn't
+            await diagnostics.capture(page, "debug", e)
+            raise
+        finally:
+            await context.close()
+            await browser.close()
         print(f"Found {len(tables)} team stats tables")
         
         # Create data directory if it doesn't exist
         os.makedirs("data", exist_ok=True)
         
-        for table_index, table in enumerate(tables):
+        for table in tables:
+            table_index = table["index"]
             print(f"\nProcessing Table {table_index + 1}:")
             
-            # Get table headers
-            headers = await table.locator("thead th").all_inner_texts()
+            headers = table["headers"]
             print(f"Headers: {headers}")
             
-            # Get table rows
-            rows = await table.locator("tbody tr").all()
-            print(f"Found {len(rows)} rows")
-            
-            # Prepare data for CSV
-            csv_data = []
-            
-            # Process all rows
-            for row in rows:
-                cells = await row.locator("td").all_inner_texts()
-                csv_data.append(cells)
+            csv_data = table["rows"]
+            print(f"Found {len(csv_data)} rows")
                 
             # Save to CSV
             csv_filename = f"data/table_{table_index + 1}.csv"
@@ -57,9 +68,8 @@ async def run():
                 
             print(f"Saved data to {csv_filename}")
         
-        await browser.close()
-        
         print("\nSummary:")
+        print(stats.summary())
         print(f"Successfully scraped {len(tables)} tables from {URL}")
         print("Data saved to CSV files in the data directory")
 
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+import httpx
+from sbl_cache import ORPHAN_GRACE_SECONDS, ResponseCache
+from sbl_http import HttpFetcher
+
+URL = "https://example.test/SBF/en/competition/38899/teams"
+
+def test_entries_are_fresh_until_max_age(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age=60)
+    cache.store(URL, "<html>teams</html>")
+    assert cache.get_fresh(URL) == "<html>teams</html>"
+
+    cache.lookup(URL)["fetched_at"] = time.time() - 61
+    assert cache.get_fresh(URL) is None
+    assert ResponseCache(str(tmp_path)).get_fresh(URL) is None
+
+def test_stale_pages_are_revalidated(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, "<html>teams</html>", etag='"v1"', last_modified="Sat, 01 Mar 2025 00:00:00 GMT")
+    seen = []
+
+    def respond(request):
+        seen.append(request.headers)
+        return httpx.Response(304)
+
+    async def fetch():
+        async with HttpFetcher(cache=cache) as fetcher:
+            await fetcher.client.aclose()
+            fetcher.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+            return await fetcher.get(URL)
+
+    assert asyncio.run(fetch()) == "<html>teams</html>"
+    assert seen[0]["If-None-Match"] == '"v1"'
+    assert seen[0]["If-Modified-Since"] == "Sat, 01 Mar 2025 00:00:00 GMT"
+    assert cache.revalidated == 1
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    for page in range(3):
+        cache.store(f"{URL}/{page}", "x" * 100)
+        cache.lookup(f"{URL}/{page}")["last_access"] = page
+    cache.lookup(f"{URL}/0")
+    cache.max_bytes = 250
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path), max_bytes=250)
+    assert reopened.lookup(f"{URL}/0") is not None
+    assert reopened.lookup(f"{URL}/1") is None
+    assert reopened.lookup(f"{URL}/2") is not None
+    assert len([name for name in os.listdir(tmp_path) if len(name) == 64]) == 2
+
+def test_index_survives_a_run_that_never_closes(tmp_path):
+    ResponseCache(str(tmp_path)).store(URL, "<html>teams</html>")
+    assert ResponseCache(str(tmp_path)).lookup(URL) is not None
+
+def test_unindexed_files_are_deleted_once_old(tmp_path):
+    orphan = tmp_path / ("0" * 64)
+    orphan.write_text("left by a crashed run")
+    recent = tmp_path / ("1" * 64)
+    recent.write_text("still being stored")
+    old = time.time() - ORPHAN_GRACE_SECONDS - 1
+    os.utime(orphan, (old, old))
+
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, "<html>teams</html>")
+    assert not orphan.exists()
+    assert recent.exists()
+    assert cache.lookup(URL) is not None
+
+def test_processes_sharing_a_directory_keep_each_others_entries(tmp_path):
+    first = ResponseCache(str(tmp_path))
+    second = ResponseCache(str(tmp_path))
+    first.store(f"{URL}/1", "one")
+    second.store(f"{URL}/2", "two")
+    first.close()
+
+    reopened = ResponseCache(str(tmp_path))
+    assert reopened.read(reopened.lookup(f"{URL}/1")) == "one"
+    assert reopened.read(reopened.lookup(f"{URL}/2")) == "two"
@@ -0,0 +1,73 @@
+import json
+from sbl_changes import ChangeFeed, diff_tables, index_rows, row_hash
+
+HEADER = ["Player", "PTS", "Player_URL", "Person_ID"]
+URL = "https://example.test/SBF/en/competition/38899/person/{}?"
+
+BEFORE = (HEADER, [
+    ["Basem Abdulkader", "10", URL.format(1), "1"],
+    ["Jane Roe", "8", URL.format(2), "2"],
+    ["No Link", "4", "", ""],
+    ["Gone Player", "2", URL.format(3), "3"],
+])
+AFTER = (HEADER, [
+    ["Basem Abdulkader", "12", URL.format(1), "1"],
+    ["Jane Roe-Smith", "8", URL.format(2), "2"],
+    ["No Link", "6", "", ""],
+    ["New Player", "1", URL.format(4), "4"],
+])
+
+def test_row_hash_depends_on_every_cell():
+    assert row_hash(["a", "b"]) == row_hash(["a", "b"])
+    assert row_hash(["a", "b"]) != row_hash(["a", "c"])
+    assert row_hash(["ab", ""]) != row_hash(["a", "b"])
+
+def test_rows_are_keyed_on_person_id_else_name_and_team():
+    index = index_rows(*BEFORE, team="Borås_Basket")
+    assert list(index) == ["1", "2", "No Link|Borås_Basket", "3"]
+    assert index["No Link|Borås_Basket"][2] is None
+    assert index["1"][2:] == ("1", "Basem Abdulkader")
+
+def test_repeated_names_without_ids_get_their_own_keys():
+    rows = [["Twin", "1", "", ""], ["Twin", "2", "", ""]]
+    assert list(index_rows(HEADER, rows)) == ["Twin|", "Twin|#2"]
+
+def test_inserts_updates_and_removes():
+    changes = diff_tables(BEFORE, AFTER, team="Borås_Basket")
+    assert sorted(changes) == sorted([
+        ("update", "1", "1", "Basem Abdulkader", ["PTS"]),
+        # Renamed, but the same person
+        ("update", "2", "2", "Jane Roe-Smith", ["Player"]),
+        ("update", "No Link|Borås_Basket", None, "No Link", ["PTS"]),
+        ("insert", "4", "4", "New Player", None),
+        ("remove", "3", "3", "Gone Player", None),
+    ])
+
+def test_renamed_player_without_id_is_removed_and_inserted():
+    before = (HEADER, [["No Link", "4", "", ""]])
+    after = (HEADER, [["No Link Jr", "4", "", ""]])
+    assert diff_tables(before, after) == [("insert", "No Link Jr|", None, "No Link Jr", None),
+                                          ("remove", "No Link|", None, "No Link", None)]
+
+def test_unchanged_table_has_no_changes():
+    assert diff_tables(BEFORE, BEFORE) == []
+
+def test_new_column_is_an_update():
+    after = (HEADER + ["EFF"], [row + ["5"] for row in BEFORE[1]])
+    changes = diff_tables(BEFORE, after)
+    assert len(changes) == 4
+    assert all(op == "update" and columns == ["EFF"] for op, _, _, _, columns in changes)
+
+def test_feed_writes_one_line_per_change(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes"), str(tmp_path))
+    path = str(tmp_path / "competitions/38899/teams/Borås_Basket/totals.csv")
+    assert feed.record(path, BEFORE, AFTER) == 5
+    assert feed.record(str(tmp_path / "competitions/38899/teams.csv"), BEFORE, AFTER) == 0
+    assert feed.counts() == {"insert": 1, "update": 3, "remove": 1}
+
+    with open(feed.flush(), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert entries[0] == {"op": "update", "table": "competitions/38899/teams/Borås_Basket/totals",
+                          "competition": "38899", "source": "team", "team": "Borås_Basket", "kind": "totals",
+                          "key": "1", "person_id": "1", "player": "Basem Abdulkader", "columns": ["PTS"]}
+    assert feed.flush() is None
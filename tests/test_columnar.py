@@ -0,0 +1,17 @@
+import pandas as pd
+import pyarrow.dataset as ds
+from sbl_columnar import write_dataset
+
+def frame(competition, season, points):
+    return pd.DataFrame({"Player": ["A", "B"], "PTS": points, "team_name": ["X", "Y"],
+                         "competition": competition, "season": season})
+
+def test_changed_season_replaces_the_old_partition(tmp_path):
+    path = str(tmp_path / "teams_totals")
+    write_dataset([frame("38899", "2026-27", [1, 2])], path)
+    write_dataset([frame("40000", "2026-27", [3, 4])], path)
+    write_dataset([frame("38899", "2024-25", [5, 6])], path)
+
+    rows = ds.dataset(path, format="parquet", partitioning="hive").to_table().to_pandas()
+    assert sorted(zip(rows["competition"].astype(str), rows["season"].astype(str), rows["PTS"])) == [
+        ("38899", "2024-25", 5), ("38899", "2024-25", 6), ("40000", "2026-27", 3), ("40000", "2026-27", 4)]
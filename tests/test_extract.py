@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from sbl_extract import clean_text, extract_tables
+from sbl_http import parse_page, parse_tables
+
+# Cells padded, wrapped over several lines, split by <br> and nested tags,
+# the way the stats site's markup varies
+FIXTURE_HTML = """<!DOCTYPE html>
+<html><body>
+<h4>
+    Averages
+</h4>
+<table class="team-stats">
+  <caption>  Player
+    averages </caption>
+  <thead><tr><th> Player </th><th>
+      PPG
+  </th><th>FG&nbsp;%</th></tr></thead>
+  <tbody>
+    <tr>
+      <td><a href="/SBF/en/competition/38899/person/1693023?">  Basem
+          Abdulkader </a></td>
+      <td> 1.2 </td>
+      <td>25.0<!-- rounded --></td>
+    </tr>
+    <tr>
+      <td><a href="/SBF/en/competition/38899/person/1693024?">Jane<br>Roe</a></td>
+      <td><span>10</span>.<b>5</b></td>
+      <td><div>40.0</div><script>var x = 1;</script></td>
+    </tr>
+    <tr><td>No Link</td><td></td><td>0.0</td></tr>
+  </tbody>
+</table>
+</body></html>
+"""
+
+EXPECTED = [{
+    "index": 0,
+    "caption": "Player averages",
+    "heading": "Averages",
+    "headers": ["Player", "PPG", "FG %"],
+    "rows": [["Basem Abdulkader", "1.2", "25.0"], ["Jane Roe", "10.5", "40.0"], ["No Link", "", "0.0"]],
+    "links": [{"text": "Basem Abdulkader", "href": "/SBF/en/competition/38899/person/1693023?"},
+              {"text": "Jane Roe", "href": "/SBF/en/competition/38899/person/1693024?"},
+              None],
+}]
+
+def test_clean_text():
+    assert clean_text("  Basem\n   Abdulkader\t") == "Basem Abdulkader"
+    assert clean_text("FG %") == "FG %"
+    assert clean_text(None) == ""
+
+def test_http_extractor():
+    assert parse_tables(parse_page(FIXTURE_HTML), "table.team-stats") == EXPECTED
+
+def browser_tables(html):
+    playwright_api = pytest.importorskip("playwright.async_api")
+
+    async def extract():
+        async with playwright_api.async_playwright() as p:
+            try:
+                browser = await p.chromium.launch()
+            except Exception as e:
+                pytest.skip(f"Chromium is not available: {e}")
+            page = await browser.new_page()
+            await page.set_content(html)
+            tables = await extract_tables(page, "table.team-stats")
+            await browser.close()
+            return tables
+
+    return asyncio.run(extract())
+
+def test_backends_extract_the_same_tables():
+    assert browser_tables(FIXTURE_HTML) == parse_tables(parse_page(FIXTURE_HTML), "table.team-stats")
@@ -0,0 +1,77 @@
+import os
+from sbl_data_processor import extract_teams_list
+from sbl_manifest import Manifest
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def touch_later(path):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+def processed(tmp_path, text="Player,PTS\nA,1\n"):
+    input_path, output_path = str(tmp_path / "data/Team/totals.csv"), str(tmp_path / "out/Team/totals.csv")
+    write(input_path, text)
+    write(output_path, text)
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    manifest.record(input_path, output_path)
+    manifest.save()
+    return input_path, output_path
+
+def test_unchanged_input_is_skipped(tmp_path):
+    input_path, output_path = processed(tmp_path)
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    assert manifest.check(input_path, output_path)
+    assert manifest.skipped == 1
+    assert not Manifest(str(tmp_path / "manifest.json"), force=True).is_current(input_path, output_path)
+
+def test_touched_input_falls_back_to_the_hash(tmp_path):
+    input_path, output_path = processed(tmp_path)
+    touch_later(input_path)
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    assert manifest.is_current(input_path, output_path)
+    # The new mtime is remembered, so the next check skips hashing
+    assert manifest.entries[input_path]["mtime"] == os.stat(input_path).st_mtime
+
+def test_changed_input_is_reprocessed(tmp_path):
+    input_path, output_path = processed(tmp_path)
+    write(input_path, "Player,PTS\nA,2\n")
+    touch_later(input_path)
+    assert not Manifest(str(tmp_path / "manifest.json")).is_current(input_path, output_path)
+
+    write(input_path, "Player,PTS\nA,20\n")
+    assert not Manifest(str(tmp_path / "manifest.json")).is_current(input_path, output_path)
+
+def test_missing_output_is_reprocessed(tmp_path):
+    input_path, output_path = processed(tmp_path)
+    os.remove(output_path)
+    assert not Manifest(str(tmp_path / "manifest.json")).is_current(input_path, output_path)
+
+def test_outputs_of_deleted_inputs_are_removed(tmp_path):
+    input_path, output_path = processed(tmp_path)
+    os.remove(input_path)
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    removing = []
+    assert manifest.remove_stale(removing.append) == [output_path]
+    assert removing == [output_path]
+    assert not os.path.exists(output_path)
+    assert not os.path.exists(os.path.dirname(output_path))
+    assert input_path not in manifest.entries
+
+def test_inputs_seen_this_run_are_kept(tmp_path):
+    input_path, output_path = processed(tmp_path)
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    manifest.check(input_path, output_path)
+    os.remove(input_path)
+    assert manifest.remove_stale() == []
+    assert os.path.exists(output_path)
+
+def test_unchanged_teams_list_is_still_counted(tmp_path):
+    input_dir, output_dir = str(tmp_path / "data"), str(tmp_path / "out")
+    write(f"{input_dir}/teams.csv", "ID,Name,URL\n1,BC Luleå,/team/1\n2,Borås Basket,/team/2\n")
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    assert extract_teams_list(manifest, input_dir, output_dir) == 2
+    assert extract_teams_list(manifest, input_dir, output_dir) == 2
+    assert manifest.skipped == 1
@@ -0,0 +1,53 @@
+import pandas as pd
+from sbl_metrics import metrics
+from sbl_normalize import frame_from_rows, normalize_frame, person_id_from_url
+
+URL = "https://hosted.dcd.shared.geniussports.com/SBF/en/competition/38899/person/1693023?"
+
+def test_person_id_from_url():
+    assert person_id_from_url(URL) == "1693023"
+    assert person_id_from_url("https://example.test/team/175103") is None
+    assert person_id_from_url(None) is None
+
+def test_team_totals():
+    df = normalize_frame(frame_from_rows(
+        ["Player", "Min", "PTS", "EFF"],
+        [["Basem Abdulkader", "878:41", "412", "12"], ["Jane Roe", "5:07", "3", ""]]), "team", "totals")
+    assert list(df.columns) == ["Player", "Min_sec", "PTS", "EFF"]
+    assert df["Min_sec"].tolist() == [52721, 307]
+    assert df["PTS"].dtype == "int16"
+    # A missing count stays an integer rather than becoming 12.0 and NaN
+    assert str(df["EFF"].dtype) == "Int8"
+    assert df["EFF"].isna().tolist() == [False, True]
+
+def test_percentages_with_or_without_percent_sign():
+    df = normalize_frame(frame_from_rows(["Player", "2P%", "3P%", "FT%"], [["A", "50.3%", " 33.3 ", ""]]),
+                         "team", "shooting")
+    assert df["2P%"].dtype == "float32"
+    assert round(float(df["2P%"][0]), 1) == 50.3
+    assert round(float(df["3P%"][0]), 1) == 33.3
+    assert pd.isna(df["FT%"][0])
+
+def test_person_ids_from_urls():
+    df = normalize_frame(frame_from_rows(["Player", "EFF", "Player_URL"],
+                                         [["A", "5", URL], ["No Link", "7", None]]), "player", "averages")
+    assert str(df["Person_ID"].dtype) == "Int64"
+    assert df["Person_ID"][0] == 1693023
+    assert pd.isna(df["Person_ID"][1])
+
+def test_normalizing_a_processed_frame_changes_nothing(tmp_path):
+    raw = frame_from_rows(["Player", "Min", "PTS", "EFF", "Player_URL"],
+                          [["A", "10:30", "8", "-", URL], ["B", "1:00", "2", "4", None]])
+    df = normalize_frame(raw, "team", "totals")
+    df.to_csv(tmp_path / "totals.csv", index=False)
+    reread = normalize_frame(pd.read_csv(tmp_path / "totals.csv"), "team", "totals")
+    pd.testing.assert_frame_equal(reread, df)
+    assert (tmp_path / "totals.csv").read_text().splitlines()[1:] == [f"A,630,8,,{URL},1693023", "B,60,2,4,,"]
+
+def test_cells_that_are_not_numbers_are_reported(capsys):
+    before = metrics.counters.get("coerced_cells", 0)
+    df = normalize_frame(frame_from_rows(["Player", "EFF"], [["A", "-"], ["B", "n/a"], ["C", "4"]]),
+                         "player", "averages")
+    assert df["EFF"].isna().tolist() == [True, True, False]
+    assert metrics.counters["coerced_cells"] - before == 2
+    assert "Column EFF: 2 cell(s)" in capsys.readouterr().out
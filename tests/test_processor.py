@@ -0,0 +1,64 @@
+import os
+import random
+from sbl_changes import changes
+from sbl_data_processor import player_units, process_units, team_units
+from sbl_manifest import Manifest
+from sbl_metrics import metrics
+
+INPUT_DIR = "data/competitions/38899"
+OUTPUT_DIR = "data_processed/competitions/38899"
+
+def write_scraped_data(teams=4, players=6):
+    """Raw team and player CSVs shaped like the scrapers' output"""
+    rng = random.Random(38899)
+    for team in range(teams):
+        os.makedirs(f"{INPUT_DIR}/Team_{team}")
+        with open(f"{INPUT_DIR}/Team_{team}/totals.csv", "w", encoding="utf-8") as f:
+            f.write("Player,Min,PTS,EFF\n")
+            for player in range(players):
+                eff = rng.choice(["-", str(rng.randint(0, 200))])
+                f.write(f"Player {team}-{player},{rng.randint(0, 900)}:{rng.randint(0, 59):02d},"
+                        f"{rng.randint(0, 500)},{eff}\n")
+        with open(f"{INPUT_DIR}/Team_{team}/per_game.csv", "w", encoding="utf-8") as f:
+            f.write("Player,MPG,PPG\n")
+            for player in range(players):
+                f.write(f"Player {team}-{player},{rng.uniform(0, 40):.1f},{rng.uniform(0, 30):.1f}\n")
+    os.makedirs(f"{INPUT_DIR}/players")
+    with open(f"{INPUT_DIR}/players/averages.csv", "w", encoding="utf-8") as f:
+        f.write("Player,EFF,PPG,Player_URL\n")
+        for person in range(teams * players):
+            url = f"/SBF/en/competition/38899/person/{1000 + person}?" if person % 5 else ""
+            f.write(f"Player {person},{rng.randint(0, 30)},{rng.uniform(0, 30):.1f},{url}\n")
+
+def run(jobs):
+    """Process every unit with jobs workers; returns the outputs and change entries"""
+    manifest = Manifest("manifest.json", force=True)
+    units = team_units(manifest, INPUT_DIR, OUTPUT_DIR) + player_units(manifest, INPUT_DIR, OUTPUT_DIR)
+    changes.take()
+    counts = process_units(manifest, units, jobs)
+    outputs = {}
+    for root, _, files in os.walk(OUTPUT_DIR):
+        for file in files:
+            with open(os.path.join(root, file), "rb") as f:
+                outputs[os.path.join(root, file)] = f.read()
+    return counts, outputs, changes.take(), sorted(manifest.entries)
+
+def test_jobs_give_the_same_output_as_the_serial_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_scraped_data()
+
+    before = metrics.counters.get("processed_rows", 0)
+    serial = run(jobs=1)
+    serial_rows = metrics.counters["processed_rows"] - before
+    os.rename("data_processed", "serial")
+
+    before = metrics.counters.get("processed_rows", 0)
+    pooled = run(jobs=3)
+    pooled_rows = metrics.counters["processed_rows"] - before
+
+    assert serial[0] == (4, 1)
+    assert len(serial[1]) == 9
+    assert len(serial[2]) == 4 * 2 * 6 + 24
+    assert pooled == serial
+    # Metrics from the worker processes are merged back
+    assert pooled_rows == serial_rows == 4 * 2 * 6 + 24
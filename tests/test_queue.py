@@ -0,0 +1,112 @@
+import csv
+import time
+from sbl_queue import JobQueue
+from sbl_worker import Worker
+
+def make_queue(tmp_path, **options):
+    return JobQueue(str(tmp_path / "queue.sqlite"), **options)
+
+def expire(queue, job):
+    """Run a job's lease out, as if its worker had died"""
+    queue.conn.execute("UPDATE jobs SET available_at = ? WHERE id = ?", (time.time() - 1, job.id))
+
+def test_claim_leases_a_job_to_one_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("team", "38899/1", {"id": "1"})
+    job = queue.claim("a")
+    assert job.attempts == 1
+    assert queue.claim("b") is None
+    assert queue.extend(job)
+
+def test_claim_after_the_lease_expires(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("team", "38899/1", {"id": "1"})
+    first = queue.claim("a")
+    expire(queue, first)
+    second = queue.claim("b")
+    assert second.id == first.id
+    assert second.attempts == 2
+    assert second.lease_token != first.lease_token
+
+def test_stale_lease_cannot_complete_or_fail(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("team", "38899/1", {"id": "1"})
+    first = queue.claim("a")
+    expire(queue, first)
+    second = queue.claim("b")
+    assert not queue.extend(first)
+    assert not queue.complete(first)
+    assert not queue.fail(first, "too slow")
+    assert queue.complete(second)
+    assert not queue.complete(second)
+    assert queue.outstanding() == 0
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.enqueue("team", "38899/1", {"id": "1"})
+    job = queue.claim("a")
+    assert queue.fail(job, "timeout")
+    assert queue.jobs("team", "38899/")[0][0] == "pending"
+    job = queue.claim("a")
+    assert job.attempts == 2
+    assert queue.fail(job, "timeout")
+    assert queue.jobs("team", "38899/")[0][0] == "failed"
+    assert queue.claim("a") is None
+
+    assert queue.retry_failed() == 1
+    assert queue.claim("a").attempts == 1
+
+def test_fail_waits_out_the_retry_delay(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("team", "38899/1", {"id": "1"})
+    queue.fail(queue.claim("a"), "timeout", retry_delay=60)
+    assert queue.claim("a") is None
+
+def test_expired_lease_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    queue.enqueue("team", "38899/1", {"id": "1"})
+    expire(queue, queue.claim("a"))
+    assert queue.claim("b") is None
+    assert queue.jobs("team", "38899/")[0][0] == "failed"
+
+def test_enqueue_does_not_disturb_a_running_job(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.enqueue("team", "38899/1", {"id": "1"})
+    job = queue.claim("a")
+    assert not queue.enqueue("team", "38899/1", {"id": "1"})
+    assert queue.complete(job)
+    assert queue.enqueue("team", "38899/1", {"id": "1"})
+
+def read_teams(tmp_path):
+    with open(tmp_path / "data/competitions/38899/teams.csv", newline="", encoding="utf-8") as f:
+        return [row["Name"] for row in csv.DictReader(f)]
+
+def test_teams_list_saved_once_no_team_job_is_left(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = make_queue(tmp_path)
+    worker = Worker.__new__(Worker)
+    worker.queue = queue
+    for team_id in ("1", "2", "3"):
+        queue.enqueue("team", f"38899/{team_id}", {"id": team_id, "name": f"Team_{team_id}",
+                                                   "url": f"/team/{team_id}", "competition": "38899"})
+    # Another competition whose ID shares a prefix
+    queue.enqueue("team", "388990/1", {"id": "1"})
+
+    first = queue.claim("a")
+    first.payload["name"] = "Borås Basket"
+    queue.complete(first)
+    second = queue.claim("a")
+    worker.save_teams_if_finished("38899")
+    assert not (tmp_path / "data/competitions/38899/teams.csv").exists()
+
+    # Leased, then given up for good
+    second.attempts = queue.max_attempts
+    queue.fail(second, "no tables")
+    worker.save_teams_if_finished("38899")
+    assert not (tmp_path / "data/competitions/38899/teams.csv").exists()
+
+    third = queue.claim("a")
+    third.payload["name"] = "Köping Stars"
+    queue.complete(third)
+    worker.save_teams_if_finished("38899")
+    assert read_teams(tmp_path) == ["Borås Basket", "Team_2", "Köping Stars"]